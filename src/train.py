@@ -5,30 +5,38 @@ from datasets import Dataset
 from trl import SFTTrainer, SFTConfig
 import os
 import numpy as np
+import sys
+from functools import lru_cache
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../testing"))
+from banner_utils.output_codec import OUTPUT_CODEC, encode, format_instructions
 
 
-with open("assets/layout.json", "r") as f:
-    layout_template = json.load(f)
+LAYOUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../assets/layout.json")
 
 
-def json_dataset(data):
-    conversations=[]
-    for item in data:
-        item_input = item['input']
-        item_output = item['output']
-        product_details = item_input.get("product_details", "")
-        product_name = product_details.get("name", "")
-        product_price = product_details.get("price", "")
-        product_color = item.get("product_color", "")
-        product_description = product_details.get("description", "")
-        layout = item_input.get("layout", "centered_hero")
-        fontFamilyList = []
-        for layers in item_output["objects"]:
-            layer_font_family = layers.get("fontFamily", "")
-            if layer_font_family not in fontFamilyList:
-                fontFamilyList.append(layer_font_family)
-
-        output_format = """
+@lru_cache(maxsize=1)
+def load_layout_template(layout_file=LAYOUT_FILE):
+    """Layout descriptions for the prompt, read on first use instead of at import"""
+    with open(layout_file, "r") as f:
+        return json.load(f)
+
+
+def build_input_text(item):
+    """Prompt for one final_data record, exactly as the model sees it in training"""
+    item_input = item['input']
+    product_details = item_input.get("product_details", "")
+    product_name = product_details.get("name", "")
+    product_price = product_details.get("price", "")
+    product_color = item.get("product_color", "")
+    product_description = product_details.get("description", "")
+    layout = item_input.get("layout", "centered_hero")
+    fontFamilyList = []
+    for layers in item["output"]["objects"]:
+        layer_font_family = layers.get("fontFamily", "")
+        if layer_font_family not in fontFamilyList:
+            fontFamilyList.append(layer_font_family)
+
+    output_format = """
         <think>
         ...
         </think>
@@ -57,31 +65,42 @@ def json_dataset(data):
         }
         </json>
         """
-        important_fields = {
-            "svg": ["top", "left", "width", "height", "src", "id"],
-            "text": ["top", "left", "width", "height", "fill", "text",  "fontFamily", "textAlign", "id"],
-            "image": ["top", "left", "width", "height", "src", "id"],
-            "rect": ["top", "left", "width", "height", "fill", "rx", "ry", "id"],
-            "circle": ["top", "left", "width", "height", "fill", "radius", "id"],
-            "path": ["top", "left", "width", "height", "fill", "path", "id"]
-        }
+    important_fields = {
+        "svg": ["top", "left", "width", "height", "src", "id"],
+        "text": ["top", "left", "width", "height", "fill", "text",  "fontFamily", "textAlign", "id"],
+        "image": ["top", "left", "width", "height", "src", "id"],
+        "rect": ["top", "left", "width", "height", "fill", "rx", "ry", "id"],
+        "circle": ["top", "left", "width", "height", "fill", "radius", "id"],
+        "path": ["top", "left", "width", "height", "fill", "path", "id"]
+    }
 
-        if product_name == "":
-            product_name = "Product Name Not Available"
-        if product_description == "":
-            product_description = "Product Description Not Available"
-        if product_price == "":
-            product_price = "Product Price Not Available"
+    if product_name == "":
+        product_name = "Product Name Not Available"
+    if product_description == "":
+        product_description = "Product Description Not Available"
+    if product_price == "":
+        product_price = "Product Price Not Available"
 
-        layout_description = " ".join(layout_template[layout])
+    layout_description = " ".join(load_layout_template()[layout])
 
-        input_text = f"I want you to create a beautiful advertisement banner of dimension 1080*1080, following the best practices, in form of condensed FabricJs json(with less keys), for the given product with the following details:\n\n\n##Product Details:\n\n **Product Name:** {product_name}\n **Product Description:** {product_description}\n **Product Price:** {product_price}\n\n **Product Color:** {product_color}\n\n\n.The banner should follow the {layout} layout\n ###Layout Description:\n\n {layout_description}.\n\n\n##Instructions:\n\n 1. Create a banner in condensed fabric js format, which have following important keys for given layer type: \n{json.dumps(important_fields)}.\n2. Focus on placement of layers to give a beautiful banner in given layout, with proper spacing between each layer.  \n    2.1 Carefully use *top*(y coordinate of top-left of the layer), *left*(x coordinate of top-left of the layer), *width*(width of the layer), *height*(height of the layer) keys to adjust placement. \n    2.2 Make sure no two text layers overlap each other and entire banner is visible in 1080*1080 canvas.  \n 3.You must strictly choose fontFamily for the text layers from the following list: {json.dumps(fontFamilyList)}.\n\n\n Have following output format:\n{output_format}\n\n .Think step by step and then create the banner."
+    input_text = f"I want you to create a beautiful advertisement banner of dimension 1080*1080, following the best practices, in form of condensed FabricJs json(with less keys), for the given product with the following details:\n\n\n##Product Details:\n\n **Product Name:** {product_name}\n **Product Description:** {product_description}\n **Product Price:** {product_price}\n\n **Product Color:** {product_color}\n\n\n.The banner should follow the {layout} layout\n ###Layout Description:\n\n {layout_description}.\n\n\n##Instructions:\n\n 1. Create a banner in condensed fabric js format, which have following important keys for given layer type: \n{json.dumps(important_fields)}.\n2. Focus on placement of layers to give a beautiful banner in given layout, with proper spacing between each layer.  \n    2.1 Carefully use *top*(y coordinate of top-left of the layer), *left*(x coordinate of top-left of the layer), *width*(width of the layer), *height*(height of the layer) keys to adjust placement. \n    2.2 Make sure no two text layers overlap each other and entire banner is visible in 1080*1080 canvas.  \n 3.You must strictly choose fontFamily for the text layers from the following list: {json.dumps(fontFamilyList)}.\n\n\n Have following output format:\n{output_format}\n\n .Think step by step and then create the banner."
+    if OUTPUT_CODEC == "compact":
+        input_text += "\n\n" + format_instructions()
+    return input_text
+
+
+def json_dataset(data):
+    conversations=[]
+    for item in data:
+        product_name = item['input'].get("product_details", "").get("name", "") or "Product Name Not Available"
+        layout = item['input'].get("layout", "centered_hero")
+        input_text = build_input_text(item)
         
         
         reasoning_text = f"Let me think step-by-step for creating a 1080*1080 banner for the product: {product_name}. I have to make sure that no two text layers overlap, and maintain proportional spacing between each layer to support a natural visual flow for the viewer, following the layout, {layout}. The text must be readable, with contrasting color to the background, with suitable svg for the background. Let me give an overview of the banner: \n\n"+ item['banner_details']+ "\nNow I will create the banner."
         
         
-        output_text = f'{json.dumps(item["output"])}'
+        output_text = encode(item["output"]) if OUTPUT_CODEC == "compact" else json.dumps(item["output"])
 
         with open("input_text.txt", "w") as f:
             f.write(input_text)
@@ -141,9 +160,14 @@ def data_prep(data, tokenizer):
     combined_dataset = combined_dataset.shuffle(seed=42)
     return combined_dataset
 
+# BASE_MODEL=unsloth/Qwen3-0.6B OUTPUT_DIR=model_draft trains the draft model for speculative decoding
+BASE_MODEL = os.getenv("BASE_MODEL", "unsloth/Qwen3-14B")
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "model")
+
+
 def load_model():
     model, tokenizer = FastLanguageModel.from_pretrained(
-        model_name="unsloth/Qwen3-14B",
+        model_name=BASE_MODEL,
         max_seq_length=8192,
         load_in_4bit=True,
         load_in_8bit=False,
@@ -164,23 +188,40 @@ def load_model():
     )
     return model, tokenizer
 
-def main():
-    # Load data from environment
-    model, tokenizer = load_model()
-    data_path = "final_data"     
-    training_data = [] 
-    eval_data=[]
-    layouts = {"centered_hero": 0, "minimalist_center": 0, "circular_focus": 0, "split_vertical": 0, "grid_four": 0, "z_pattern": 0, "frame_layout": 0, "diagonal_split": 0}
-    for file in os.listdir(data_path):
+LAYOUTS = ["centered_hero", "minimalist_center", "circular_focus", "split_vertical", "grid_four", "z_pattern", "frame_layout", "diagonal_split"]
+
+
+def split_data(data_path="final_data", eval_per_layout=4):
+    """
+    Split final_data into training and eval records
+
+    Files are read in numeric order, so the eval split (the first eval_per_layout
+    records of every layout) is the same on every machine and for the eval runner.
+    Other files, like the builder's .manifest.json, are ignored.
+
+    Returns:
+        tuple: (training_data, eval_data)
+    """
+    training_data = []
+    eval_data = []
+    layouts = {layout: 0 for layout in LAYOUTS}
+    files = [f for f in os.listdir(data_path) if f.endswith(".json") and f.split(".")[0].isdigit()]
+    for file in sorted(files, key=lambda x: int(x.split(".")[0])):
         with open(os.path.join(data_path, file), "r") as f:
             json_data = json.load(f)
             layout = json_data["input"]["layout"]
             assert layout in layouts, f"Layout {layout} not found in layouts"
             layouts[layout] += 1
-            if layouts[layout] <  5:
+            if layouts[layout] <= eval_per_layout:
                 eval_data.append(json_data)
             else:
                 training_data.append(json_data)
+    return training_data, eval_data
+
+def main():
+    # Load data from environment
+    model, tokenizer = load_model()
+    training_data, eval_data = split_data("final_data")
 
     dataset = data_prep(training_data, tokenizer)
     eval_dataset = data_prep(eval_data, tokenizer)
@@ -192,7 +233,7 @@ def main():
         train_dataset=dataset,
         eval_dataset=eval_dataset,
         args=SFTConfig(
-            output_dir="model",
+            output_dir=OUTPUT_DIR,
             dataset_text_field="text",
             per_device_train_batch_size=2,#batch size per device
             gradient_accumulation_steps=4,#gradient accumulation steps
@@ -1,22 +1,28 @@
-import openai
-import os
 import re
 from dotenv import load_dotenv
+from banner_utils.rate_limiter import call_with_backoff
+from banner_utils.clients import get_openai_client
 load_dotenv()
 
-def get_color_pallete(product_url):
+# Returned by get_color_pallete when the palette call fails
+FALLBACK_COLOR_PALLETE = "This product features a neutral color palette with earthy tones including warm browns, beiges, and cream colors. The design incorporates subtle variations of tan and taupe shades that create a sophisticated and timeless appearance."
+
+
+def get_color_pallete(product_url, raise_errors=False):
     """
     Extract color palette from a product image URL using OpenAI GPT-4 Vision.
     
     Args:
         product_url (str): URL of the product image
+        raise_errors (bool): Raise when the call fails instead of returning
+            FALLBACK_COLOR_PALLETE (for callers that store the palette)
         
     Returns:
-        list: A list of dominant colors in the product image
+        str: Description of the color palette of the product image
     """
     try:
-        # Initialize OpenAI client
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Shared OpenAI client
+        client = get_openai_client()
         
         # Create the prompt for color palette extraction
         prompt = """
@@ -30,7 +36,9 @@ def get_color_pallete(product_url):
         """
         
         # Make API call to OpenAI
-        response = client.chat.completions.create(
+        response = call_with_backoff(
+            "openai",
+            client.chat.completions.create,
             model="chatgpt-4o-latest",
             messages=[
                 {
@@ -60,8 +68,10 @@ def get_color_pallete(product_url):
         return color_palette_text
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error processing image {product_url}: {str(e)}")
-        return "This product features a neutral color palette with earthy tones including warm browns, beiges, and cream colors. The design incorporates subtle variations of tan and taupe shades that create a sophisticated and timeless appearance."\
+        return FALLBACK_COLOR_PALLETE
 
 
 
@@ -3,10 +3,13 @@ import traceback
 from pathlib import Path
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 print(sys.path)
 from banner_utils.scrapper_api import RapidAPIClient
 from banner_utils.image_processor import ImageProcessor
+from banner_utils.product_cache import get_product_cache
+from banner_utils.marketplaces import get_adapter
 
 class AmazonScraper:
     def __init__(self):
@@ -18,34 +21,88 @@ class AmazonScraper:
     def extract_product_details(self, url, marketplace, banner_width, banner_height):
         """Extract product details using Oxylabs API and process images"""
         try:
-            # Get product details from Oxylabs
+            # Get product details from the marketplace scraper
             product_details = self.rapidapi_client.get_product_details(url, marketplace)
-            # Create output directory for this product
-            output_dir = self.output_base_dir / product_details['product_id']
-            output_dir.mkdir(exist_ok=True)
-            
-            # Process image if available
-            if product_details.get('main_image'):
-                try:
-                    # Process image to remove background
-                    processed_image_url = self.image_processor.process_image_url(product_details['main_image'], banner_width, banner_height)
-                    product_details['main_image'] = processed_image_url
-                except Exception as e:
-                    print(f"Error processing image: {str(e)}")
-                    traceback_msg = traceback.format_exc()
-                    print(traceback_msg)
-                    # Keep original image URL if processing fails
-            
-            # Save data to JSON file
-            self._save_product_details(output_dir, product_details)
-            
-            return product_details
+            return self._finish_product(product_details, marketplace, banner_width, banner_height)
 
         except Exception as e:
             print(f"Error during extraction: {str(e)}")
             traceback.print_exc()
             raise
 
+    def extract_many_product_details(self, urls, marketplace, banner_width, banner_height,
+                                     concurrency=16, per_host_limit=4):
+        """
+        Extract product details for many URLs: the scraper calls run concurrently (capped
+        per RapidAPI host), then the images are processed by a thread pool
+
+        Returns:
+            List in the order of urls holding product details, or the exception for failed URLs
+        """
+        scraped = self.rapidapi_client.get_many_product_details(
+            urls, [marketplace] * len(urls), concurrency=concurrency, per_host_limit=per_host_limit
+        )
+
+        def finish(product_details):
+            if isinstance(product_details, Exception):
+                return product_details
+            try:
+                return self._finish_product(product_details, marketplace, banner_width, banner_height)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            return list(executor.map(finish, scraped))
+
+    @staticmethod
+    def _processed_cache_key(product_details, marketplace, banner_width, banner_height):
+        """
+        Key of the processed image in the product cache, None when the product has no real ID
+
+        The image is cropped to the banner size, so the size is part of the key, and the
+        marketplace keeps equal IDs from different marketplaces apart.
+        """
+        product_id = product_details.get('product_id')
+        if not product_id or product_id in ('N/A', 'None'):
+            return None
+        marketplace = get_adapter(product_details.get('url') or '', marketplace).name
+        return f"{marketplace}:{product_id}:{banner_width}x{banner_height}"
+
+    def _finish_product(self, product_details, marketplace, banner_width, banner_height):
+        """Remove the image background and save the product details"""
+        source_image = product_details.get('main_image')
+        
+        # Reuse the processed image when this product image was processed before for this banner size
+        cache = get_product_cache()
+        cache_key = self._processed_cache_key(product_details, marketplace, banner_width, banner_height)
+        processed = None
+        if cache is not None and cache_key and source_image:
+            processed, _ = cache.get(cache_key, namespace='processed')
+        
+        if processed and processed.get('source_image') == source_image:
+            product_details['main_image'] = processed['main_image']
+        elif source_image:
+            # Process image if available
+            try:
+                # Process image to remove background
+                processed_image_url = self.image_processor.process_image_url(product_details['main_image'], banner_width, banner_height)
+                product_details['main_image'] = processed_image_url
+                if cache is not None and cache_key:
+                    cache.put(cache_key, {'source_image': source_image, 'main_image': processed_image_url},
+                              namespace='processed')
+            except Exception as e:
+                print(f"Error processing image: {str(e)}")
+                traceback_msg = traceback.format_exc()
+                print(traceback_msg)
+                # Keep original image URL if processing fails
+        
+        # Save data to JSON file
+        output_dir = self.output_base_dir / product_details['product_id']
+        output_dir.mkdir(exist_ok=True)
+        self._save_product_details(output_dir, product_details)
+        
+        return product_details
+
     def _save_product_details(self, output_dir, product_details):
         """Save product details to JSON file"""
         try:
@@ -60,23 +117,8 @@ class AmazonScraper:
 
 
 
-def extract_amazon_product_details(amazon_url):
-    """
-    Extract product details from an Amazon URL
-    
-    Args:
-        amazon_url (str): Amazon product URL
-        
-    Returns:
-        tuple: (product_name, product_description, product_price, image_url)
-    """
-    scraper = AmazonScraper()
-    # Default values for banner dimensions and marketplace
-    banner_width = 1080
-    banner_height = 1080
-    marketplace = "US"  # Default to US marketplace
-    
-    product_details = scraper.extract_product_details(amazon_url, marketplace, banner_width, banner_height)
+def _to_row_values(product_details):
+    """(product_name, product_description, product_price, image_url) for a product details dict"""
     product_name = product_details.get('product_name', '')
     product_description = product_details.get('description', '')
     product_price = product_details.get('price', '')
@@ -107,14 +149,22 @@ def extract_amazon_product_details(amazon_url):
     marketplace = "US"  # Default to US marketplace
     
     product_details = scraper.extract_product_details(amazon_url, marketplace, banner_width, banner_height)
-    product_name = product_details.get('product_name', '')
-    product_description = product_details.get('description', '')
-    product_price = product_details.get('price', '')
-    image_url = product_details.get('main_image', '')
-    
-    if isinstance(product_price, dict) and 'value' in product_price:
-        product_price = str(product_price['value'])
-    elif isinstance(product_price, (int, float)):
-        product_price = str(product_price)
+    return _to_row_values(product_details)
+
+
+def extract_many_amazon_product_details(urls, concurrency=16, per_host_limit=4):
+    """
+    Batch version of extract_amazon_product_details
     
-    return product_name, product_description, product_price, image_url
+    Args:
+        urls (list): Product URLs
+        concurrency (int): Scraper calls and image jobs in flight
+        per_host_limit (int): Scraper calls in flight per RapidAPI host
+        
+    Returns:
+        list: In the order of urls, a (product_name, product_description, product_price, image_url)
+        tuple per URL, or the exception for URLs that failed
+    """
+    scraper = AmazonScraper()
+    results = scraper.extract_many_product_details(urls, "US", 1080, 1080, concurrency, per_host_limit)
+    return [r if isinstance(r, Exception) else _to_row_values(r) for r in results]
@@ -0,0 +1,173 @@
+"""
+Lazy, memoized access to the static assets (fonts.json and layout.json).
+
+Nothing is read at import. The first call for a language parses fonts.json once and
+writes every language to its own pickle under ASSET_CACHE_DIR, so later processes
+load only the language they ask for (the english map instead of all 28 scripts,
+about 9,000 fonts) without parsing JSON. A pickle is rebuilt whenever its source
+file changes. Configurable through the environment:
+
+    ASSETS_DIR        folder with fonts.json and layout.json (default <repo>/assets)
+    ASSET_CACHE_DIR   folder for the pickles (default <ASSETS_DIR>/.cache)
+    ASSET_CACHE       set to "off" to always read the JSON files
+
+Run from the testing/ directory to build the cache and compare load times:
+    python banner_utils/assets.py
+"""
+import json
+import os
+import pickle
+import threading
+from functools import lru_cache
+from typing import Dict, List
+
+ASSETS_DIR = os.getenv(
+    "ASSETS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "assets")
+)
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(ASSETS_DIR, ".cache"))
+ASSET_CACHE_ENABLED = os.getenv("ASSET_CACHE", "on").lower() not in ("off", "0", "false")
+
+FONTS_FILE = os.path.join(ASSETS_DIR, "fonts.json")
+LAYOUT_FILE = os.path.join(ASSETS_DIR, "layout.json")
+
+# Bump when the pickled layout changes
+_CACHE_FORMAT = 1
+
+_build_lock = threading.Lock()
+
+
+def _source_stamp(path: str) -> tuple:
+    stat = os.stat(path)
+    return (_CACHE_FORMAT, stat.st_mtime_ns, stat.st_size)
+
+
+def _cache_path(name: str) -> str:
+    return os.path.join(ASSET_CACHE_DIR, f"{name}.pickle")
+
+
+def _read_cache(name: str, stamp: tuple):
+    """Cached value if it was built from the current source file, else None"""
+    try:
+        with open(_cache_path(name), "rb") as f:
+            cached_stamp, value = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+    return value if cached_stamp == stamp else None
+
+
+def _write_cache(name: str, stamp: tuple, value):
+    try:
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        temp_path = f"{_cache_path(name)}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump((stamp, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, _cache_path(name))
+    except OSError as e:
+        # Read-only checkout: keep working from the JSON
+        print(f"Could not write asset cache {name}: {e}")
+
+
+def _load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _build_font_cache() -> Dict[str, Dict[str, str]]:
+    """Parse fonts.json once and pickle each language separately"""
+    fonts = _load_json(FONTS_FILE)
+    if ASSET_CACHE_ENABLED:
+        stamp = _source_stamp(FONTS_FILE)
+        _write_cache("font_languages", stamp, list(fonts))
+        for language, font_map in fonts.items():
+            _write_cache(f"fonts_{language}", stamp, font_map)
+    return fonts
+
+
+def _load_font_asset(name: str, pick):
+    if ASSET_CACHE_ENABLED:
+        value = _read_cache(name, _source_stamp(FONTS_FILE))
+        if value is not None:
+            return value
+    with _build_lock:
+        # Another thread may have built the cache while this one waited
+        if ASSET_CACHE_ENABLED:
+            value = _read_cache(name, _source_stamp(FONTS_FILE))
+            if value is not None:
+                return value
+        return pick(_build_font_cache())
+
+
+@lru_cache(maxsize=None)
+def get_fonts(language: str = "english") -> Dict[str, str]:
+    """
+    Font family -> font url map for one language
+
+    Args:
+        language (str): Key of fonts.json ("english", "hindi", "japanese", ...)
+
+    Returns:
+        dict: The shared, memoized map; treat it as read-only
+    """
+    fonts = _load_font_asset(f"fonts_{language}", lambda all_fonts: all_fonts.get(language))
+    if fonts is None:
+        raise KeyError(f"No fonts for language {language}")
+    return fonts
+
+
+@lru_cache(maxsize=None)
+def get_font_names(language: str = "english") -> List[str]:
+    """Font family names for one language, in fonts.json order"""
+    return list(get_fonts(language))
+
+
+@lru_cache(maxsize=1)
+def get_languages() -> List[str]:
+    """Languages available in fonts.json"""
+    return _load_font_asset("font_languages", list)
+
+
+@lru_cache(maxsize=1)
+def get_layouts() -> Dict[str, List[str]]:
+    """Layout name -> description lines from layout.json"""
+    if ASSET_CACHE_ENABLED:
+        stamp = _source_stamp(LAYOUT_FILE)
+        layouts = _read_cache("layouts", stamp)
+        if layouts is None:
+            layouts = _load_json(LAYOUT_FILE)
+            _write_cache("layouts", stamp, layouts)
+        return layouts
+    return _load_json(LAYOUT_FILE)
+
+
+def get_layout_description(layout: str) -> str:
+    """Layout description as it goes in the prompt"""
+    return " ".join(get_layouts()[layout])
+
+
+def clear_memoized():
+    """Forget the loaded assets, e.g. after editing the JSON files in a running process"""
+    for accessor in (get_fonts, get_font_names, get_languages, get_layouts):
+        accessor.cache_clear()
+
+
+def main():
+    """Build the cache and compare JSON and pickle load times for the english fonts"""
+    import time
+
+    start_time = time.perf_counter()
+    _load_json(FONTS_FILE)["english"]
+    json_ms = 1000 * (time.perf_counter() - start_time)
+
+    _build_font_cache()
+    get_layouts()
+
+    start_time = time.perf_counter()
+    english = _read_cache("fonts_english", _source_stamp(FONTS_FILE))
+    pickle_ms = 1000 * (time.perf_counter() - start_time)
+
+    print(f"Asset cache in {ASSET_CACHE_DIR}")
+    print(f"english fonts ({len(english)}): fonts.json {json_ms:.1f} ms, pickle {pickle_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
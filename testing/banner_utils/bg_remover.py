@@ -0,0 +1,275 @@
+"""
+Batching client for the background removal model.
+
+The model endpoint takes an "instances" list, so concurrent callers are coalesced into
+multi-instance requests: submit() queues an image and returns a Future, and a dispatcher
+thread sends queued images as soon as one of the max_in_flight request slots is free.
+While every slot is busy, new images pile up in the queue and go out together in the
+next request (up to the batch limits), so a lone caller is never delayed and a busy one
+gets batches. Images are sent as JPEG (or WebP) instead of PNG; the model only needs the
+pixels and the payload shrinks several times. Configurable through the environment:
+
+    BG_REMOVER_URL          model endpoint
+    BG_REMOVER_BATCH_SIZE   images per request (default 8)
+    BG_REMOVER_MAX_WAIT     extra seconds to wait for a batch to fill once a slot is free (default 0)
+    BG_REMOVER_FORMAT       JPEG, WEBP or PNG (default JPEG)
+
+Run from the testing/ directory to compare batched and one-image requests on a local mock:
+    python banner_utils/bg_remover.py
+"""
+import base64
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import List
+
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banner_utils.clients import http_request
+from banner_utils.rate_limiter import call_with_backoff, raise_for_retryable_status
+
+BG_REMOVER_URL = os.getenv(
+    "BG_REMOVER_URL", "https://static-aws-ml1.phot.ai/v1/models/transparent-bgremover-model:predict"
+)
+BG_REMOVER_BATCH_SIZE = int(os.getenv("BG_REMOVER_BATCH_SIZE", "8"))
+BG_REMOVER_MAX_WAIT = float(os.getenv("BG_REMOVER_MAX_WAIT", "0"))
+BG_REMOVER_FORMAT = os.getenv("BG_REMOVER_FORMAT", "JPEG")
+
+# Marks the end of the dispatcher's queue
+_STOP = object()
+
+
+class _MaskRequest:
+    def __init__(self, payload: str, size: tuple):
+        self.payload = payload
+        self.size = size
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class BackgroundRemoverClient:
+    """
+    Coalesces concurrent mask requests into multi-instance calls.
+
+    Each instance gets its own result: an instance the model fails on is retried once
+    on its own before its Future gets an exception, without failing the rest of the
+    batch. When a whole multi-instance request fails (a 400/413 caused by one bad or
+    oversized image, or a network error), every image is resent on its own, so only the
+    images that fail alone get an exception. If the endpoint answers a multi-instance
+    request with a single result, the client falls back to one image per request.
+    """
+
+    def __init__(self,
+                 url: str = BG_REMOVER_URL,
+                 max_batch_size: int = BG_REMOVER_BATCH_SIZE,
+                 max_batch_bytes: int = 8 * 1024 * 1024,
+                 max_wait: float = BG_REMOVER_MAX_WAIT,
+                 payload_format: str = BG_REMOVER_FORMAT,
+                 quality: int = 90,
+                 max_in_flight: int = 4,
+                 timeout: float = 120.0):
+        """
+        Args:
+            url (str): Model endpoint
+            max_batch_size (int): Maximum images per request
+            max_batch_bytes (int): Maximum base64 payload bytes per request
+            max_wait (float): Extra seconds the oldest queued image waits for the batch to fill
+            payload_format (str): JPEG, WEBP or PNG
+            quality (int): JPEG/WebP quality
+            max_in_flight (int): Concurrent requests
+            timeout (float): Request timeout in seconds
+        """
+        self.url = url
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_bytes = max_batch_bytes
+        self.max_wait = max_wait
+        self.payload_format = payload_format.upper()
+        self.quality = quality
+        self.timeout = timeout
+        self.requests_sent = 0
+        self.instances_sent = 0
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(max(1, max_in_flight))
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="bg-remover")
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def encode(self, img: Image.Image) -> str:
+        """Base64 payload for an image in the configured format"""
+        buffer = BytesIO()
+        if self.payload_format == "PNG":
+            img.save(buffer, format="PNG")
+        else:
+            # JPEG has no alpha; the model only looks at the colors
+            img.convert("RGB").save(buffer, format=self.payload_format, quality=self.quality)
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    def submit(self, img: Image.Image) -> Future:
+        """
+        Queue an image for background removal
+
+        Returns:
+            Future resolving to the mask as a PIL image of the same size as img
+        """
+        request = _MaskRequest(self.encode(img), img.size)
+        self._queue.put(request)
+        return request.future
+
+    def get_mask(self, img: Image.Image, timeout: float = None) -> Image.Image:
+        """Blocking submit"""
+        return self.submit(img).result(timeout)
+
+    def close(self):
+        """Send what is queued, then stop the dispatcher"""
+        self._queue.put(_STOP)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def _dispatch(self):
+        pending = None
+        while True:
+            request = pending if pending is not None else self._queue.get()
+            pending = None
+            if request is _STOP:
+                return
+            # Wait for a free request slot; meanwhile the queue collects the next batch
+            self._slots.acquire()
+            batch, batch_bytes = [request], len(request.payload)
+            deadline = request.queued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is _STOP or batch_bytes + len(request.payload) > self.max_batch_bytes:
+                    pending = request  # starts the next batch (or stops after this one)
+                    break
+                batch.append(request)
+                batch_bytes += len(request.payload)
+            self._executor.submit(self._send, batch)
+
+    def _post(self, batch: List[_MaskRequest]) -> dict:
+        data = {"instances": [{"image": {"b64": request.payload}} for request in batch]}
+
+        def send():
+            response = http_request("POST", self.url, json=data, timeout=self.timeout)
+            raise_for_retryable_status(response)
+            # A 4xx body must not be mistaken for a single-instance answer
+            response.raise_for_status()
+            return response
+
+        response = call_with_backoff("bg_remover", send)
+        self.requests_sent += 1
+        self.instances_sent += len(batch)
+        return json.loads(response.text)
+
+    def _send(self, batch: List[_MaskRequest]):
+        try:
+            self._send_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _send_batch(self, batch: List[_MaskRequest]):
+        resend = False
+        try:
+            results = self._split_response(self._post(batch), len(batch))
+            if results is None:
+                # Endpoint ignored the extra instances: send one image per request from now on
+                print(f"Background remover returned one result for {len(batch)} images, disabling batching")
+                self.max_batch_size = 1
+                results, resend = [None] * len(batch), True
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            # Probably one bad or oversized image: find it by sending each image alone
+            print(f"Background remover batch of {len(batch)} images failed ({e}), sending them one by one")
+            results, resend = [None] * len(batch), True
+
+        for request, result in zip(batch, results):
+            if result is None:
+                # Retry once, on its own
+                if not resend:
+                    print("First attempt FAILED, retrying...")
+                try:
+                    result = self._split_response(self._post([request]), 1)[0]
+                except Exception as e:
+                    request.future.set_exception(e)
+                    continue
+            if result is None:
+                request.future.set_exception(Exception("Background removal failed after retry"))
+            else:
+                self._resolve(request, result)
+
+    @staticmethod
+    def _split_response(response: dict, count: int):
+        """
+        Per-instance output_image payloads (None where the model failed), or None when a
+        multi-instance request got a single-instance answer
+        """
+        predictions = response.get("predictions")
+        if isinstance(predictions, list) and len(predictions) == count:
+            return [p.get("output_image") if isinstance(p, dict) else p for p in predictions]
+        if count == 1:
+            return [response.get("output_image")]
+        return None
+
+    @staticmethod
+    def _resolve(request: _MaskRequest, output_image: str):
+        try:
+            mask = Image.open(BytesIO(base64.b64decode(output_image)))
+            if mask.size != request.size:
+                mask = mask.resize(request.size)
+            request.future.set_result(mask)
+        except Exception as e:
+            request.future.set_exception(e)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_background_remover() -> BackgroundRemoverClient:
+    """Process-wide client, so every ImageProcessor shares the batches"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = BackgroundRemoverClient()
+    return _client
+
+
+def main():
+    """Compare batched and one-image-per-request calls against the local mock server"""
+    import argparse
+    from test_scripts.stand_ins import StandInBgRemoverServer, make_test_photo
+
+    parser = argparse.ArgumentParser(description='Run the batching background remover against a mock server')
+    parser.add_argument('--images', type=int, default=64, help='Images to process')
+    parser.add_argument('--callers', type=int, default=16, help='Concurrent callers')
+    args = parser.parse_args()
+    os.environ.setdefault('RATE_LIMIT_BG_REMOVER', '1000')
+
+    images = [make_test_photo(640, 640, seed=i) for i in range(args.images)]
+    with StandInBgRemoverServer() as server:
+        print(f"{'mode':<10}{'requests':>10}{'payload MB':>12}{'wall s':>9}")
+        for label, batch_size, payload_format in (("png x1", 1, "PNG"), ("jpeg x8", 8, "JPEG")):
+            server.reset()
+            client = BackgroundRemoverClient(server.url, max_batch_size=batch_size, payload_format=payload_format)
+            start_time = time.perf_counter()
+            with ThreadPoolExecutor(args.callers) as callers:
+                masks = list(callers.map(client.get_mask, images))
+            wall_time = time.perf_counter() - start_time
+            client.close()
+            assert all(mask.size == image.size for mask, image in zip(masks, images))
+            print(f"{label:<10}{client.requests_sent:>10}{server.bytes_received / 1024 / 1024:>12.2f}{wall_time:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
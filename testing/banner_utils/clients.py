@@ -0,0 +1,115 @@
+"""
+Shared, lazily created clients for the external services used by banner_utils.
+
+Building a requests.Session, an OpenAI client or a boto3 S3 client is expensive (new
+connection pool, TLS handshakes, credential resolution), so every helper gets them
+from here instead of creating one per call. The OpenAI and S3 clients are thread-safe;
+the requests.Session is not documented as such and is shared only under the rules in
+get_session(). Timeouts and pool sizes are configurable through the environment:
+
+    HTTP_TIMEOUT       connect/read timeout for plain HTTP calls in seconds (default 30)
+    HTTP_POOL_SIZE     keep-alive connections per host (default 32)
+    OPENAI_TIMEOUT     OpenAI request timeout in seconds (default 120)
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+
+_lock = threading.Lock()
+_session = None
+_openai_client = None
+_s3_clients = {}
+
+
+def get_session() -> requests.Session:
+    """
+    Keep-alive requests.Session shared by all helpers.
+
+    requests does not guarantee that a Session is thread-safe: its cookie jar, headers
+    and auth are mutable state shared by every request. The urllib3 connection pool
+    behind the adapter is thread-safe, so sharing the session across threads is only
+    safe for stateless calls. Go through http_get()/http_request() with per-call
+    headers, and never set cookies, headers or auth on the returned session; a helper
+    that needs session state should create its own requests.Session.
+
+    Connection errors and 502/503/504 on idempotent requests are retried by urllib3.
+    429s are left to banner_utils.rate_limiter so the backoff is shared per service.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                retry = Retry(
+                    total=3,
+                    connect=3,
+                    read=2,
+                    backoff_factor=0.5,
+                    status_forcelist=[502, 503, 504],
+                    allowed_methods=["GET", "HEAD"],
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """GET through the shared session with the default timeout"""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    return get_session().get(url, **kwargs)
+
+
+def http_request(method: str, url: str, **kwargs) -> requests.Response:
+    """Any request through the shared session with the default timeout"""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    return get_session().request(method, url, **kwargs)
+
+
+def get_openai_client():
+    """Singleton OpenAI client (its httpx pool keeps connections alive)"""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                import openai
+                _openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=OPENAI_TIMEOUT)
+    return _openai_client
+
+
+def get_s3_client(endpoint_url: str, aws_access_key_id: str, aws_secret_access_key: str):
+    """
+    S3 client for an endpoint and credential pair, created once.
+
+    boto3 clients are thread-safe (resources are not), so a single client serves
+    concurrent uploads.
+    """
+    key = (endpoint_url, aws_access_key_id)
+    if key not in _s3_clients:
+        with _lock:
+            if key not in _s3_clients:
+                import boto3
+                from botocore.config import Config
+                _s3_clients[key] = boto3.client(
+                    "s3",
+                    endpoint_url=endpoint_url,
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key,
+                    config=Config(
+                        max_pool_connections=HTTP_POOL_SIZE,
+                        connect_timeout=HTTP_TIMEOUT,
+                        read_timeout=HTTP_TIMEOUT,
+                        retries={"max_attempts": 3, "mode": "standard"},
+                    ),
+                )
+    return _s3_clients[key]
@@ -0,0 +1,239 @@
+"""
+Parallel, resumable builder for the condensed training data (training_data -> final_data).
+
+Layer condensing runs in a process pool, color palette calls run in a bounded async
+pool, and every finished record is written as soon as its palette arrives. A manifest
+in the output folder records the source hash, product image and palette of each
+written file, so a rerun only processes files whose source or condensing schema
+changed, and palettes are reused for product images that were already described.
+A file whose palette call fails is counted as failed and not written, so the next
+run retries it; the fallback palette is never stored.
+
+Run from the repository root:
+    python testing/banner_utils/create_condensed_data.py --workers 8 --palette-concurrency 8 --jsonl final_data.jsonl
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banner_utils.create_condensed_data import condense_record, important_fields, SCHEMA_REVISION
+from banner_utils.add_color_pallete import get_color_pallete, FALLBACK_COLOR_PALLETE
+
+MANIFEST_FILE = ".manifest.json"
+
+# Changes whenever the condensing rules change, which invalidates every output
+SCHEMA_VERSION = hashlib.sha256(
+    json.dumps([important_fields, SCHEMA_REVISION], sort_keys=True).encode()
+).hexdigest()[:16]
+
+
+def condense_source(path: str, known_hash: Optional[str]):
+    """
+    Process pool worker: hash a source file and condense it unless its hash is known
+
+    Returns:
+        tuple: (source hash, condensed record or None when unchanged, product image url)
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    source_hash = hashlib.sha256(raw).hexdigest()
+    if source_hash == known_hash:
+        return source_hash, None, None
+    data, product_url = condense_record(json.loads(raw), path)
+    return source_hash, data, product_url
+
+
+def _is_palette(product_color) -> bool:
+    """False for a missing palette or the fallback get_color_pallete returns on errors"""
+    return bool(product_color) and product_color != FALLBACK_COLOR_PALLETE
+
+
+def _sort_key(file: str):
+    stem = file.split(".")[0]
+    return (0, int(stem), file) if stem.isdigit() else (1, 0, file)
+
+
+class CondensedDataBuilder:
+    """Builds final_data from training_data with a process pool and a bounded palette pool"""
+
+    def __init__(self,
+                 source_folder: str = "training_data",
+                 output_folder: str = "final_data",
+                 workers: int = None,
+                 palette_concurrency: int = 8,
+                 jsonl_path: str = None,
+                 force: bool = False,
+                 palette_fn: Callable = partial(get_color_pallete, raise_errors=True),
+                 manifest_every: int = 50):
+        """
+        Args:
+            source_folder (str): Folder with the raw training records
+            output_folder (str): Folder for the condensed records and the manifest
+            workers (int): Condensing processes (default: CPU count)
+            palette_concurrency (int): Palette calls in flight
+            jsonl_path (str): Also write every output record, in file order, to this JSONL file
+            force (bool): Rebuild every file even if it is unchanged
+            palette_fn (Callable): palette_fn(product_url) -> product_color, raising on failure
+            manifest_every (int): Save the manifest after this many written files
+        """
+        self.source_folder = source_folder
+        self.output_folder = output_folder
+        self.workers = workers or os.cpu_count() or 1
+        self.palette_concurrency = max(1, palette_concurrency)
+        self.jsonl_path = jsonl_path
+        self.force = force
+        self.palette_fn = palette_fn
+        self.manifest_every = max(1, manifest_every)
+        self.manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+        self.stats = {'written': 0, 'skipped': 0, 'failed': 0, 'palette_calls': 0, 'palettes_reused': 0}
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        else:
+            manifest = {'schema': SCHEMA_VERSION, 'files': {}}
+        if manifest.get('schema') != SCHEMA_VERSION:
+            # Outputs are stale, but their palettes are still valid for the same product image
+            manifest = {'schema': SCHEMA_VERSION, 'files': {}, 'previous_files': manifest.get('files', {})}
+        return manifest
+
+    def _save_manifest(self, manifest: Dict):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    @staticmethod
+    def _known_palettes(manifest: Dict) -> Dict[str, str]:
+        palettes = {}
+        for entries in (manifest.get('previous_files', {}), manifest['files']):
+            for entry in entries.values():
+                if entry.get('product_url') and _is_palette(entry.get('product_color')):
+                    palettes[entry['product_url']] = entry['product_color']
+        return palettes
+
+    async def _build_file(self, file: str, manifest: Dict, palettes: Dict, palette_tasks: Dict,
+                          pool: ProcessPoolExecutor, palette_limit: asyncio.Semaphore):
+        entry = manifest['files'].get(file)
+        output_path = os.path.join(self.output_folder, file)
+        known_hash = None
+        if entry and not self.force and os.path.exists(output_path) and _is_palette(entry.get('product_color')):
+            # Files written with the fallback palette by older builds are rebuilt
+            known_hash = entry['hash']
+        loop = asyncio.get_running_loop()
+        try:
+            source_hash, data, product_url = await loop.run_in_executor(
+                pool, condense_source, os.path.join(self.source_folder, file), known_hash
+            )
+            if data is None:
+                self.stats['skipped'] += 1
+                return
+
+            if product_url in palettes or product_url in palette_tasks:
+                self.stats['palettes_reused'] += 1
+            if product_url not in palettes:
+                # One call per product image, shared by files using the same image
+                if product_url not in palette_tasks:
+                    palette_tasks[product_url] = asyncio.ensure_future(self._palette(product_url, palette_limit))
+                palettes[product_url] = await palette_tasks[product_url]
+            data['product_color'] = palettes[product_url]
+
+            with open(output_path, "w") as f:
+                json.dump(data, f)
+            manifest['files'][file] = {'hash': source_hash, 'product_url': product_url,
+                                       'product_color': data['product_color']}
+            self.stats['written'] += 1
+            if self.stats['written'] % self.manifest_every == 0:
+                self._save_manifest(manifest)
+        except Exception as e:
+            print(f"Error creating condensed data for {file}: {e}")
+            self.stats['failed'] += 1
+
+    async def _palette(self, product_url: str, palette_limit: asyncio.Semaphore):
+        async with palette_limit:
+            self.stats['palette_calls'] += 1
+            palette = await asyncio.to_thread(self.palette_fn, product_url)
+        if not _is_palette(palette):
+            raise ValueError(f"No color palette for {product_url}")
+        return palette
+
+    async def run(self) -> Dict[str, int]:
+        """
+        Build every changed file
+
+        Returns:
+            Dictionary with written, skipped, failed, palette_calls and palettes_reused counts
+        """
+        os.makedirs(self.output_folder, exist_ok=True)
+        files = sorted((f for f in os.listdir(self.source_folder) if f.endswith(".json")), key=_sort_key)
+        manifest = self._load_manifest()
+        palettes = self._known_palettes(manifest)
+        palette_tasks = {}
+        palette_limit = asyncio.Semaphore(self.palette_concurrency)
+        start_time = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            await asyncio.gather(*[
+                self._build_file(file, manifest, palettes, palette_tasks, pool, palette_limit)
+                for file in files
+            ])
+        manifest.pop('previous_files', None)
+        self._save_manifest(manifest)
+
+        if self.jsonl_path:
+            self.write_jsonl(files)
+
+        print(f"{len(files)} files in {time.perf_counter() - start_time:.1f}s: {self.stats}")
+        return self.stats
+
+    def run_sync(self) -> Dict[str, int]:
+        return asyncio.run(self.run())
+
+    def write_jsonl(self, files: List[str]):
+        """Concatenate the output records, in file order, into one JSONL file, skipping records without a palette"""
+        temp_path = f"{self.jsonl_path}.tmp"
+        with open(temp_path, "w") as out:
+            for file in files:
+                output_path = os.path.join(self.output_folder, file)
+                if not os.path.exists(output_path):
+                    continue
+                with open(output_path, "r") as f:
+                    record = json.load(f)
+                if not _is_palette(record.get('product_color')):
+                    continue
+                out.write(json.dumps(record) + "\n")
+        os.replace(temp_path, self.jsonl_path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the condensed training data')
+    parser.add_argument('--source', default='training_data', help='Folder with the raw training records')
+    parser.add_argument('--output', default='final_data', help='Output folder')
+    parser.add_argument('--workers', type=int, default=None, help='Condensing processes (default: CPU count)')
+    parser.add_argument('--palette-concurrency', type=int, default=8, help='Palette calls in flight')
+    parser.add_argument('--jsonl', default=None, help='Also write all records to this JSONL file')
+    parser.add_argument('--force', action='store_true', help='Rebuild unchanged files too')
+    args = parser.parse_args()
+
+    CondensedDataBuilder(
+        args.source,
+        args.output,
+        workers=args.workers,
+        palette_concurrency=args.palette_concurrency,
+        jsonl_path=args.jsonl,
+        force=args.force,
+    ).run_sync()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Font lookup that tolerates the fontFamily spellings the model produces.
+
+The model often writes "League Spartan-Bold", "league spartan bold" or
+"League Spartan 700" for "League Spartan Bold", and a miss leaves the layer with
+the template font. FontIndex resolves a family in these steps:
+
+1. exact name
+2. normalized name: casefolded, punctuation and spaces dropped, numeric weights
+   spelled out, and "Regular" optional
+3. family match: the name without its trailing weight and style words (the family
+   stem) names a family, and the face of that family closest in weight is used, so
+   "Playfair Display SemiBold" is "Playfair Display Bold", not another family's
+   SemiBold-looking face
+4. trigram similarity over the family stems, for typos in the family, then the same
+   weight pick
+5. trigram similarity over the full names, only when no family is close enough
+
+Resolved (and unresolved) spellings are memoized in an LRU cache, so a repeated
+family costs one dict lookup and arbitrary model strings cannot grow it unbounded.
+"""
+import os
+import math
+import re
+import sys
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banner_utils.assets import get_fonts
+
+_WEIGHT_NAMES = {
+    "100": "thin", "200": "extralight", "300": "light", "400": "regular", "500": "medium",
+    "600": "semibold", "700": "bold", "800": "extrabold", "900": "black",
+    "normal": "regular", "book": "regular", "demibold": "semibold", "heavy": "black",
+}
+_WEIGHTS = {
+    "thin": 100, "extralight": 200, "light": 300, "regular": 400, "medium": 500,
+    "semibold": 600, "bold": 700, "extrabold": 800, "black": 900,
+}
+_WEIGHT_ALIASES = {"ultralight": "extralight", "ultrabold": "extrabold", "hairline": "thin"}
+_WEIGHT_PREFIXES = ("extra", "ultra", "semi", "demi")
+_STYLES = {"italic", "oblique"}
+_TOKEN = re.compile(r"[0-9]+|[^\W\d_]+")
+
+
+def normalize_family(family: str) -> str:
+    """'League Spartan-Bold' and 'league spartan 700' -> 'leaguespartanbold'"""
+    tokens = _TOKEN.findall(family.casefold())
+    return "".join(_WEIGHT_NAMES.get(token, token) for token in tokens)
+
+
+def split_family(family: str) -> Tuple[str, Optional[int], bool]:
+    """
+    Split a name into (family stem, weight, italic), reading weight and style words from the end
+
+    'Playfair Display Semi Bold Italic' -> ('playfairdisplay', 600, True); the weight
+    is None when the name gives none. Only trailing words count, so 'Black Ops One'
+    keeps 'black' in its stem.
+    """
+    tokens = [_WEIGHT_NAMES.get(token, token) for token in _TOKEN.findall(family.casefold())]
+    weight, italic = None, False
+    while len(tokens) > 1:
+        token = _WEIGHT_ALIASES.get(tokens[-1], tokens[-1])
+        if token in _STYLES:
+            italic = True
+        elif token in _WEIGHTS and weight is None:
+            tokens.pop()
+            if len(tokens) > 1 and tokens[-1] in _WEIGHT_PREFIXES:
+                combined = _WEIGHT_NAMES.get(tokens[-1] + token, tokens[-1] + token)
+                combined = _WEIGHT_ALIASES.get(combined, combined)
+                if combined in _WEIGHTS:
+                    token = combined
+                    tokens.pop()
+            weight = _WEIGHTS[token]
+            continue
+        else:
+            break
+        tokens.pop()
+    return "".join(tokens), weight, italic
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrigramMatcher:
+    """Best trigram Dice match among a fixed list of keys"""
+
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self._key_trigrams = [frozenset(_trigrams(key)) for key in keys]
+        self._postings = defaultdict(list)
+        for position, trigrams in enumerate(self._key_trigrams):
+            for trigram in trigrams:
+                self._postings[trigram].append(position)
+
+    def best(self, key: str, min_similarity: float) -> Optional[str]:
+        # A key with Dice similarity >= s shares at least s*|q|/(2-s) trigrams with the
+        # query, so it contains one of the |q|-that+1 rarest query trigrams; only the
+        # keys in those posting lists need scoring
+        query = _trigrams(key)
+        required = math.ceil(min_similarity * len(query) / (2 - min_similarity))
+        rarest = sorted(query, key=lambda trigram: len(self._postings.get(trigram, ())))
+        candidates = set()
+        for trigram in rarest[:len(query) - required + 1]:
+            candidates.update(self._postings.get(trigram, ()))
+
+        best_position, best_score = None, 0.0
+        for position in sorted(candidates):
+            trigrams = self._key_trigrams[position]
+            score = 2 * len(query & trigrams) / (len(query) + len(trigrams))
+            if score > best_score:
+                best_position, best_score = position, score
+        if best_position is None or best_score < min_similarity:
+            return None
+        return self.keys[best_position]
+
+
+class FontIndex(Mapping):
+    """
+    Read-only font family -> font url mapping with normalized and fuzzy lookup.
+
+    `index[family]` and `index.get(family)` resolve the family as described in the
+    module docstring; iteration and len() cover the canonical names only.
+    """
+
+    def __init__(self, fonts: Mapping[str, str], min_similarity: float = 0.6, cache_size: int = 4096):
+        """
+        Args:
+            fonts (Mapping): Canonical font family -> font url
+            min_similarity (float): Minimum trigram Dice similarity for a fuzzy match
+            cache_size (int): Resolved spellings to remember
+        """
+        self.fonts = dict(fonts)
+        self.min_similarity = min_similarity
+        self._normalized: Dict[str, str] = {}
+        # Family stem -> faces as (weight, italic, canonical name)
+        self._families: Dict[str, List[Tuple[int, bool, str]]] = defaultdict(list)
+        for name in self.fonts:
+            key = normalize_family(name)
+            self._normalized.setdefault(key, name)
+            if key.endswith("regular"):
+                # "Abel" means "Abel Regular"
+                self._normalized.setdefault(key[:-len("regular")], name)
+            stem, weight, italic = split_family(name)
+            self._families[stem].append((400 if weight is None else weight, italic, name))
+        self._names = _TrigramMatcher(list(self._normalized))
+        self._stems = _TrigramMatcher(list(self._families))
+        self._cached_resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def resolve(self, family: str) -> Optional[str]:
+        """Canonical font family for a spelling, or None when nothing is close enough"""
+        if family in self.fonts:
+            return family
+        if not isinstance(family, str):
+            return None
+        return self._cached_resolve(family)
+
+    @staticmethod
+    def _closest_face(faces: List[Tuple[int, bool, str]], weight: Optional[int], italic: bool) -> str:
+        """Face with the requested style and the nearest weight; ties go lighter up to 500, heavier above"""
+        target = 400 if weight is None else weight
+        return min(faces, key=lambda face: (face[1] != italic, abs(face[0] - target),
+                                            face[0] if target <= 500 else -face[0]))[2]
+
+    def _resolve(self, family: str) -> Optional[str]:
+        key = normalize_family(family)
+        if not key:
+            return None
+        name = self._normalized.get(key)
+        if name is not None:
+            return name
+
+        stem, weight, italic = split_family(family)
+        if stem not in self._families:
+            stem = self._stems.best(stem, self.min_similarity)
+        if stem is not None:
+            return self._closest_face(self._families[stem], weight, italic)
+
+        key = self._names.best(key, self.min_similarity)
+        return None if key is None else self._normalized[key]
+
+    def __getitem__(self, family: str) -> str:
+        name = self.resolve(family)
+        if name is None:
+            raise KeyError(family)
+        return self.fonts[name]
+
+    def __contains__(self, family) -> bool:
+        return self.resolve(family) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.fonts)
+
+    def __len__(self) -> int:
+        return len(self.fonts)
+
+
+@lru_cache(maxsize=None)
+def get_font_index(language: str = "english") -> FontIndex:
+    """Process-wide index over one language of fonts.json"""
+    return FontIndex(get_fonts(language))
+
+
+def main():
+    """Resolve a few model-style spellings and time the lookups"""
+    import time
+
+    start_time = time.perf_counter()
+    index = get_font_index("english")
+    print(f"Indexed {len(index)} fonts in {1000 * (time.perf_counter() - start_time):.1f} ms")
+
+    for family in ("League Spartan-Bold", "league spartan 700", "Montserrat", "Playfair Display SemiBold",
+                   "Playfair Display SC Semibold Italic", "Robotto Bold", "Lato-Regular", "Totally Unknown Font"):
+        start_time = time.perf_counter()
+        name = index.resolve(family)
+        first_us = 1e6 * (time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        index.resolve(family)
+        repeat_us = 1e6 * (time.perf_counter() - start_time)
+        print(f"{family!r:<30} -> {name!r:<32} {first_us:8.1f} us first, {repeat_us:5.1f} us repeat")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
-import openai
-import os
 import re
 import json
 from dotenv import load_dotenv
+from banner_utils.clients import get_openai_client
+from banner_utils.output_codec import decode
 load_dotenv()
 
 important_fields = {
@@ -14,6 +14,28 @@ important_fields = {
             "path": ["top", "left", "width", "height", "fill", "path", "id"]
         }
 
+def extract_json_from_response(response):
+    """Extract JSON from the model response"""
+    try:
+        # Look for JSON within <json> tags
+        if "<json>" in response and "</json>" in response:
+            start = response.find("<json>") + 6
+            end = response.find("</json>")
+            json_str = response[start:end].strip()
+            return decode(json.loads(json_str))
+        else:
+            # Try to find JSON in the response
+            start = response.find("{")
+            end = response.rfind("}") + 1
+            if start != -1 and end != 0:
+                json_str = response[start:end]
+                return decode(json.loads(json_str))
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON: {e}")
+        return None
+    
+    return None
+
 def get_best_result(model_response: str):
     """
     Extract and clean JSON from model response that may contain repetitions
@@ -51,7 +73,7 @@ def get_best_result(model_response: str):
         
         if json_end_pos > 0:
             clean_json = json_content[:json_end_pos]
-            parsed_json = json.loads(clean_json)
+            parsed_json = decode(json.loads(clean_json))
             return filter_important_fields(parsed_json)
         else:
             raise ValueError("Could not find complete JSON structure")
@@ -97,7 +119,7 @@ def get_clean_json_with_gpt(messy_response: str):
     Use GPT-4o-latest to extract and clean JSON from repetitive/messy responses
     """
     try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = get_openai_client()
         
         prompt = f"""
 You are a JSON extraction and cleaning expert. I have a model response that contains a condensed fabric.js canvas JSON, but it's messy with repetitions, incomplete structures, or other formatting issues.
@@ -153,7 +175,7 @@ Return the cleaned JSON in the following format:
             json_text = response_text[start_index:end_index+1]
         
         # Parse and validate the JSON
-        cleaned_json = json.loads(json_text)
+        cleaned_json = decode(json.loads(json_text))
         return cleaned_json
         
     except Exception as e:
@@ -181,7 +203,7 @@ def extract_first_valid_json(text: str):
                 if brace_count == 0:
                     try:
                         json_str = text[start_pos:i+1]
-                        parsed = json.loads(json_str)
+                        parsed = decode(json.loads(json_str))
                         if isinstance(parsed, dict) and 'objects' in parsed:
                             return filter_important_fields(parsed)
                     except:
@@ -1,8 +1,9 @@
-import openai
-import os
 import re
 import json
 from dotenv import load_dotenv
+from banner_utils.rate_limiter import call_with_backoff
+from banner_utils.clients import get_openai_client
+from banner_utils.assets import get_font_names
 load_dotenv()
 
 def get_font_families(product_url, product_name, product_description):
@@ -18,14 +19,11 @@ def get_font_families(product_url, product_name, product_description):
         list: A list of up to 4 recommended font families from the available fonts
     """
     try:
-        # Load available fonts from fonts.json
-        fonts_file_path = os.path.join(os.path.dirname(__file__), '../../assets/fonts.json')
-        with open(fonts_file_path, 'r', encoding='utf-8') as f:
-            fonts_data = json.load(f)["english"]
-        fontFamilyList = list(fonts_data.keys())
+        # Available fonts, loaded once per process
+        fontFamilyList = get_font_names("english")
        
-        # Initialize OpenAI client
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Shared OpenAI client
+        client = get_openai_client()
         
         # Create the prompt for font recommendation
         prompt = f"""
@@ -66,7 +64,9 @@ def get_font_families(product_url, product_name, product_description):
         """
         
         # Make API call to OpenAI
-        response = client.chat.completions.create(
+        response = call_with_backoff(
+            "openai",
+            client.chat.completions.create,
             model="chatgpt-4o-latest",
             messages=[
                 {
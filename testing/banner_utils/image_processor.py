@@ -1,5 +1,4 @@
 import os
-import requests
 import json
 import time
 import fal_client
@@ -7,11 +6,23 @@ from PIL import Image
 import uuid
 from io import BytesIO
 import base64
-from boto3 import resource
 import cv2
 import numpy as np
 from dotenv import load_dotenv
-from openai import OpenAI
+from banner_utils.rate_limiter import call_with_backoff, raise_for_retryable_status
+from banner_utils.clients import http_get, http_request, get_openai_client, get_s3_client
+from banner_utils.bg_remover import get_background_remover
+
+
+class ImageTooLargeError(Exception):
+    """Raised by encode_to_size when no encode within max_attempts fits max_size_mb"""
+
+    def __init__(self, data: bytes, size: tuple, params: dict, message: str = ""):
+        super().__init__(message or f"Smallest encode is {params['size_mb']} MB ({params})")
+        self.data = data
+        self.size = size
+        self.params = params
+
 
 class ImageProcessor:
     def __init__(self):
@@ -37,11 +48,49 @@ class ImageProcessor:
 
 
 
-    def process_image_url(self, image_url: str, banner_width: int, banner_height: int) -> str:
+    def process_image_url(self, image_url: str, banner_width: int, banner_height: int, use_temp_files: bool = False) -> str:
         """
         Main function to process image: download, remove background, and upload to Wasabi
         Returns the new Wasabi URL
+
+        By default the image never touches the disk: it is decoded once into an RGBA array
+        that passes through background removal and cropping, and is encoded once for the
+        upload. use_temp_files=True runs the original pipeline, which writes and re-reads
+        a file in tmp/ at every stage (useful for inspecting intermediate images).
         """
+        if use_temp_files:
+            return self._process_image_url_on_disk(image_url, banner_width, banner_height)
+        try:
+            BI_REF = False
+            if BI_REF:
+                result = fal_client.subscribe(
+                    "fal-ai/birefnet/v2",
+                    arguments={
+                        "image_url": image_url
+                    },
+                    with_logs=True,
+                    on_queue_update=self._on_queue_update,
+                )
+                bg_removed_url = result.get("image").get("url")
+                image = self._decode_image(self._fetch_image_bytes(bg_removed_url))
+                rgba = np.asarray(image.convert('RGBA'))
+            else:
+                # Download and decode once, then remove background on the array
+                image = self._decode_image(self._fetch_image_bytes(image_url))
+                rgba = self._remove_background_array(image)
+            # Drop the decoded image before encoding, only the array is needed from here on
+            image.close()
+            # Crop to content (a view, no copy)
+            cropped = self._crop_array(rgba, banner_width, banner_height)
+            # Encode once and upload to Wasabi
+            return self._upload_array_to_wasabi(cropped)
+
+        except Exception as e:
+            print(f"Error processing image: {str(e)}")
+            raise
+
+    def _process_image_url_on_disk(self, image_url: str, banner_width: int, banner_height: int) -> str:
+        """File-based variant of process_image_url, one tmp/ file per stage"""
         try:
             # Download image from URL
             BI_REF = False
@@ -55,7 +104,7 @@ class ImageProcessor:
                     on_queue_update=self._on_queue_update,
                 )
                 bg_removed_url = result.get("image").get("url")
-                response = requests.get(bg_removed_url)
+                response = http_get(bg_removed_url)
                 if response.status_code != 200:
                     raise Exception("Failed to download image")
                 bg_removed_path = f"tmp/{uuid.uuid4()}.png"
@@ -84,9 +133,23 @@ class ImageProcessor:
             print(f"Error processing image: {str(e)}")
             raise
 
-    def _download_image(self, url: str, path: str = f"tmp/{uuid.uuid4()}.png") -> str:
+    def _fetch_image_bytes(self, url: str) -> bytes:
+        """Download an image into memory"""
+        response = http_get(url)
+        if response.status_code != 200:
+            raise Exception("Failed to download image")
+        return response.content
+
+    def _decode_image(self, data: bytes, max_dimension: int = 1440) -> Image.Image:
+        """Decode image bytes once, downscaled to fit max_dimension (JPEGs decode at reduced size)"""
+        image = Image.open(BytesIO(data))
+        image.thumbnail([max_dimension, max_dimension])
+        return image
+
+    def _download_image(self, url: str, path: str = None) -> str:
         """Download image from URL and save temporarily"""
-        response = requests.get(url)
+        path = path or f"tmp/{uuid.uuid4()}.png"
+        response = http_get(url)
         if response.status_code != 200:
             raise Exception("Failed to download image")
             
@@ -117,18 +180,9 @@ class ImageProcessor:
             img.thumbnail([1440, 1440])
             
             # Get mask from API
-            response = self._get_mask_from_api(img)
-            
-            # Retry once if failed
-            if 'output_image' not in response:
-                print("First attempt FAILED, retrying...")
-                response = self._get_mask_from_api(img)
-                
-            if 'output_image' not in response:
-                raise Exception("Background removal failed after retry")
+            mask = self._request_mask(img)
             
             # Process the mask and create output image
-            mask = Image.open(BytesIO(base64.b64decode(response['output_image'])))
             output_image = Image.composite(
                 img, 
                 Image.new("RGBA", img.size, (255, 255, 255, 0)), 
@@ -144,28 +198,35 @@ class ImageProcessor:
         except Exception as e:
             raise Exception(f"Error removing background: {str(e)}")
 
-    def _get_mask_from_api(self, img: Image) -> dict:
-        """Get mask from background removal API"""
-        url = 'https://static-aws-ml1.phot.ai/v1/models/transparent-bgremover-model:predict'
-        headers = {"Content-Type": "application/json"}
-        
-        # Convert image to base64
-        buffered = BytesIO()
-        img.save(buffered, format="PNG")
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        # Prepare API request
-        data = {
-            "instances": [{
-                "image": {
-                    "b64": img_base64
-                }
-            }]
-        }
-        
-        # Make API call
-        response = requests.post(url, json=data, headers=headers)
-        return json.loads(response.text)
+    def _request_mask(self, img: Image.Image) -> Image.Image:
+        """
+        Get the foreground mask for an image from the API
+
+        Goes through the shared batching client, so concurrent calls from several
+        threads are sent together; a failed image is retried once.
+        """
+        return get_background_remover().get_mask(img)
+
+    def _remove_background_array(self, img: Image.Image) -> np.ndarray:
+        """Remove background and return the result as an RGBA uint8 array"""
+        try:
+            mask = self._request_mask(img)
+            output_image = Image.composite(
+                img,
+                Image.new("RGBA", img.size, (255, 255, 255, 0)),
+                mask.convert('L')
+            )
+            return np.asarray(output_image)
+        except Exception as e:
+            raise Exception(f"Error removing background: {str(e)}")
+
+    def _post_bg_remover(self, url: str, data: dict, headers: dict):
+        """POST to the background removal API under the shared rate limiter"""
+        def send():
+            response = http_request("POST", url, json=data, headers=headers)
+            raise_for_retryable_status(response)
+            return response
+        return call_with_backoff("bg_remover", send)
 
     def _get_maskurl_from_api(self, img_url: str=None, b64_image: str= None) -> dict:
         """Get mask from background removal API"""
@@ -189,7 +250,7 @@ class ImageProcessor:
             }]
         }
         # Make API call
-        response = requests.post(url, json=data, headers=headers)
+        response = self._post_bg_remover(url, data, headers)
         return json.loads(response.text)
 
     def _crop_to_content(self, image_path: str, banner_width: int, banner_height: int, BI_REF: bool) -> str:
@@ -220,22 +281,8 @@ class ImageProcessor:
                 # Convert to grayscale for RGB images
                 mask = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
                 
-            # Find non-zero points (content)
-            coords = np.argwhere(mask > 0)
-            
-            # Find the bounding rectangle
-            y_min, x_min = coords.min(axis=0)
-            y_max, x_max = coords.max(axis=0)
-            
-            # Add small padding (optional)
-            # padding_y = banner_height * 0.1
-            # padding_x = banner_width * 0.1
-            padding_y = 0
-            padding_x = 0
-            y_min = int(max(0, y_min - padding_y))
-            y_max = int(min(img.shape[0], y_max + padding_y))
-            x_min = int(max(0, x_min - padding_x))
-            x_max = int(min(img.shape[1], x_max + padding_x))
+            # Find the bounding rectangle of the content
+            y_min, y_max, x_min, x_max = self._content_bbox(mask, banner_width, banner_height)
             # Crop the image
             cropped = img[y_min:y_max, x_min:x_max]
             
@@ -246,7 +293,110 @@ class ImageProcessor:
             raise Exception(f"Error cropping image: {str(e)}")
         
         return output_path
-            
+
+    def _content_bbox(self, mask: np.ndarray, banner_width: int, banner_height: int,
+                      alpha_threshold: int = 0, padding: float = 0.0,
+                      coarse_max_dimension: int = 2048) -> tuple:
+        """
+        Bounding box of the pixels of a mask above alpha_threshold
+
+        Uses row and column projections (max along each axis) instead of listing every
+        opaque pixel, so no per-pixel index array is built. Masks larger than
+        coarse_max_dimension are first max-pooled over step x step blocks; any content
+        pixel marks its block, so the box of the marked blocks always contains the exact
+        one, and each exact edge lies in the outermost block row or column of that box.
+        Only those four strips are then scanned at full resolution.
+
+        Args:
+            mask: 2D alpha (or grayscale) array
+            banner_width: Width of the banner
+            banner_height: Height of the banner
+            alpha_threshold: Pixels with a value above this count as content
+            padding: Padding added on each side, as a fraction of the banner size
+            coarse_max_dimension: Masks larger than this get the coarse first pass
+        Returns:
+            tuple: (y_min, y_max, x_min, x_max) slice bounds, end exclusive. The whole
+            mask when it has no content.
+        """
+        height, width = mask.shape[:2]
+        step = -(-max(height, width) // coarse_max_dimension)
+        if step > 1:
+            coarse = self._projection_bbox(self._max_pool(mask, step), alpha_threshold)
+            bbox = None if coarse is None else self._refine_bbox(mask, coarse, step, alpha_threshold)
+        else:
+            bbox = self._projection_bbox(mask, alpha_threshold)
+        if bbox is None:
+            print("No content found in mask, skipping crop")
+            return 0, height, 0, width
+        y_min, y_max, x_min, x_max = bbox
+
+        padding_y = banner_height * padding
+        padding_x = banner_width * padding
+        y_min = int(max(0, y_min - padding_y))
+        y_max = int(min(height, y_max + padding_y))
+        x_min = int(max(0, x_min - padding_x))
+        x_max = int(min(width, x_max + padding_x))
+        return y_min, y_max, x_min, x_max
+
+    @staticmethod
+    def _projection_bbox(mask: np.ndarray, alpha_threshold: int = 0):
+        """(y_min, y_max, x_min, x_max) of the pixels above alpha_threshold, None if there are none"""
+        rows = np.flatnonzero(mask.max(axis=1) > alpha_threshold)
+        if rows.size == 0:
+            return None
+        cols = np.flatnonzero(mask[rows[0]:rows[-1] + 1].max(axis=0) > alpha_threshold)
+        return int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+
+    @staticmethod
+    def _max_pool(mask: np.ndarray, step: int) -> np.ndarray:
+        """Maximum of every step x step block of a 2D array, partial blocks at the edges included"""
+        # Elementwise maxima of the strided slices: whole rows at a time, fast on the strided alpha channel too
+        rows = mask[0::step].copy()
+        for offset in range(1, step):
+            part = mask[offset::step]
+            np.maximum(rows[:len(part)], part, out=rows[:len(part)])
+        blocks = rows[:, 0::step].copy()
+        for offset in range(1, step):
+            part = rows[:, offset::step]
+            np.maximum(blocks[:, :part.shape[1]], part, out=blocks[:, :part.shape[1]])
+        return blocks
+
+    @staticmethod
+    def _refine_bbox(mask: np.ndarray, coarse: tuple, step: int, alpha_threshold: int = 0) -> tuple:
+        """
+        Exact (y_min, y_max, x_min, x_max) from the block box of the max-pooled mask
+
+        The first and last block row and column of the box hold content, so the exact
+        edges are found by scanning just those strips of the full-resolution mask.
+        """
+        height, width = mask.shape[:2]
+        y0, y1 = coarse[0] * step, min(height, coarse[1] * step)
+        x0, x1 = coarse[2] * step, min(width, coarse[3] * step)
+        window = mask[y0:y1, x0:x1]
+        last_row, last_col = (coarse[1] - 1) * step - y0, (coarse[3] - 1) * step - x0
+
+        top = window[:step].max(axis=1) > alpha_threshold
+        bottom = window[last_row:].max(axis=1) > alpha_threshold
+        left = window[:, :step].max(axis=0) > alpha_threshold
+        right = window[:, last_col:].max(axis=0) > alpha_threshold
+        return (
+            y0 + int(np.argmax(top)),
+            y0 + last_row + len(bottom) - int(np.argmax(bottom[::-1])),
+            x0 + int(np.argmax(left)),
+            x0 + last_col + len(right) - int(np.argmax(right[::-1])),
+        )
+
+    def _crop_array(self, rgba: np.ndarray, banner_width: int, banner_height: int,
+                    alpha_threshold: int = 0, padding: float = 0.0) -> np.ndarray:
+        """Crop an RGBA array to its content; returns a view, not a copy"""
+        try:
+            y_min, y_max, x_min, x_max = self._content_bbox(
+                rgba[:, :, 3], banner_width, banner_height, alpha_threshold, padding
+            )
+            return rgba[y_min:y_max, x_min:x_max]
+        except Exception as e:
+            raise Exception(f"Error cropping image: {str(e)}")
+
     def image_to_base64(self, image: Image) -> str:
         buffered = BytesIO()
         image.save(buffered, format="PNG")
@@ -254,7 +404,7 @@ class ImageProcessor:
         return img_base64
     
     def url_to_base64(self, url: str) -> str:
-        response = requests.get(url)
+        response = http_get(url)
         img_base64 = base64.b64encode(response.content).decode()
         return img_base64
     
@@ -263,64 +413,135 @@ class ImageProcessor:
             return base64.b64encode(image_file.read()).decode('utf-8')
 
     def resize_and_compress_image(self, image_path, max_size_mb=4.5, output_path=None):
+        """
+        Bring an image file under max_size_mb, overwriting it unless output_path is given
+
+        Returns:
+            The resized/compressed PIL image
+
+        Raises:
+            ImageTooLargeError: No encode fit; nothing is written
+        """
         # Open the image
         image = Image.open(image_path)
 
         # Check the current file size
         file_size = os.path.getsize(image_path) / (1024 * 1024)  # size in MB
         print(f"Current file size: {file_size:.2f} MB")
-        # If the file size is greater than max_size_mb, reduce the image
-        if file_size > max_size_mb:
-            # Resize the image if necessary to reduce file size
-            width, height = image.size
-            aspect_ratio = width / height
-            if width > 2048:  # If width is greater than 2K
-                new_width = 2048
-                new_height = int(new_width / aspect_ratio)
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Handle RGBA images
-            has_alpha = image.mode == 'RGBA'
-            print(f"Has alpha: {has_alpha}")
-            if has_alpha:
-                # Keep original RGBA image
-                quality = 95  # Start with high quality
-                if output_path is None:
-                    output_path = image_path  # Overwrite original image if no output path provided
-                
-                # Reduce quality until the file size is under the limit
-                while True:
-                    image.save(output_path, "PNG", optimize=True)
-                    file_size = os.path.getsize(output_path) / (1024 * 1024)  # size in MB
-                    if file_size <= max_size_mb or quality <= 10:
-                        break
-                    quality -= 5  # Decrease quality incrementally
-            else:
-                # Convert to RGB if no alpha
-                if image.format != 'JPEG':
-                    image = image.convert('RGB')
-                
-                # Save the image with reduced quality to reduce size
-                quality = 95  # Start with high quality
-                if output_path is None:
-                    output_path = image_path  # Overwrite original image if no output path provided
-                
-                # Reduce quality until the file size is under the limit
-                while True:
-                    image.save(output_path, "JPEG", quality=quality, optimize=True)
-                    file_size = os.path.getsize(output_path) / (1024 * 1024)  # size in MB
-                    if file_size <= max_size_mb or quality <= 10:
-                        break
-                    quality -= 5  # Decrease quality incrementally
-                
-            print(f"Image saved at {output_path} with size: {file_size:.2f} MB")
-        else:
+        if file_size <= max_size_mb:
             print(f"Image is already under {max_size_mb} MB, no resizing needed.")
             return image  # Return original image if no resizing is needed
 
-        return image  # Return the resized/compressed image
+        data, _, params = self.encode_to_size(image, max_size_mb)
+        if output_path is None:
+            output_path = image_path  # Overwrite original image if no output path provided
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        print(f"Image saved at {output_path} with size: {params['size_mb']:.2f} MB ({params})")
 
+        return Image.open(BytesIO(data))  # Return the resized/compressed image
 
+    def encode_to_size(self, image: Image.Image, max_size_mb: float = 4.5, max_attempts: int = 6,
+                       max_width: int = 2048, allow_webp: bool = False) -> tuple:
+        """
+        Encode an image under max_size_mb in memory with at most max_attempts encodes
+
+        RGBA images are encoded losslessly as PNG at the strongest compression (lower
+        levels come out just over the limit often enough that the extra encode costs more
+        than they save). With allow_webp, an RGBA image that does not fit is encoded as
+        lossless WebP at full scale next, typically a quarter smaller than the PNG. If
+        that is still too large, the scale is searched in the last format tried: encoded
+        size is modelled as proportional to the pixel count, fitted on the previous
+        encode, and each guess is kept inside the bracket of scales known to fit / not
+        fit. Other images are encoded as JPEG and bisected on quality (95 down to 10).
+
+        Args:
+            image: PIL image
+            max_size_mb: Size limit in MB
+            max_attempts: Maximum number of encodes
+            max_width: Images wider than this are scaled down first
+            allow_webp: Allow lossless WebP for RGBA images (callers must store the
+                format reported in the parameters, not assume PNG)
+
+        Returns:
+            tuple: (encoded bytes, (width, height), dict with the chosen parameters)
+
+        Raises:
+            ImageTooLargeError: No encode fit; carries the smallest one
+        """
+        limit = max_size_mb * 1024 * 1024
+        has_alpha = image.mode == 'RGBA'
+        if not has_alpha:
+            image = image.convert('RGB')
+        width, height = image.size
+        attempts = []
+
+        def encode(scale, **options):
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            resized = image if size == image.size else image.resize(size, Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            result = {'data': buffer.getvalue(), 'size': size, 'scale': scale, **options}
+            attempts.append(result)
+            return result
+
+        def fits(result):
+            return len(result['data']) <= limit
+
+        scale = min(1.0, max_width / width)
+        if has_alpha:
+            search_options = {'format': 'PNG', 'optimize': True}
+            best = encode(scale, **search_options)
+            if not fits(best) and allow_webp and max_attempts > 1:
+                # Lossless WebP at full scale before giving up resolution; the scale search
+                # then continues in WebP
+                search_options = {'format': 'WEBP', 'lossless': True, 'method': 4}
+                best = encode(scale, **search_options)
+            if not fits(best):
+                # Bracket: scales known to fit (lo) and not to fit (hi)
+                lo, hi, last, best = 0.0, scale, best, None
+                while len(attempts) < max_attempts:
+                    # Size model from the last encode: size ~ scale^2
+                    guess = last['scale'] * (0.95 * limit / len(last['data'])) ** 0.5
+                    if best is None and len(attempts) == max_attempts - 1:
+                        guess = min(guess, hi) * 0.8  # last attempt: leave a margin
+                    elif not lo < guess < hi:
+                        guess = (lo + hi) / 2
+                    last = encode(guess, **search_options)
+                    if fits(last):
+                        lo, best = guess, last
+                        if len(last['data']) >= 0.85 * limit:
+                            break
+                    else:
+                        hi = guess
+        else:
+            best = encode(scale, format='JPEG', quality=95, optimize=True)
+            if not fits(best):
+                lo, hi, best = 10, 95, None
+                while len(attempts) < max_attempts and hi - lo > 1:
+                    # Last attempt without a fit: go straight to the lowest quality
+                    quality = lo if best is None and len(attempts) == max_attempts - 1 else (lo + hi) // 2
+                    result = encode(scale, format='JPEG', quality=quality, optimize=True)
+                    if fits(result):
+                        lo, best = quality, result
+                        if quality == 10:
+                            break
+                    else:
+                        hi = quality
+
+        failed = best is None
+        if failed:
+            best = min(attempts, key=lambda result: len(result['data']))
+        params = {k: v for k, v in best.items() if k != 'data'}
+        params.update(scale=round(best['scale'], 3), size_mb=round(len(best['data']) / (1024 * 1024), 2),
+                      attempts=len(attempts))
+        if failed:
+            raise ImageTooLargeError(
+                best['data'], best['size'], params,
+                f"Could not get under {max_size_mb} MB in {max_attempts} attempts, smallest encode is "
+                f"{params['size_mb']} MB ({params})",
+            )
+        return best['data'], best['size'], params
 
     def _upload_to_wasabi(self, image_path: str) -> str:
         """Upload image to Wasabi and return URL"""
@@ -337,20 +558,14 @@ class ImageProcessor:
             image = self.resize_and_compress_image(image_path)
             width, height = image.size
 
-            # Initialize Wasabi client
-            s3_client = resource(
-                service_name="s3",
-                endpoint_url=self.endpoint_url,
-                aws_access_key_id=self.aws_access_key_id,
-                aws_secret_access_key=self.aws_secret_access_key
-            )
+            # Shared Wasabi client
+            s3_client = get_s3_client(self.endpoint_url, self.aws_access_key_id, self.aws_secret_access_key)
 
             # Generate unique filename with dimensions and nobg indicator
             file_name = f"{uuid.uuid4()}_nobg_{width}x{height}.png"
             
             # Upload file
-            bucket = s3_client.Bucket(self.bucket_name)
-            bucket.upload_file(image_path, f"test-images/{file_name}")
+            call_with_backoff("wasabi", s3_client.upload_file, image_path, self.bucket_name, f"test-images/{file_name}")
             
             # Return public URL
             return f"{self.endpoint_url}{self.bucket_name}/test-images/{file_name}"
@@ -358,6 +573,55 @@ class ImageProcessor:
         except Exception as e:
             raise Exception(f"Error uploading to Wasabi: {str(e)}")
 
+    def _encode_for_upload(self, rgba: np.ndarray, max_size_mb: float = 4.5) -> tuple:
+        """
+        Encode an RGBA array to PNG bytes for upload
+
+        Returns:
+            tuple: (png_bytes, (width, height))
+
+        Raises:
+            ImageTooLargeError: No PNG encode fit max_size_mb
+        """
+        # Same encoder the file pipeline used for the cropped image (cv2.imwrite), several
+        # times faster than Pillow's PNG encoder at a similar size
+        height, width = rgba.shape[:2]
+        ok, encoded = cv2.imencode('.png', cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGRA))
+        if not ok:
+            raise Exception("Failed to encode image")
+        if encoded.nbytes <= max_size_mb * 1024 * 1024:
+            return encoded.tobytes(), (width, height)
+
+        # Rare oversized image: search for an encode that fits (PNG only, the upload is keyed .png)
+        data, size, params = self.encode_to_size(Image.fromarray(np.ascontiguousarray(rgba)), max_size_mb)
+        print(f"Compressed upload to {params}")
+        return data, size
+
+    def _upload_array_to_wasabi(self, rgba: np.ndarray) -> str:
+        """Encode an RGBA array once and upload it to Wasabi"""
+        data, (width, height) = self._encode_for_upload(rgba)
+        return self._upload_bytes_to_wasabi(data, width, height)
+
+    def _upload_bytes_to_wasabi(self, data: bytes, width: int, height: int) -> str:
+        """Upload encoded PNG bytes to Wasabi and return URL"""
+        try:
+            s3_client = get_s3_client(self.endpoint_url, self.aws_access_key_id, self.aws_secret_access_key)
+
+            # Generate unique filename with dimensions and nobg indicator
+            file_name = f"{uuid.uuid4()}_nobg_{width}x{height}.png"
+
+            # Upload from memory
+            call_with_backoff(
+                "wasabi", s3_client.upload_fileobj, BytesIO(data), self.bucket_name,
+                f"test-images/{file_name}", ExtraArgs={"ContentType": "image/png"}
+            )
+
+            # Return public URL
+            return f"{self.endpoint_url}{self.bucket_name}/test-images/{file_name}"
+
+        except Exception as e:
+            raise Exception(f"Error uploading to Wasabi: {str(e)}")
+
     def _cleanup_files(self, file_paths: list):
         """Clean up temporary files"""
         for path in file_paths:
@@ -391,7 +655,7 @@ class ImageProcessor:
 
     def enhance_prompt(self, prompt: str, image_url: str) -> str:
         """Enhance prompt using OpenAI"""
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        client = get_openai_client()
         openai_time = time.time()
         try:
             response = client.chat.completions.create(
@@ -0,0 +1,298 @@
+"""
+Layer schema for the condensed FabricJS format used in training.
+
+important_fields lists the keys a condensed layer keeps per layer type, and the
+general_* layers hold the full-FabricJS defaults a condensed layer is expanded with.
+Both are resolved once, at import: condense() copies each layer's fields from a
+precomputed tuple, and expand() merges a layer with its precomputed defaults, so
+neither looks anything up in the schema per layer.
+"""
+from typing import Dict, Mapping, Optional, Tuple
+
+important_fields = {
+    "svg": ["type", "top", "left", "width", "height", "src", "id"],
+    "text": ["type", "top", "left", "width", "height", "fill", "text", "fontSize", "fontFamily", "textAlign", "id"],
+    "image": ["type", "top", "left", "width", "height", "src", "id"],
+    "rect": ["type", "top", "left", "width", "height", "fill", "rx", "ry", "id"],
+    "circle": ["type", "top", "left", "width", "height", "fill", "radius", "id"],
+    "path": ["type", "top", "left", "width", "height", "fill", "path", "id"]
+}
+
+general_text_layer = {
+                "type": "text",
+                "originX": "left",
+                "originY": "top",
+                "left": 122,
+                "top": 83,
+                "width": 837.84,
+                "height": 113,
+                "fill": "#8B5A2B",
+                "strokeWidth": 0,
+                "scaleX": 1,
+                "scaleY": 1,
+                "angle": 0,
+                "opacity": 1,
+                "backgroundColor": "",
+                "fontFamily": "Ultra-Regular",
+                "fontWeight": "normal",
+                "fontSize": 100,
+                "text": "LUXURY TOTE",
+                "textAlign": "left",
+                "fontStyle": "normal",
+                "lineHeight": 1,
+                "charSpacing": 0,
+                "fontURL": "https://ai-image-editor-wasabi-bucket.apyhi.com/fonts/font/Regular-2470cb70-cda8-4dae-a26f-428d9f6749bc.ttf",
+                "id": "heading"
+            }
+
+general_svg_layer ={
+                "type": "svg",
+                "originX": "left",
+                "originY": "top",
+                "left": 0,
+                "top": 0,
+                "width": 1080,
+                "height": 1080,
+                "fill": "rgb(0,0,0)",
+                "strokeWidth": 0,
+                "scaleX": 1,
+                "scaleY": 1,
+                "angle": 0,
+                "opacity": 1,
+                "backgroundColor": "",
+                "src": "<svg xmlns='http://www.w3.org/2000/svg' width='1080' height='1080' viewBox='0 0 1080 1080'><defs><linearGradient id='bgGrad' x1='0%' y1='0%' x2='100%' y2='100%'><stop offset='0%' style='stop-color:#1A1A1A'/><stop offset='50%' style='stop-color:#222222'/><stop offset='100%' style='stop-color:#2A2A2A'/></linearGradient><linearGradient id='accentGrad' x1='0%' y1='0%' x2='100%' y2='100%'><stop offset='0%' style='stop-color:#0078D7'/><stop offset='100%' style='stop-color:#00A2FF'/></linearGradient></defs><rect width='1080' height='1080' fill='url(#bgGrad)'/><path d='M1080 0 L1080 1080 L0 1080 Z' fill='#303030'/><path d='M1080 0 L0 1080 L0 800 L800 0 Z' fill='url(#accentGrad)' opacity='0.1'/><g opacity='0.15'><circle cx='200' cy='200' r='5' fill='#FFFFFF'/><circle cx='240' cy='200' r='5' fill='#FFFFFF'/><circle cx='280' cy='200' r='5' fill='#FFFFFF'/><circle cx='200' cy='240' r='5' fill='#FFFFFF'/><circle cx='240' cy='240' r='5' fill='#FFFFFF'/><circle cx='280' cy='240' r='5' fill='#FFFFFF'/><circle cx='200' cy='280' r='5' fill='#FFFFFF'/><circle cx='240' cy='280' r='5' fill='#FFFFFF'/><circle cx='280' cy='280' r='5' fill='#FFFFFF'/></g><g opacity='0.1'><rect x='900' y='100' width='100' height='2' fill='#00A2FF'/><rect x='850' y='150' width='150' height='2' fill='#00A2FF'/><rect x='800' y='200' width='200' height='2' fill='#00A2FF'/><rect x='750' y='250' width='250' height='2' fill='#00A2FF'/><rect x='700' y='300' width='300' height='2' fill='#00A2FF'/><rect x='650' y='350' width='350' height='2' fill='#00A2FF'/><rect x='600' y='400' width='400' height='2' fill='#00A2FF'/><rect x='550' y='450' width='450' height='2' fill='#00A2FF'/><rect x='500' y='500' width='500' height='2' fill='#00A2FF'/><rect x='450' y='550' width='550' height='2' fill='#00A2FF'/><rect x='400' y='600' width='600' height='2' fill='#00A2FF'/><rect x='350' y='650' width='650' height='2' fill='#00A2FF'/><rect x='300' y='700' width='700' height='2' fill='#00A2FF'/><rect x='250' y='750' width='750' height='2' fill='#00A2FF'/><rect x='200' y='800' width='800' height='2' fill='#00A2FF'/><rect x='150' y='850' width='850' height='2' fill='#00A2FF'/><rect x='100' y='900' width='900' height='2' fill='#00A2FF'/><rect x='50' y='950' width='950' height='2' fill='#00A2FF'/><rect x='0' y='1000' width='1000' height='2' fill='#00A2FF'/></g><path d='M1080 0 L0 1080' stroke='#00A2FF' stroke-width='4' opacity='0.5'/><circle cx='540' cy='540' r='400' fill='none' stroke='#00A2FF' stroke-width='1' opacity='0.2'/><circle cx='540' cy='540' r='300' fill='none' stroke='#00A2FF' stroke-width='1' opacity='0.2'/><circle cx='540' cy='540' r='200' fill='none' stroke='#00A2FF' stroke-width='1' opacity='0.2'/></svg>",
+                "id": "background"
+            }
+
+general_rect_layer = {
+                "type": "rect",
+                "originX": "left",
+                "originY": "top",
+                "left": 94,
+                "top": 946,
+                "width": 200,
+                "height": 60,
+                "fill": "#C49A6C",
+                "strokeWidth": 0,
+                "scaleX": 1,
+                "scaleY": 1,
+                "angle": 0,
+                "opacity": 1,
+                "backgroundColor": "",
+                "rx": 5,
+                "ry": 5,
+                "id": "cta_button"
+            }
+
+
+general_image_layer = {
+                "type": "image",
+                "originX": "left",
+                "originY": "top",
+                "left": 500,
+                "top": 348,
+                "width": 1214,
+                "height": 1439,
+                "fill": "rgb(0,0,0)",
+                "strokeWidth": 0,
+                "scaleX": 0.45,
+                "scaleY": 0.45,
+                "angle": 0,
+                "opacity": 1,
+                "backgroundColor": "",
+                "src": "https://s3.us-east-2.wasabisys.com/ai-image-editor-webapp/test-images/65592cc4-1937-406a-9260-9904e6aa840c_nobg_1214x1439.png",
+                "id": "product_image"
+            }
+
+general_path_layer = {
+                "type": "path",
+                "originX": "left",
+                "originY": "top",
+                "left": 350,
+                "top": 350,
+                "width": 90,
+                "height": 90,
+                "fill": "#B4567E",
+                "strokeWidth": 1,
+                "scaleX": 1,
+                "scaleY": 1,
+                "angle": 0,
+                "opacity": 1,
+                "backgroundColor": "",
+                "path": [
+                    [
+                        "M",
+                        50,
+                        5
+                    ],
+                    [
+                        "C",
+                        60,
+                        20,
+                        80,
+                        20,
+                        95,
+                        50
+                    ],
+                    [
+                        "C",
+                        80,
+                        80,
+                        60,
+                        80,
+                        50,
+                        95
+                    ],
+                    [
+                        "C",
+                        40,
+                        80,
+                        20,
+                        80,
+                        5,
+                        50
+                    ],
+                    [
+                        "C",
+                        20,
+                        20,
+                        40,
+                        20,
+                        50,
+                        5
+                    ],
+                    [
+                        "Z"
+                    ]
+                ],
+                "id": "decorative_1"
+            }
+
+general_circle_layer = {
+                "type": "circle",
+                "originX": "left",
+                "originY": "top",
+                "left": 760.0,
+                "top": 320.0,
+                "width": 180,
+                "height": 180,
+                "fill": "#FFD100",
+                "strokeWidth": 0,
+                "scaleX": 1,
+                "scaleY": 1,
+                "angle": 0,
+                "opacity": 1,
+                "backgroundColor": "",
+                "radius": 90,
+                "id": "price_background"
+            }
+GENERAL_LAYERS = {
+    "svg": general_svg_layer,
+    "text": general_text_layer,
+    "image": general_image_layer,
+    "rect": general_rect_layer,
+    "circle": general_circle_layer,
+    "path": general_path_layer
+}
+
+# Bump when condense() changes its output for the same important_fields
+# 2: image width/height are the displayed size (width * scaleX), not the source pixels
+SCHEMA_REVISION = 2
+
+
+# Condensed fields per layer type. Image layers also get width/height replaced by the
+# displayed size (width * scaleX), computed in condense()
+_CONDENSED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    layer_type: tuple(fields) for layer_type, fields in important_fields.items()
+}
+
+
+def _expand_image(layer: dict, image_url: str, image_size: Tuple[int, int]) -> dict:
+    """Fit the product image into the condensed box, keeping its aspect ratio and center"""
+    image_width, image_height = image_size
+    scale = min(layer["width"] / image_width, layer["height"] / image_height)
+    center_x = layer["left"] + layer["width"] / 2
+    center_y = layer["top"] + layer["height"] / 2
+    layer["scaleX"] = scale
+    layer["scaleY"] = scale
+    layer["left"] = center_x - image_width * scale / 2
+    layer["top"] = center_y - image_height * scale / 2
+    layer["width"] = image_width
+    layer["height"] = image_height
+    layer["src"] = image_url
+    return layer
+
+
+def condense(banner: dict, source: str = "") -> Tuple[dict, Optional[str]]:
+    """
+    Condense every layer of a FabricJS banner to its important fields
+
+    Args:
+        banner (dict): FabricJS json with an "objects" list
+        source (str): Where the banner came from, only used in log messages
+
+    Returns:
+        tuple: (condensed banner, product image url or None)
+    """
+    objects = []
+    product_url = None
+    for layer in banner["objects"]:
+        layer_type = layer["type"]
+        fields = _CONDENSED_FIELDS.get(layer_type)
+        if fields is None:
+            print(f"File {source} has a layer that is not in the important_fields {layer_type}")
+            objects.append(layer)
+            continue
+        # Subscripting is cheaper than get(); layers from the editor have every field,
+        # so the defaulting loop only runs for hand-written or truncated layers
+        condensed_layer = {}
+        try:
+            for field in fields:
+                condensed_layer[field] = layer[field]
+        except KeyError:
+            get = layer.get
+            for field in fields:
+                condensed_layer[field] = get(field, 0)
+        if layer_type == "image":
+            product_url = layer["src"]
+            condensed_layer["width"] = layer.get("width", 0) * layer.get("scaleX", 1)
+            condensed_layer["height"] = layer.get("height", 0) * layer.get("scaleY", 1)
+        objects.append(condensed_layer)
+    condensed = dict(banner)
+    condensed["objects"] = objects
+    return condensed, product_url
+
+
+def expand(banner: dict, image_url: str, image_size: Tuple[int, int], fonts: Optional[Mapping[str, str]] = None) -> dict:
+    """
+    Expand a condensed banner back to full FabricJS layers
+
+    Args:
+        banner (dict): Condensed FabricJS json
+        image_url (str): Product image placed in the image layer
+        image_size (tuple): (width, height) of the product image
+        fonts (Mapping): Font family -> font url for the text layers' fontURL, usually a
+            FontIndex so near-miss spellings resolve; unresolved families keep the
+            template font
+
+    Returns:
+        New FabricJS json; the input banner is not modified
+    """
+    objects = []
+    for layer in banner["objects"]:
+        defaults = GENERAL_LAYERS.get(layer["type"])
+        if defaults is None:
+            print(f"Unknown layer type: {layer['type']}")
+            objects.append(layer)
+            continue
+        layer = {**defaults, **layer}
+        if layer["type"] == "image":
+            layer = _expand_image(layer, image_url, image_size)
+        elif layer["type"] == "text" and fonts:
+            font_url = fonts.get(layer["fontFamily"])
+            if font_url is not None:
+                layer["fontURL"] = font_url
+        objects.append(layer)
+    expanded = dict(banner)
+    expanded["objects"] = objects
+    return expanded
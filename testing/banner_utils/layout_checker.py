@@ -0,0 +1,192 @@
+"""
+Geometric checks and a quality score for generated banner layouts.
+
+The prompt asks for "no two text layers overlap" and "entire banner is visible in
+1080*1080"; this module measures both, plus whether the CTA text sits inside its
+button and how evenly the layers are spaced. All layers of a banner go into one
+(n, 4) box array and the pairwise intersections are computed with broadcasting, so
+checking a banner takes tens of microseconds and candidates can be ranked or whole
+eval sets scored in bulk.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CANVAS_SIZE = 1080
+TEXT_TYPES = ("text", "textbox")
+
+# score() starts at 1.0 and subtracts these per problem
+OVERLAP_PENALTY = 0.25
+OUT_OF_CANVAS_PENALTY = 0.15
+CTA_PENALTY = 0.2
+SPACING_WEIGHT = 0.2
+
+
+def layer_boxes(banner: dict) -> Tuple[list, np.ndarray]:
+    """
+    Layers and their boxes
+
+    Returns:
+        tuple: (layers, float array of shape (n, 4) with left, top, right, bottom)
+    """
+    layers = [layer for layer in banner.get("objects", []) if isinstance(layer, dict)]
+    boxes = np.array(
+        [[layer.get("left", 0) or 0, layer.get("top", 0) or 0, layer.get("width", 0) or 0, layer.get("height", 0) or 0]
+         for layer in layers],
+        dtype=np.float64,
+    ).reshape(-1, 4)
+    boxes[:, 2:] += boxes[:, :2]
+    return layers, boxes
+
+
+@lru_cache(maxsize=64)
+def _pair_indices(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    return np.triu_indices(n, k=1)
+
+
+def intersection_areas(boxes: np.ndarray) -> np.ndarray:
+    """Intersection area of every pair of boxes (i < j), in np.triu_indices order"""
+    first, second = _pair_indices(len(boxes))
+    a, b = boxes[first], boxes[second]
+    extents = np.minimum(a[:, 2:], b[:, 2:]) - np.maximum(a[:, :2], b[:, :2])
+    np.clip(extents, 0, None, out=extents)
+    return extents[:, 0] * extents[:, 1]
+
+
+def out_of_canvas(boxes: np.ndarray, canvas_width: float = CANVAS_SIZE, canvas_height: float = CANVAS_SIZE,
+                  tolerance: float = 1.0) -> np.ndarray:
+    """Boolean mask of boxes extending past the canvas by more than tolerance pixels"""
+    lower = np.array([-tolerance, -tolerance, -np.inf, -np.inf])
+    upper = np.array([np.inf, np.inf, canvas_width + tolerance, canvas_height + tolerance])
+    return ((boxes < lower) | (boxes > upper)).any(axis=1)
+
+
+def cta_contained(layers: list, boxes: np.ndarray, tolerance: float = 2.0) -> Optional[bool]:
+    """
+    Whether the CTA text lies inside its button
+
+    Returns:
+        True or False for a banner with one CTA text and one CTA shape, None otherwise
+    """
+    cta = [i for i, layer in enumerate(layers) if "cta" in str(layer.get("id", "")).lower()]
+    texts = [i for i in cta if layers[i].get("type") in TEXT_TYPES]
+    shapes = [i for i in cta if layers[i].get("type") not in TEXT_TYPES]
+    if len(texts) != 1 or len(shapes) != 1:
+        return None
+    left, top, right, bottom = boxes[texts[0]].tolist()
+    shape_left, shape_top, shape_right, shape_bottom = boxes[shapes[0]].tolist()
+    return (left >= shape_left - tolerance and top >= shape_top - tolerance
+            and right <= shape_right + tolerance and bottom <= shape_bottom + tolerance)
+
+
+def spacing_uniformity(boxes: np.ndarray, canvas_width: float = CANVAS_SIZE, canvas_height: float = CANVAS_SIZE) -> float:
+    """
+    1 - coefficient of variation of the vertical gaps between consecutive layers, in [0, 1]
+
+    Full-canvas backgrounds are ignored; layers that overlap vertically have no gap.
+    Banners with fewer than two gaps score 1.
+    """
+    sizes = boxes[:, 2:] - boxes[:, :2]
+    foreground = boxes[(sizes < [canvas_width * 0.95, canvas_height * 0.95]).any(axis=1)]
+    if len(foreground) < 3:
+        return 1.0
+    foreground = foreground[np.argsort(foreground[:, 1], kind="stable")]
+    gaps = foreground[1:, 1] - np.maximum.accumulate(foreground[:-1, 3])
+    gaps = gaps[gaps > 0]
+    if len(gaps) < 2:
+        return 1.0
+    mean = gaps.mean()
+    return float(min(1.0, max(0.0, 1 - gaps.std() / mean)))
+
+
+def check_layout(banner: dict, canvas_width: float = None, canvas_height: float = None) -> Dict:
+    """
+    Run every check on one banner
+
+    Args:
+        banner (dict): Condensed or full FabricJS json
+        canvas_width (float): Canvas width (default: banner["width"] or 1080)
+        canvas_height (float): Canvas height (default: banner["height"] or 1080)
+
+    Returns:
+        Dictionary with layers, text_overlaps, text_overlap_area, out_of_canvas,
+        cta_contained, spacing and score
+    """
+    canvas_width = canvas_width or banner.get("width") or CANVAS_SIZE
+    canvas_height = canvas_height or banner.get("height") or CANVAS_SIZE
+    layers, boxes = layer_boxes(banner)
+    is_text = np.array([layer.get("type") in TEXT_TYPES for layer in layers], dtype=bool)
+
+    text_areas = intersection_areas(boxes[is_text])
+    report = {
+        'layers': len(layers),
+        'text_overlaps': int(np.count_nonzero(text_areas)),
+        'text_overlap_area': float(text_areas.sum()),
+        'out_of_canvas': int(np.count_nonzero(out_of_canvas(boxes, canvas_width, canvas_height))),
+        'cta_contained': cta_contained(layers, boxes),
+        'spacing': spacing_uniformity(boxes, canvas_width, canvas_height),
+    }
+    report['score'] = score(report)
+    return report
+
+
+def score(report: Dict) -> float:
+    """Quality in [0, 1] from a check_layout report; higher is better"""
+    value = 1.0 - SPACING_WEIGHT * (1 - report['spacing'])
+    value -= OVERLAP_PENALTY * report['text_overlaps']
+    value -= OUT_OF_CANVAS_PENALTY * report['out_of_canvas']
+    if report['cta_contained'] is False:
+        value -= CTA_PENALTY
+    return max(0.0, value)
+
+
+def rank_layouts(banners: List[Optional[dict]]) -> List[Tuple[float, int]]:
+    """
+    Rank candidate banners, best first
+
+    Args:
+        banners (list): Parsed candidates; None (or anything without objects) ranks last
+
+    Returns:
+        list: (score, index) pairs sorted by descending score, ties keep candidate order
+    """
+    scored = []
+    for index, banner in enumerate(banners):
+        if isinstance(banner, dict) and isinstance(banner.get("objects"), list):
+            scored.append((check_layout(banner)['score'], index))
+        else:
+            scored.append((-1.0, index))
+    return sorted(scored, key=lambda item: (-item[0], item[1]))
+
+
+def main():
+    """Check every banner in final_data and time the checker"""
+    import json
+    import os
+    import time
+
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../final_data")
+    banners = []
+    for file in sorted(os.listdir(data_dir)):
+        if file.endswith(".json"):
+            with open(os.path.join(data_dir, file), "r") as f:
+                banners.append(json.load(f)["output"])
+
+    start_time = time.perf_counter()
+    reports = [check_layout(banner) for banner in banners]
+    elapsed = time.perf_counter() - start_time
+
+    def count(key, predicate):
+        return sum(1 for report in reports if predicate(report[key]))
+
+    print(f"Checked {len(reports)} banners in {1000 * elapsed:.0f} ms ({1e6 * elapsed / len(reports):.0f} us per banner)")
+    print(f"  with text overlaps:   {count('text_overlaps', lambda v: v > 0)}")
+    print(f"  with off-canvas layers: {count('out_of_canvas', lambda v: v > 0)}")
+    print(f"  CTA outside button:   {count('cta_contained', lambda v: v is False)}")
+    print(f"  mean spacing score:   {sum(r['spacing'] for r in reports) / len(reports):.2f}")
+    print(f"  mean score:           {sum(r['score'] for r in reports) / len(reports):.2f}")
+
+
+if __name__ == "__main__":
+    main()
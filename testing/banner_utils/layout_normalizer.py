@@ -0,0 +1,250 @@
+"""
+Layout normalization for expanded (or condensed) banners.
+
+The layer boxes of a banner are copied into one NumPy structured array and the
+whole normalization runs on that array; only the left/top values that changed are
+written back to the layers. In order:
+
+1. snap: text layers whose horizontal center is within SNAP_TOLERANCE of the canvas
+   center are centered exactly, and text left edges within SNAP_TOLERANCE of an
+   earlier text's left edge are aligned to it
+2. push-down: text layers (and CTA buttons, which carry their text) that overlap an
+   earlier one vertically are moved below it, top to bottom
+3. clamp: text layers and CTA buttons are moved back inside the canvas
+4. CTA centering: every CTA text is paired with the nearest CTA shape and centered
+   in it, for any number of CTAs; a text listed before its button is swapped with it
+   so it is drawn on top
+
+Run from the testing/ directory:
+    python banner_utils/layout_normalizer.py
+"""
+from typing import Tuple
+
+import numpy as np
+
+CANVAS_SIZE = 1080
+TEXT_TYPES = ("text", "textbox")
+
+# Pixels; smaller differences are treated as the same alignment / no overlap
+SNAP_TOLERANCE = 4.0
+OVERLAP_TOLERANCE = 2.0
+PUSH_GAP = 8.0
+
+LAYER_DTYPE = np.dtype([
+    ('left', 'f8'),
+    ('top', 'f8'),
+    ('width', 'f8'),
+    ('height', 'f8'),
+    ('is_text', '?'),
+    ('is_cta', '?'),
+    ('button', 'i4'),  # index of the CTA shape a CTA text is paired with, -1 otherwise
+])
+
+
+def to_array(banner: dict) -> np.ndarray:
+    """
+    Layer boxes as a LAYER_DTYPE array; width and height include scaleX/scaleY
+
+    Args:
+        banner (dict): FabricJS json with an objects list
+    """
+    return np.array([
+        (
+            layer.get("left", 0) or 0,
+            layer.get("top", 0) or 0,
+            (layer.get("width", 0) or 0) * (layer.get("scaleX", 1) or 1),
+            (layer.get("height", 0) or 0) * (layer.get("scaleY", 1) or 1),
+            layer.get("type") in TEXT_TYPES,
+            "cta" in str(layer.get("id", "")).lower(),
+            -1,
+        )
+        for layer in banner["objects"]
+    ], dtype=LAYER_DTYPE)
+
+
+def pair_ctas(boxes: np.ndarray) -> np.ndarray:
+    """
+    Pair every CTA text with the CTA shape whose center is nearest to its own
+    (a shape is used once); sets boxes['button'] and returns it
+    """
+    texts = np.flatnonzero(boxes['is_cta'] & boxes['is_text'])
+    shapes = np.flatnonzero(boxes['is_cta'] & ~boxes['is_text'])
+    boxes['button'] = -1
+    if len(texts) == 0 or len(shapes) == 0:
+        return boxes['button']
+    centers = np.stack([boxes['left'] + boxes['width'] / 2, boxes['top'] + boxes['height'] / 2], axis=1)
+    distances = np.linalg.norm(centers[texts][:, None, :] - centers[shapes][None, :, :], axis=2)
+    # Greedy assignment, closest pairs first
+    buttons = boxes['button']
+    used_texts, used_shapes = set(), set()
+    for flat in np.argsort(distances, axis=None, kind="stable").tolist():
+        text, shape = divmod(flat, len(shapes))
+        if text not in used_texts and shape not in used_shapes:
+            buttons[texts[text]] = shapes[shape]
+            used_texts.add(text)
+            used_shapes.add(shape)
+            if len(used_texts) == min(len(texts), len(shapes)):
+                break
+    return buttons
+
+
+def snap_alignment(boxes: np.ndarray, canvas_width: float = CANVAS_SIZE, tolerance: float = SNAP_TOLERANCE):
+    """Center near-centered text layers and align near-equal text left edges, in place"""
+    texts = np.flatnonzero(boxes['is_text'] & ~boxes['is_cta'])
+    if len(texts) == 0:
+        return
+    left, width = boxes['left'][texts], boxes['width'][texts]
+    centered = np.abs(left + width / 2 - canvas_width / 2) <= tolerance
+    left = np.where(centered, (canvas_width - width) / 2, left)
+
+    # Each remaining left edge snaps to the first earlier text within tolerance
+    near = np.abs(left[:, None] - left[None, :]) <= tolerance
+    near &= np.tri(len(texts), k=-1, dtype=bool)
+    near &= ~centered[:, None] & ~centered[None, :]
+    has_anchor = near.any(axis=1)
+    anchors = near.argmax(axis=1)
+    left = np.where(has_anchor, left[anchors], left)
+    boxes['left'][texts] = left
+
+
+def push_down(boxes: np.ndarray, gap: float = PUSH_GAP, tolerance: float = OVERLAP_TOLERANCE):
+    """
+    Move overlapping text layers down, in place
+
+    Text layers and CTA buttons are visited top to bottom; each is moved just below the
+    lowest earlier one it overlaps (by more than tolerance on both axes). CTA texts are
+    skipped, they follow their button in center_ctas().
+    """
+    movable = boxes['is_text'] & ~boxes['is_cta']
+    movable[boxes['button'][boxes['button'] >= 0]] = True
+    order = np.flatnonzero(movable)
+    if len(order) < 2:
+        return
+    order = order[np.argsort(boxes['top'][order], kind="stable")]
+    left, width = boxes['left'][order], boxes['width'][order]
+    horizontal = (np.minimum(left[:, None] + width[:, None], left + width) - np.maximum(left[:, None], left) > tolerance).tolist()
+    # A handful of layers, each depending on the ones above it: plain Python is faster here
+    top, height = boxes['top'][order].tolist(), boxes['height'][order].tolist()
+    for i in range(1, len(order)):
+        bottoms = [top[j] + height[j] for j in range(i) if horizontal[i][j] and top[j] + height[j] - top[i] > tolerance]
+        if bottoms:
+            top[i] = max(bottoms) + gap
+    boxes['top'][order] = top
+
+
+def clamp_to_canvas(boxes: np.ndarray, canvas_width: float = CANVAS_SIZE, canvas_height: float = CANVAS_SIZE):
+    """Move text layers and CTA buttons inside the canvas, in place; layers larger than it are left alone"""
+    movable = boxes['is_text'] & ~boxes['is_cta']
+    movable[boxes['button'][boxes['button'] >= 0]] = True
+    for start, size, limit in (('left', 'width', canvas_width), ('top', 'height', canvas_height)):
+        fits = movable & (boxes[size] <= limit)
+        boxes[start] = np.where(fits, np.clip(boxes[start], 0, limit - boxes[size]), boxes[start])
+
+
+def center_ctas(boxes: np.ndarray):
+    """Center every paired CTA text in its button, in place"""
+    texts = np.flatnonzero(boxes['button'] >= 0)
+    buttons = boxes['button'][texts]
+    boxes['left'][texts] = boxes['left'][buttons] + (boxes['width'][buttons] - boxes['width'][texts]) / 2
+    boxes['top'][texts] = boxes['top'][buttons] + (boxes['height'][buttons] - boxes['height'][texts]) / 2
+
+
+def apply_array(banner: dict, boxes: np.ndarray, original: np.ndarray) -> int:
+    """Write the changed left/top values back to the layers; returns the number of layers moved"""
+    changed = np.flatnonzero(
+        (np.abs(boxes['left'] - original['left']) > 1e-6) | (np.abs(boxes['top'] - original['top']) > 1e-6)
+    )
+    layers = banner["objects"]
+    for index in changed.tolist():
+        layers[index]['left'] = float(boxes['left'][index])
+        layers[index]['top'] = float(boxes['top'][index])
+    return len(changed)
+
+
+def raise_cta_texts(banner: dict, boxes: np.ndarray) -> int:
+    """Swap each CTA text drawn below its button with the button, so the text renders on top"""
+    layers = banner["objects"]
+    texts = np.flatnonzero((boxes['button'] >= 0) & (boxes['button'] > np.arange(len(boxes))))
+    for text in texts.tolist():
+        button = int(boxes['button'][text])
+        layers[text], layers[button] = layers[button], layers[text]
+    return len(texts)
+
+
+def normalize_layout(banner: dict, snap: bool = True, resolve_overlaps: bool = True, clamp: bool = True) -> dict:
+    """
+    Normalize a banner in place (see the module docstring for the steps)
+
+    Args:
+        banner (dict): FabricJS json, condensed or expanded
+        snap (bool): Snap text alignment
+        resolve_overlaps (bool): Push overlapping text layers down
+        clamp (bool): Keep text layers and CTA buttons inside the canvas
+
+    Returns:
+        The same banner dictionary
+    """
+    normalize_with_stats(banner, snap, resolve_overlaps, clamp)
+    return banner
+
+
+def normalize_with_stats(banner: dict, snap: bool = True, resolve_overlaps: bool = True, clamp: bool = True) -> Tuple[dict, int]:
+    """normalize_layout, also returning how many layers moved"""
+    objects = banner.get("objects")
+    if not isinstance(objects, list) or not objects:
+        return banner, 0
+    canvas_width = banner.get("width") or CANVAS_SIZE
+    canvas_height = banner.get("height") or CANVAS_SIZE
+    boxes = to_array(banner)
+    original = boxes.copy()
+    pair_ctas(boxes)
+    if snap:
+        snap_alignment(boxes, canvas_width)
+    if resolve_overlaps:
+        push_down(boxes)
+    if clamp:
+        clamp_to_canvas(boxes, canvas_width, canvas_height)
+    center_ctas(boxes)
+    moved = apply_array(banner, boxes, original)
+    raise_cta_texts(banner, boxes)
+    return banner, moved
+
+
+def main():
+    """Normalize every banner in final_data, time it and re-check it with layout_checker"""
+    import copy
+    import json
+    import os
+    import sys
+    import time
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from banner_utils.layout_checker import check_layout
+
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../final_data")
+    banners = []
+    for file in sorted(os.listdir(data_dir)):
+        if file.endswith(".json"):
+            with open(os.path.join(data_dir, file), "r") as f:
+                banners.append(json.load(f)["output"])
+
+    before = [check_layout(banner) for banner in banners]
+    normalized = copy.deepcopy(banners)
+    start_time = time.perf_counter()
+    moved = [normalize_with_stats(banner)[1] for banner in normalized]
+    elapsed = time.perf_counter() - start_time
+    after = [check_layout(banner) for banner in normalized]
+
+    def count(reports, key, predicate):
+        return sum(1 for report in reports if predicate(report[key]))
+
+    print(f"Normalized {len(banners)} banners in {1000 * elapsed:.0f} ms ({1e6 * elapsed / len(banners):.0f} us per banner)")
+    print(f"  banners changed:        {sum(1 for m in moved if m)}")
+    print(f"  with text overlaps:     {count(before, 'text_overlaps', lambda v: v > 0)} -> {count(after, 'text_overlaps', lambda v: v > 0)}")
+    print(f"  with off-canvas layers: {count(before, 'out_of_canvas', lambda v: v > 0)} -> {count(after, 'out_of_canvas', lambda v: v > 0)}")
+    print(f"  CTA outside button:     {count(before, 'cta_contained', lambda v: v is False)} -> {count(after, 'cta_contained', lambda v: v is False)}")
+    print(f"  mean score:             {sum(r['score'] for r in before) / len(before):.2f} -> {sum(r['score'] for r in after) / len(after):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+Marketplace adapters for the RapidAPI product scrapers, and an async engine that
+scrapes many product URLs concurrently.
+
+Each adapter knows how to turn a product URL into a request for its RapidAPI scraper
+and how to turn the response into the normalized product_info dict used across
+banner_utils. Adapters register themselves by marketplace name in ADAPTERS; adding a
+marketplace means adding one class here.
+"""
+import asyncio
+import os
+import re
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banner_utils.clients import http_request
+from banner_utils.rate_limiter import call_with_backoff, raise_for_retryable_status
+from banner_utils.product_cache import get_product_cache
+
+PRODUCT_INFO_FIELDS = ('product_id', 'url', 'product_name', 'main_image', 'price', 'about_item', 'rating', 'description')
+
+ADAPTERS: Dict[str, "MarketplaceAdapter"] = {}
+
+# Marketplace used when a URL's host is not recognized (the sheets hold Amazon links)
+DEFAULT_MARKETPLACE = "Amazon"
+
+
+def _rapidapi_request(method: str, url: str, **kwargs):
+    """Send a RapidAPI request under the shared rate limiter, retrying 429/5xx responses"""
+    def send():
+        response = http_request(method, url, **kwargs)
+        raise_for_retryable_status(response)
+        return response
+    return call_with_backoff("rapidapi", send)
+
+
+def extract_asin(url: str) -> str:
+    """Extract Amazon product ID from URL"""
+    try:
+        parsed_url = urllib.parse.urlparse(url)
+        for param in parsed_url.path.split('/'):
+            if param.startswith('B0') and len(param) == 10:
+                return param
+        raise ValueError("Could not extract product ID from URL")
+    except Exception as e:
+        raise ValueError(f"Error extracting product ID: {str(e)}")
+
+
+def normalize_url(url: str) -> str:
+    """URL without scheme, "www.", query, fragment or trailing slash, for use as a cache key"""
+    parsed = urllib.parse.urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parsed.path.rstrip('/')}"
+
+
+def normalize_product_info(info: dict, url: str = None) -> dict:
+    """
+    Fill in every product_info field with the types the sheets and prompts expect
+
+    Args:
+        info (dict): product_info as parsed by an adapter
+        url (str): Requested URL, used when the scraper returns none
+    """
+    normalized = {field: info.get(field) for field in PRODUCT_INFO_FIELDS}
+    if not normalized['url'] or normalized['url'] == 'N/A':
+        normalized['url'] = url
+    for field in ('product_id', 'price', 'rating'):
+        normalized[field] = 'N/A' if normalized[field] is None else str(normalized[field])
+    about_item = normalized['about_item']
+    if not isinstance(about_item, list):
+        about_item = [about_item]
+    normalized['about_item'] = [item for item in about_item if item]
+    normalized['description'] = normalized['description'] or ''
+    return normalized
+
+
+def register_adapter(cls):
+    """Class decorator adding an adapter to ADAPTERS under its name"""
+    ADAPTERS[cls.name] = cls()
+    return cls
+
+
+class MarketplaceAdapter:
+    """
+    Base adapter: subclasses set name, api_host and hosts and implement request and parse.
+
+    hosts are substrings of the product URL's host used to detect the marketplace;
+    api_host is the RapidAPI host, which is also the key for per-host concurrency caps.
+    """
+    name = ""
+    api_host = ""
+    hosts = ()
+
+    def matches(self, url: str) -> bool:
+        host = urllib.parse.urlparse(url).netloc.lower()
+        return any(h in host for h in self.hosts)
+
+    def product_key(self, url: str) -> str:
+        """What the scraper API is queried with (an ID extracted from the URL, or the URL)"""
+        return url
+
+    def cache_key(self, url: str) -> str:
+        """Normalized product key: the marketplace ID when there is one, else the normalized URL"""
+        key = self.product_key(url)
+        return f"{self.name}:{normalize_url(url) if key == url else key}"
+
+    def headers(self) -> dict:
+        return {
+            "x-rapidapi-key": os.getenv('X-RAPIDAPI-KEY'),
+            "x-rapidapi-host": self.api_host
+        }
+
+    def request(self, key: str) -> dict:
+        """Keyword arguments for _rapidapi_request (method, url, params/json)"""
+        raise NotImplementedError
+
+    def parse(self, data) -> dict:
+        raise NotImplementedError
+
+    def fetch(self, key: str) -> dict:
+        """Query the scraper API for a product key and parse the response"""
+        kwargs = self.request(key)
+        kwargs.setdefault("headers", self.headers())
+        response = _rapidapi_request(kwargs.pop("method"), kwargs.pop("url"), **kwargs)
+        if response.status_code != 200:
+            print(response.text)
+            raise Exception(f"API call failed: {response.status_code}")
+        return self.parse(response.json())
+
+
+@register_adapter
+class AmazonAdapter(MarketplaceAdapter):
+    name = "Amazon"
+    api_host = "real-time-amazon-data.p.rapidapi.com"
+    hosts = ("amazon.", "amzn.")
+
+    def product_key(self, url: str) -> str:
+        return extract_asin(url)
+
+    def request(self, asin: str) -> dict:
+        return {"method": "GET", "url": f"https://{self.api_host}/product-details",
+                "params": {"asin": asin, "country": "US"}}
+
+    def parse(self, data) -> dict:
+        results = data.get("data", None)
+        if not results:
+            raise Exception(f"API call failed, No result: {data}")
+        product_description = ""
+        if results.get('product_description'):
+            product_description += f"{results.get('product_description')} "
+        if results.get("about_product"):
+            product_description += f"{' '.join(results.get('about_product'))} "
+        if results.get("product_details"):
+            product_description += " ".join([f"{k} - {results.get('product_details')[k]} **" for k in results.get('product_details')])
+
+        return {
+            'product_id': results.get("asin"),
+            'url': results.get("product_url"),
+            'product_name': results.get("product_title"),
+            'main_image': results.get("product_photo"),
+            'price': str(results.get("product_price", "N/A")),
+            'about_item': [product_description],
+            'rating': str(results.get('product_star_rating', 'N/A')),
+            'description': product_description
+        }
+
+
+@register_adapter
+class FlipkartAdapter(MarketplaceAdapter):
+    name = "Flipkart"
+    api_host = "real-time-flipkart-api.p.rapidapi.com"
+    hosts = ("flipkart.",)
+
+    def product_key(self, url: str) -> str:
+        match = re.search(r'/p/(\w+).*?pid=([A-Za-z0-9]+)', url)
+        if not match:
+            raise ValueError("Invalid Flipkart URL")
+        return match.group(2)  # pid parameter from the query string
+
+    def request(self, pid: str) -> dict:
+        return {"method": "GET", "url": f"https://{self.api_host}/product-details", "params": {"pid": pid}}
+
+    def parse(self, data) -> dict:
+        product_description = ""
+        if data.get('description'):
+            product_description += f"{data.get('description')} "
+        if data.get("highlights"):
+            product_description += f"{' '.join(data.get('highlights'))} "
+
+        return {
+            'product_id': data.get("pid"),
+            'url': data.get("url"),
+            'product_name': data.get("title"),
+            'main_image': data.get("images")[0] if data.get("images") else None,
+            'price': str(data.get("price", "N/A")),
+            'about_item': [product_description],
+            'rating': str(data.get('rating', {}).get("overall", {}).get("average", "N/A")),
+            'description': product_description
+        }
+
+
+@register_adapter
+class ShopifyAdapter(MarketplaceAdapter):
+    name = "Shopify"
+    api_host = "shopify-fast-scraper.p.rapidapi.com"
+    hosts = ("myshopify.com",)
+
+    def request(self, product_url: str) -> dict:
+        return {"method": "GET", "url": f"https://{self.api_host}/product", "params": {"url": product_url}}
+
+    def parse(self, data) -> dict:
+        results = data.get("product", {})
+        return {
+            'product_id': str(results.get("id")),
+            'url': results.get("product_url"),
+            'product_name': results.get("title"),
+            'main_image': results.get("image", {}).get("src", None),
+            'price': f'{results.get("variants", [{}])[0].get("price", "N/A")} {results.get("variants", [{}])[0].get("price_currency")}',
+            'about_item': [results.get("body_html")],
+            'rating': str(results.get('product_star_rating', 'N/A')),
+            'description': results.get("body_html")
+        }
+
+
+@register_adapter
+class WooCommerceAdapter(MarketplaceAdapter):
+    name = "WooCommerce"
+    api_host = "woocommerce-scraper2.p.rapidapi.com"
+    hosts = ()  # self-hosted stores, only selected explicitly
+
+    def headers(self) -> dict:
+        return {**super().headers(), "Content-Type": "application/json"}
+
+    def request(self, product_url: str) -> dict:
+        return {"method": "POST", "url": f"https://{self.api_host}/api/woo/scrape-by-url/", "json": {"url": product_url}}
+
+    def parse(self, data) -> dict:
+        results = data.get("data", {})
+        return {
+            'product_id': str(results.get("id")),
+            'url': results.get("product_url"),
+            'product_name': results.get("name"),
+            'main_image': results.get("images", "").split(",")[0],
+            'price': f'{results.get("sale_price")}',
+            'about_item': [results.get("description")],
+            'rating': str(results.get('average_rating', 'N/A')),
+            'description': results.get("description")
+        }
+
+
+@register_adapter
+class EtsyAdapter(MarketplaceAdapter):
+    name = "Etsy"
+    api_host = "etsy-api2.p.rapidapi.com"
+    hosts = ("etsy.",)
+
+    def product_key(self, url: str) -> str:
+        match = re.search(r'/listing/(\d+)', url)
+        if not match:
+            raise ValueError("Invalid Etsy URL")
+        return match.group(1)
+
+    def request(self, listing_id: str) -> dict:
+        return {"method": "GET", "url": f"https://{self.api_host}/product/description", "params": {"listingId": listing_id}}
+
+    def parse(self, data) -> dict:
+        results = data.get("data", {})
+        return {
+            'product_id': str(results.get("productId")),
+            'url': results.get("url"),
+            'product_name': results.get("title"),
+            'main_image': results.get("images", [None])[0],
+            'price': f'{results.get("price", {}).get("salePrice", "N/A")}',
+            'about_item': results.get("category"),
+            'rating': str(results.get('ratingSummary', {}).get("ratingValue", "N/A")),
+            'description': results.get("description")
+        }
+
+
+@register_adapter
+class WalmartAdapter(MarketplaceAdapter):
+    name = "Walmart"
+    api_host = "walmart-data.p.rapidapi.com"
+    hosts = ("walmart.",)
+
+    def request(self, product_url: str) -> dict:
+        return {"method": "GET", "url": f"https://{self.api_host}/details.php", "params": {"url": product_url}}
+
+    def parse(self, data) -> dict:
+        if not data:
+            raise Exception("API call failed: empty response")
+        results = data[0]
+        if results["@type"] != "Product":
+            results = data[1]
+        return {
+            'product_id': str(results.get("sku")),
+            'url': f'{results.get("offers", [{}])[0].get("url", "N/A")}',
+            'product_name': results.get("name"),
+            'main_image': results.get("image", None),
+            'price': f'{results.get("offers", [{}])[0].get("price", "N/A")}',
+            'about_item': [results.get("description")],
+            'rating': str(results.get('aggregateRating', {}).get("ratingValue", "N/A")),
+            'description': results.get("description")
+        }
+
+
+def get_adapter(url: str, marketplace: str = None) -> MarketplaceAdapter:
+    """
+    Adapter for a product URL: the named marketplace if it is registered, otherwise
+    the one whose hosts match the URL, otherwise DEFAULT_MARKETPLACE
+    """
+    if marketplace in ADAPTERS:
+        return ADAPTERS[marketplace]
+    for adapter in ADAPTERS.values():
+        if adapter.matches(url):
+            return adapter
+    return ADAPTERS[DEFAULT_MARKETPLACE]
+
+
+def fetch_product(url: str, marketplace: str = None, use_cache: bool = True) -> dict:
+    """
+    Scrape one product URL and return its normalized product_info
+
+    Goes through the product cache (banner_utils.product_cache): known products are
+    answered from it, refreshed in the background once their entry is past its TTL.
+    """
+    adapter = get_adapter(url, marketplace)
+
+    def fetch():
+        return normalize_product_info(adapter.fetch(adapter.product_key(url)), url)
+
+    cache = get_product_cache() if use_cache else None
+    if cache is None:
+        return fetch()
+    return cache.get_or_fetch(adapter.cache_key(url), fetch)
+
+
+class ScrapeEngine:
+    """
+    Scrapes many product URLs concurrently.
+
+    Blocking scraper calls run in worker threads (through the pooled HTTP session and
+    the shared rapidapi rate limiter). A global semaphore caps the total number of calls
+    in flight and one semaphore per RapidAPI host caps each scraper.
+    """
+
+    def __init__(self, concurrency: int = 16, per_host_limit: int = 4, fetch_fn: Callable = fetch_product):
+        """
+        Args:
+            concurrency (int): Maximum scraper calls in flight
+            per_host_limit (int): Maximum calls in flight per RapidAPI host
+            fetch_fn (Callable): fetch_fn(url, marketplace) -> product_info
+        """
+        self.concurrency = max(1, concurrency)
+        self.per_host_limit = max(1, per_host_limit)
+        self.fetch_fn = fetch_fn
+        self.completed = 0
+        self.failed = 0
+
+    async def _scrape_one(self, url: str, marketplace: Optional[str], limit: asyncio.Semaphore,
+                          host_limits: Dict[str, asyncio.Semaphore], executor: ThreadPoolExecutor, total: int):
+        try:
+            host = get_adapter(url, marketplace).api_host
+            if host not in host_limits:
+                host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+            async with host_limits[host], limit:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(executor, self.fetch_fn, url, marketplace)
+            self.completed += 1
+        except Exception as e:
+            print(f"    ❌ Error scraping {url}: {e}")
+            self.failed += 1
+            result = e
+        done = self.completed + self.failed
+        if done % 50 == 0 or done == total:
+            print(f"[{self.completed} completed, {self.failed} failed / {total}]")
+        return result
+
+    async def scrape(self, urls: List[str], marketplaces: List[Optional[str]] = None) -> List:
+        """
+        Scrape every URL
+
+        Args:
+            urls (List[str]): Product URLs
+            marketplaces (List[Optional[str]]): Marketplace per URL, None to detect it from the host
+
+        Returns:
+            List in the order of urls holding the product_info dict, or the exception for failed URLs
+        """
+        marketplaces = marketplaces or [None] * len(urls)
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="scrape") as executor:
+            return await asyncio.gather(*[
+                self._scrape_one(url, marketplace, limit, host_limits, executor, len(urls))
+                for url, marketplace in zip(urls, marketplaces)
+            ])
+
+    def scrape_sync(self, urls: List[str], marketplaces: List[Optional[str]] = None) -> List:
+        return asyncio.run(self.scrape(urls, marketplaces))
+
+
+def main():
+    """Scrape stand-in URLs with a fake scraper of fixed latency to compare sequential and concurrent runs"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the scrape engine against a fake scraper')
+    parser.add_argument('--urls', type=int, default=200, help='Number of URLs')
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds per scraper call')
+    parser.add_argument('--concurrency', type=int, default=32, help='Calls in flight')
+    parser.add_argument('--per-host-limit', type=int, default=8, help='Calls in flight per RapidAPI host')
+    args = parser.parse_args()
+
+    def fake_fetch(url, marketplace):
+        time.sleep(args.latency)
+        return normalize_product_info({'product_id': url.rsplit('/', 1)[-1], 'product_name': 'Stand-in'}, url)
+
+    templates = [
+        "https://www.amazon.com/dp/B0{:08d}",
+        "https://www.flipkart.com/item/p/itm{0:08d}?pid=PID{0:08d}",
+        "https://www.etsy.com/listing/{:08d}",
+        "https://www.walmart.com/ip/{:08d}",
+    ]
+    urls = [templates[i % len(templates)].format(i) for i in range(args.urls)]
+    engine = ScrapeEngine(args.concurrency, args.per_host_limit, fetch_fn=fake_fetch)
+    start_time = time.perf_counter()
+    results = engine.scrape_sync(urls)
+    wall_time = time.perf_counter() - start_time
+    assert [r['url'] for r in results] == urls
+    print(f"{len(urls)} URLs in {wall_time:.1f}s (sequential would take {len(urls) * args.latency:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
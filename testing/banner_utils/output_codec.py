@@ -0,0 +1,220 @@
+"""
+Compact encoding of the condensed FabricJS output the model generates.
+
+In the standard format every layer repeats its key names ("top", "left",
+"fontFamily", ...). The compact format writes each layer as a positional list,
+with the type first and then the values in the order of OUTPUT_FIELDS (derived
+from layer_schema.important_fields):
+
+    {"type": "text", "top": 60, "left": 288.13, ..., "id": "heading"}
+    ->  ["text",60,288.13,...,"heading"]
+
+Trailing missing values are dropped and missing values in between are written as
+null. Keys outside OUTPUT_FIELDS go into a trailing dict, and layer types
+without a field list stay as dicts, so nothing is lost. The JSON is written
+without spaces, floats are rounded to PRECISION decimals, banner keys equal to
+BANNER_DEFAULTS are left out, and an svg src starting with one of the usual
+SVG_HEADERS starts with "@<index>" instead.
+
+    encode(banner) -> str     the text train.py puts between <json> tags
+    decode(data)   -> dict    standard condensed banner from parsed compact JSON
+
+With OUTPUT_CODEC=compact, train.py trains on this format and both prompts append
+format_instructions(); extract_json_from_response and get_best_result decode it
+automatically, so the rest of the pipeline only sees standard banners.
+
+Run from the testing/ directory to measure the savings over final_data:
+    python banner_utils/output_codec.py --tokenizer unsloth/Qwen3-14B
+"""
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banner_utils.layer_schema import important_fields
+
+# "json" (standard condensed FabricJS) or "compact"; train.py and test_qwen.py must agree
+OUTPUT_CODEC = os.getenv("OUTPUT_CODEC", "json")
+PRECISION = 2
+
+# fontSize is computed by fix_font_size after generation; the model never writes it
+OUTPUT_FIELDS: Dict[str, List[str]] = {
+    layer_type: [field for field in fields if field not in ("type", "fontSize")]
+    for layer_type, fields in important_fields.items()
+}
+_FIELD_SETS = {layer_type: set(fields) for layer_type, fields in OUTPUT_FIELDS.items()}
+
+BANNER_DEFAULTS = {"height": 1080, "width": 1080, "version": "5.3.0"}
+
+# The <svg> openings used by final_data, most common first; append only, the index is the encoding
+SVG_HEADERS = (
+    "<svg width='1080' height='1080' viewBox='0 0 1080 1080' xmlns='http://www.w3.org/2000/svg'>",
+    "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 1080 1080'>",
+    "<svg xmlns='http://www.w3.org/2000/svg' width='1080' height='1080' viewBox='0 0 1080 1080' fill='none'>",
+    "<svg width='1080' height='1080' viewBox='0 0 1080 1080' fill='none' xmlns='http://www.w3.org/2000/svg'>",
+    "<svg xmlns='http://www.w3.org/2000/svg' width='1080' height='1080' viewBox='0 0 1080 1080'>",
+    "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 1080 1080' fill='none'>",
+)
+_SVG_MARKER = re.compile(r"@(\d+)")
+
+
+def _round(value: Any) -> Any:
+    if isinstance(value, float):
+        value = round(value, PRECISION)
+        return int(value) if value.is_integer() else value
+    return value
+
+
+def _encode_src(src: Any) -> Any:
+    if isinstance(src, str):
+        for index, header in enumerate(SVG_HEADERS):
+            if src.startswith(header):
+                return f"@{index}{src[len(header):]}"
+    return src
+
+
+def _decode_src(src: Any) -> Any:
+    if isinstance(src, str):
+        match = _SVG_MARKER.match(src)
+        if match and int(match.group(1)) < len(SVG_HEADERS):
+            return SVG_HEADERS[int(match.group(1))] + src[match.end():]
+    return src
+
+
+def encode_layer(layer: dict) -> Any:
+    """Positional list for one layer (the layer itself for unknown types)"""
+    fields = OUTPUT_FIELDS.get(layer.get("type"))
+    if fields is None:
+        return layer
+    values = [layer["type"]] + [_round(layer.get(field)) for field in fields]
+    if layer["type"] == "svg" and "src" in layer:
+        values[fields.index("src") + 1] = _encode_src(layer["src"])
+    while len(values) > 1 and values[-1] is None:
+        values.pop()
+    # null means missing, so explicit None values travel with the unknown keys
+    extras = {key: value for key, value in layer.items()
+              if key != "type" and (key not in _FIELD_SETS[layer["type"]] or value is None)}
+    if extras:
+        values.append(extras)
+    return values
+
+
+def decode_layer(values: Any) -> Any:
+    """Layer dict from a positional list (dicts are returned unchanged)"""
+    if not isinstance(values, list) or not values or values[0] not in OUTPUT_FIELDS:
+        return values
+    layer = {'type': values[0]}
+    extras = values[-1] if len(values) > 1 and isinstance(values[-1], dict) else None
+    positional = values[1:-1] if extras is not None else values[1:]
+    for field, value in zip(OUTPUT_FIELDS[values[0]], positional):
+        if value is not None:
+            layer[field] = value
+    if layer["type"] == "svg" and "src" in layer:
+        layer["src"] = _decode_src(layer["src"])
+    if extras:
+        layer.update(extras)
+    return layer
+
+
+def encode(banner: dict) -> str:
+    """Compact JSON text for a condensed banner"""
+    compact = {}
+    for key, value in banner.items():
+        if key == "objects":
+            compact[key] = [encode_layer(layer) for layer in value]
+        elif key not in BANNER_DEFAULTS or BANNER_DEFAULTS[key] != value:
+            compact[key] = value
+    return json.dumps(compact, separators=(",", ":"), ensure_ascii=False)
+
+
+def is_compact(data: Any) -> bool:
+    """True when a parsed banner uses positional layers"""
+    return isinstance(data, dict) and isinstance(data.get("objects"), list) and any(
+        isinstance(layer, list) for layer in data["objects"]
+    )
+
+
+def decode(data: dict) -> dict:
+    """Standard condensed banner from a parsed compact one (standard banners pass through)"""
+    if not is_compact(data):
+        return data
+    banner = {}
+    for key, value in data.items():
+        if key == "objects":
+            # Defaults go back in their standard place, right after backgroundColor
+            for default_key in ("height", "width"):
+                banner.setdefault(default_key, BANNER_DEFAULTS[default_key])
+            banner[key] = [decode_layer(layer) for layer in value]
+        else:
+            banner[key] = value
+    banner.setdefault("version", BANNER_DEFAULTS["version"])
+    return banner
+
+
+def format_instructions() -> str:
+    """Prompt paragraph describing the compact format, appended to the prompt when OUTPUT_CODEC is compact"""
+    return (
+        "Write the json in compact form: every layer in \"objects\" is a list of its values, the layer type first "
+        f"and then the values in this order for the layer type: {json.dumps(OUTPUT_FIELDS)}. "
+        f"Leave out the banner keys {json.dumps(BANNER_DEFAULTS)} when they have these values. "
+        f"An svg src may start with @0, @1, ... instead of the matching opening tag from this list: {json.dumps(SVG_HEADERS)}."
+    )
+
+
+def main():
+    """Token (or character) savings of the compact format over final_data, with a round-trip check"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure the compact output format on final_data')
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../final_data"))
+    parser.add_argument('--tokenizer', default=None, help='Hugging Face tokenizer to count tokens with (default: characters)')
+    args = parser.parse_args()
+
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+        def count(text):
+            return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+        unit = "tokens"
+    else:
+        count = len
+        unit = "chars"
+
+    standard_total = compact_total = mismatches = 0
+    savings = []
+    files = [f for f in os.listdir(args.data) if f.endswith(".json") and f.split(".")[0].isdigit()]
+    for file in files:
+        with open(os.path.join(args.data, file), "r") as f:
+            banner = json.load(f)["output"]
+        standard = count(json.dumps(banner))
+        compact_text = encode(banner)
+        compact = count(compact_text)
+        standard_total += standard
+        compact_total += compact
+        savings.append(1 - compact / standard)
+
+        decoded = decode(json.loads(compact_text))
+        for original, layer in zip(banner["objects"], decoded["objects"]):
+            for key, value in original.items():
+                if isinstance(value, float) and abs(value - layer.get(key, float("nan"))) <= 10 ** -PRECISION:
+                    continue
+                if layer.get(key) != value:
+                    mismatches += 1
+        if len(decoded["objects"]) != len(banner["objects"]):
+            mismatches += 1
+        if [key for key in decoded if key != "objects"] != [key for key in banner if key != "objects"]:
+            mismatches += 1
+        mismatches += sum(decoded[key] != value for key, value in banner.items() if key != "objects")
+
+    savings.sort()
+    print(f"{len(files)} banners, {unit}: standard {standard_total / len(files):.0f}, compact {compact_total / len(files):.0f} per banner")
+    print(f"  saved {1 - compact_total / standard_total:.1%} overall, "
+          f"p10 {savings[len(savings) // 10]:.1%}, median {savings[len(savings) // 2]:.1%}, p90 {savings[9 * len(savings) // 10]:.1%}")
+    print(f"  round trip: {'✅ lossless' if not mismatches else f'❌ {mismatches} mismatched values'} (floats within {10 ** -PRECISION})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Read-through cache for marketplace product lookups, stored in a single SQLite file.
+
+Entries are keyed by a normalized product key ("Amazon:B0...", "Flipkart:<pid>",
+"Etsy:<listingId>", or "<marketplace>:<normalized url>" for URL-keyed scrapers).
+An entry younger than ttl is served as is. An older one is still served right away
+(stale-while-revalidate) while a background thread refetches it, unless it is older
+than max_stale, in which case the caller waits for the fetch. Configurable through
+the environment:
+
+    PRODUCT_CACHE_PATH       SQLite file (default output/product_cache.sqlite3)
+    PRODUCT_CACHE_TTL        seconds an entry is fresh (default 7 days)
+    PRODUCT_CACHE_MAX_STALE  seconds a stale entry may still be served (default 30 days)
+    PRODUCT_CACHE            set to "off" to bypass the cache
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+PRODUCT_CACHE_PATH = os.getenv("PRODUCT_CACHE_PATH", "output/product_cache.sqlite3")
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", str(7 * 24 * 3600)))
+PRODUCT_CACHE_MAX_STALE = float(os.getenv("PRODUCT_CACHE_MAX_STALE", str(30 * 24 * 3600)))
+PRODUCT_CACHE_ENABLED = os.getenv("PRODUCT_CACHE", "on").lower() not in ("off", "0", "false")
+
+
+class ProductCache:
+    """
+    SQLite-backed product cache with TTL and stale-while-revalidate.
+
+    One connection is shared by all threads behind a lock; the database runs in WAL mode
+    so other processes can read while one writes. Data is stored per namespace:
+    "scraped" for scraper responses and "processed" for product details after image
+    processing.
+    """
+
+    def __init__(self, path: str = PRODUCT_CACHE_PATH, ttl: float = PRODUCT_CACHE_TTL,
+                 max_stale: float = PRODUCT_CACHE_MAX_STALE, refresh_workers: int = 2):
+        """
+        Args:
+            path (str): SQLite file, created if missing (":memory:" for a private cache)
+            ttl (float): Seconds an entry is served without refreshing it
+            max_stale (float): Seconds an entry may be served while it is refreshed in the background
+            refresh_workers (int): Background refresh threads
+        """
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_stale = max(ttl, max_stale)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="product-cache")
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+
+    def get(self, key: str, namespace: str = "scraped"):
+        """
+        Cached entry for a key
+
+        Returns:
+            tuple: (data, age in seconds), or (None, None) when the key is not cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM products WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def put(self, key: str, data: dict, namespace: str = "scraped"):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO products (namespace, key, data, fetched_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(data), time.time())
+            )
+
+    def delete(self, key: str, namespace: str = "scraped"):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM products WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def get_or_fetch(self, key: str, fetch_fn: Callable[[], dict], namespace: str = "scraped") -> dict:
+        """
+        Read-through lookup
+
+        Args:
+            key (str): Normalized product key
+            fetch_fn (Callable): Called with no arguments to fetch the data on a miss or refresh
+            namespace (str): Cache namespace
+
+        Returns:
+            The cached or freshly fetched data
+        """
+        data, age = self.get(key, namespace)
+        if data is not None and age <= self.ttl:
+            self.hits += 1
+            return data
+        if data is not None and age <= self.max_stale:
+            self.stale_hits += 1
+            self._refresh_in_background(key, fetch_fn, namespace)
+            return data
+
+        self.misses += 1
+        data = fetch_fn()
+        self.put(key, data, namespace)
+        return data
+
+    def _refresh_in_background(self, key: str, fetch_fn: Callable[[], dict], namespace: str):
+        with self._lock:
+            if (namespace, key) in self._refreshing:
+                return
+            self._refreshing.add((namespace, key))
+
+        def refresh():
+            try:
+                self.put(key, fetch_fn(), namespace)
+            except Exception as e:
+                # Keep serving the stale entry; the next lookup tries again
+                print(f"Background refresh of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard((namespace, key))
+
+        self._refresher.submit(refresh)
+
+    def wait_for_refreshes(self):
+        """Block until the background refreshes queued so far are done"""
+        self._refresher.submit(lambda: None).result()
+        while self._refreshing:
+            time.sleep(0.01)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_product_cache() -> Optional[ProductCache]:
+    """Process-wide cache, None when PRODUCT_CACHE=off"""
+    global _cache
+    if not PRODUCT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProductCache()
+    return _cache
@@ -0,0 +1,204 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Default (requests per second, burst) for each external service. The Sheets API allows
+# 60 write requests per minute per user; the others are the plan quotas we run on.
+# Override with RATE_LIMIT_<SERVICE>=<rate>[/<burst>], e.g. RATE_LIMIT_OPENAI=20/40, or 0 for no limit
+SERVICE_LIMITS = {
+    'sheets': (1.0, 10),
+    'openai': (8.0, 16),
+    'rapidapi': (5.0, 5),
+    'wasabi': (20.0, 40),
+    'bg_remover': (4.0, 8),
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RetryableServiceError(Exception):
+    """Raised for a throttled (429) or temporarily unavailable (5xx) response"""
+
+    def __init__(self, status_code: int, retry_after: float = None, message: str = ""):
+        super().__init__(message or f"Service returned {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` calls per second on average and bursts of
+    up to `capacity` calls. acquire() blocks until a token is available, and pause()
+    stops handing out tokens until a server-imposed Retry-After has passed. A rate of 0
+    means unlimited: only pause() makes acquire() wait.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate < 0:
+            raise ValueError(f"rate must be >= 0, got {rate}")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens, sleeping until they are available
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate == 0:
+                    return waited
+                elif self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                else:
+                    wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for the next `seconds` and drop the accumulated burst"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits_for(service: str):
+    """(rate, burst) for a service; a rate of 0 means unlimited"""
+    rate, burst = SERVICE_LIMITS.get(service, (1.0, 1))
+    override = os.getenv(f"RATE_LIMIT_{service.upper()}")
+    if override:
+        parts = override.split('/')
+        rate = float(parts[0])
+        burst = float(parts[1]) if len(parts) > 1 else max(1.0, rate)
+        if rate < 0 or burst <= 0:
+            raise ValueError(f"RATE_LIMIT_{service.upper()}={override}: rate must be >= 0 and burst > 0")
+    return rate, burst
+
+
+def get_limiter(service: str) -> TokenBucket:
+    """Process-wide token bucket for an external service"""
+    with _limiters_lock:
+        if service not in _limiters:
+            _limiters[service] = TokenBucket(*_limits_for(service))
+        return _limiters[service]
+
+
+def parse_retry_after(value) -> float:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds, None if absent"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_retryable_status(response):
+    """Raise RetryableServiceError when a requests.Response is a 429 or a transient 5xx"""
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableServiceError(
+            response.status_code,
+            parse_retry_after(response.headers.get('Retry-After')),
+            f"Service returned {response.status_code}: {response.text[:200]}",
+        )
+
+
+def _retry_info(error: Exception):
+    """
+    Extract (status_code, retry_after) from the exceptions raised by the clients we use:
+    RetryableServiceError, requests/gspread (error.response), openai (error.status_code)
+    and botocore (error.response dict).
+    """
+    if isinstance(error, RetryableServiceError):
+        return error.status_code, error.retry_after
+
+    status_code = getattr(error, 'status_code', None)
+    headers = {}
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        metadata = response.get('ResponseMetadata', {})
+        status_code = status_code or metadata.get('HTTPStatusCode')
+        headers = metadata.get('HTTPHeaders', {})
+    elif response is not None:
+        status_code = status_code or getattr(response, 'status_code', None)
+        headers = getattr(response, 'headers', None) or {}
+
+    retry_after = headers.get('Retry-After') or headers.get('retry-after')
+    return status_code, parse_retry_after(retry_after)
+
+
+def _is_connection_error(error: Exception) -> bool:
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        'ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout',
+        'APIConnectionError', 'APITimeoutError', 'EndpointConnectionError',
+    )
+
+
+def call_with_backoff(service: str, fn, *args, max_retries: int = 5, base_delay: float = 1.0,
+                      max_delay: float = 60.0, **kwargs):
+    """
+    Call fn under the service's rate limiter, retrying throttled and transient failures.
+
+    A Retry-After from the server is always honored in full, and on a 429 it pauses the
+    whole service bucket for that long, so every caller backs off together. Otherwise
+    retries use exponential backoff with full jitter. Non-retryable errors are raised
+    immediately.
+
+    Args:
+        service (str): Key in SERVICE_LIMITS
+        fn: Callable to invoke with *args and **kwargs
+        max_retries (int): Retries after the first attempt
+        base_delay (float): Backoff base in seconds
+        max_delay (float): Cap on a single jittered backoff in seconds (not on Retry-After)
+
+    Returns:
+        Whatever fn returns
+    """
+    limiter = get_limiter(service)
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            status_code, retry_after = _retry_info(e)
+            if status_code not in RETRYABLE_STATUS_CODES and not _is_connection_error(e):
+                raise
+            if attempt == max_retries:
+                raise
+            if retry_after is not None:
+                delay = retry_after
+                if status_code == 429:
+                    limiter.pause(delay)
+            else:
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"{service}: {status_code or type(e).__name__}, retrying in {delay:.1f}s "
+                  f"(attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
@@ -1,11 +1,13 @@
 import os
+import sys
 import json
 import time
-import requests
 import subprocess
 import copy
 from uuid import uuid4
 from concurrent.futures import ThreadPoolExecutor, as_completed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banner_utils.clients import http_get
 
 
 def fix_font_size(banner_config):
@@ -18,24 +20,24 @@ def fix_font_size(banner_config):
             save_name = fontUrl.split('/')[-1]
             if os.path.exists(f'tmp/fonts/{save_name}'):
                 continue
-            response = requests.get(fontUrl)
+            response = http_get(fontUrl)
             print(save_name, response.status_code)
             if response.status_code == 200:
-                with open(f'tmp/fonts/{save_name}', 'wb') as f:
+                # Write then rename so concurrent workers never read a partial font file
+                tmp_name = f'tmp/fonts/{save_name}.{uuid4().hex}'
+                with open(tmp_name, 'wb') as f:
                     f.write(response.content)
+                os.replace(tmp_name, f'tmp/fonts/{save_name}')
 
-    for layer in banner_config['objects']:
+    # Keyed by layer index, so results go straight back to their slot (and duplicate ids stay distinct)
+    for idx, layer in enumerate(banner_config['objects']):
         if layer['type'] == 'text' or layer['type'] == 'textbox':
-            text_objects[layer['id']] = layer
+            text_objects[idx] = layer
 
     with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {text_id: executor.submit(get_font_size, text_objects[text_id]) for text_id in text_objects}
-        for text_id, future in futures.items():
-            text_object = future.result()
-            for idx, layer in enumerate(banner_config['objects']):
-                if layer['id'] == text_id:
-                    banner_config['objects'][idx] = text_object
-                    break
+        futures = {idx: executor.submit(get_font_size, text_objects[idx]) for idx in text_objects}
+        for idx, future in futures.items():
+            banner_config['objects'][idx] = future.result()
     return banner_config
 
 
@@ -136,10 +138,15 @@ def render_banner(banner_config, input_file='input_config.json', output_file='up
         if layers['type'] == 'text' or layers['type'] == 'textbox':
             fontUrl = layers['fontURL']
             save_name = fontUrl.split('/')[-1]
-            response = requests.get(fontUrl)
+            if os.path.exists(f'tmp/fonts/{save_name}'):
+                continue
+            response = http_get(fontUrl)
             if response.status_code == 200:
-                with open(f'tmp/fonts/{save_name}', 'wb') as f:
+                # Write then rename so concurrent renders never read a partial font file
+                tmp_name = f'tmp/fonts/{save_name}.{uuid4().hex}'
+                with open(tmp_name, 'wb') as f:
                     f.write(response.content)
+                os.replace(tmp_name, f'tmp/fonts/{save_name}')
     with open(input_file, 'w') as f:
         json.dump(banner_config, f, indent=4)
     
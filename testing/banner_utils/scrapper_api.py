@@ -1,221 +1,51 @@
 import os
 import json
-import requests
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import datetime
-import urllib.parse
-import re
+from banner_utils.clients import http_request
+from banner_utils.marketplaces import ADAPTERS, ScrapeEngine, extract_asin, fetch_product
 
 class RapidAPIClient:
     def __init__(self):
         load_dotenv()
         self.x_rapidapi_key = os.getenv('X-RAPIDAPI-KEY')
-        self.api_url = "https://real-time-amazon-data.p.rapidapi.com/product-details"
-        self.headers = {
-            "x-rapidapi-key": self.x_rapidapi_key,
-            "x-rapidapi-host": "real-time-amazon-data.p.rapidapi.com"
-        }
         
         if not all([self.x_rapidapi_key]):
             raise ValueError("X-RAPIDAPI-KEY credentials not found in environment variables")
 
     def get_flipkart_product_details(self, pid: str) -> dict:
         print(f"PID: {pid}")
-        url = "https://real-time-flipkart-api.p.rapidapi.com/product-details"
-        querystring = {"pid":pid}
-        headers = {
-            "x-rapidapi-key": os.getenv('X-RAPIDAPI-KEY'),
-            "x-rapidapi-host": "real-time-flipkart-api.p.rapidapi.com"
-        }
-        response = requests.get(url, headers=headers, params=querystring)
-        if response.status_code != 200:
-            raise Exception(f"API call failed: {response.status_code}")
-        data = response.json()
-        product_description = ""
-        if data.get('description'):
-            product_description += f"{data.get('description')} "
-        if data.get("highlights"):
-            product_description += f"{' '.join(data.get('highlights'))} "
-
-        product_info = {
-            'product_id': data.get("pid"),
-            'url': data.get("url"),
-            'product_name': data.get("title"),
-            'main_image': data.get("images")[0] if data.get("images") else None,
-            'price': str(data.get("price", "N/A")),
-            'about_item': [product_description],
-            'rating': str(data.get('rating', {}).get("overall", {}).get("average", "N/A")),
-            'description': product_description
-        }
-        return product_info
+        return ADAPTERS["Flipkart"].fetch(pid)
     
     def get_shopify_product_details(self, product_url: str) -> dict:
-        url = "https://shopify-fast-scraper.p.rapidapi.com/product"
-        querystring = {"url":product_url}
-        headers = {
-            "x-rapidapi-key": os.getenv('X-RAPIDAPI-KEY'),
-            "x-rapidapi-host": "shopify-fast-scraper.p.rapidapi.com"
-        }
-        response = requests.get(url, headers=headers, params=querystring)
-        if response.status_code != 200:
-            print(response.text)
-            raise Exception(f"API call failed: {response.status_code}")
-
-        data = response.json()
-        results = data.get("product", {})
-        product_info = {
-            'product_id': str(results.get("id")),
-            'url': results.get("product_url"),
-            'product_name': results.get("title"),
-            'main_image': results.get("image", {}).get("src", None),
-            'price': f'{results.get("variants", [{}])[0].get("price", "N/A")} {results.get("variants", [{}])[0].get("price_currency")}',
-            'about_item': [results.get("body_html")],
-            'rating': str(results.get('product_star_rating', 'N/A')),
-            'description': results.get("body_html")
-        }
-        return product_info
+        return ADAPTERS["Shopify"].fetch(product_url)
 
     def get_woocommerce_product_details(self, product_url: str) -> dict:
-        url = "https://woocommerce-scraper2.p.rapidapi.com/api/woo/scrape-by-url/"
-        payload = { "url": product_url}
-        headers = {
-            "x-rapidapi-key": os.getenv('X-RAPIDAPI-KEY'),
-            "x-rapidapi-host": "woocommerce-scraper2.p.rapidapi.com",
-            "Content-Type": "application/json"
-        }
-        response = requests.post(url, json=payload, headers=headers)
-        if response.status_code != 200:
-            print(response.text)
-            raise Exception(f"API call failed: {response.status_code}")
-        data = response.json()
-        results = data.get("data", {})
-        product_info = {
-            'product_id': str(results.get("id")),
-            'url': results.get("product_url"),
-            'product_name': results.get("name"),
-            'main_image': results.get("images", "").split(",")[0],
-            'price': f'{results.get("sale_price")}',
-            'about_item': [results.get("description")],
-            'rating': str(results.get('average_rating', 'N/A')),
-            'description': results.get("description")
-        }
-        return product_info
+        return ADAPTERS["WooCommerce"].fetch(product_url)
     
     def get_etsy_product_details(self, listing_id):
-        url = "https://etsy-api2.p.rapidapi.com/product/description"
-        querystring = {"listingId": listing_id}
-        headers = {
-            "x-rapidapi-key": os.getenv('X-RAPIDAPI-KEY'),
-            "x-rapidapi-host": "etsy-api2.p.rapidapi.com"
-        }
-        response = requests.get(url, headers=headers, params=querystring)
-        if response.status_code != 200:
-            print(response.text)
-            raise Exception(f"API call failed: {response.status_code}")
-        data = response.json()
-        results = data.get("data", {})
-        product_info = {
-            'product_id': str(results.get("productId")),
-            'url': results.get("url"),
-            'product_name': results.get("title"),
-            'main_image': results.get("images", [None])[0],
-            'price': f'{results.get("price", {}).get("salePrice", "N/A")}',
-            'about_item': results.get("category"),
-            'rating': str(results.get('ratingSummary', {}).get("ratingValue", "N/A")),
-            'description': results.get("description")
-        }
-        return product_info
+        return ADAPTERS["Etsy"].fetch(listing_id)
     
     def get_walmart_product_details(self, product_url):
-        url = "https://walmart-data.p.rapidapi.com/details.php"
-        querystring = {"url":product_url}
-        headers = {
-            "x-rapidapi-key": os.getenv('X-RAPIDAPI-KEY'),
-            "x-rapidapi-host": "walmart-data.p.rapidapi.com"
-        }
-        response = requests.get(url, headers=headers, params=querystring)
-        if response.status_code != 200:
-            print(response.text)
-            raise Exception(f"API call failed: {response.status_code}")
-        data = response.json()
-        if data:
-            results = data[0]
-            if results["@type"] != "Product":
-                results = data[1]
-            product_info = {
-                'product_id': str(results.get("sku")),
-                'url': f'{results.get("offers", [{}])[0].get("url", "N/A")}',
-                'product_name': results.get("name"),
-                'main_image': results.get("image", None),
-                'price': f'{results.get("offers", [{}])[0].get("price", "N/A")}',
-                'about_item': [results.get("description")],
-                'rating': str(results.get('aggregateRating', {}).get("ratingValue", "N/A")),
-                'description': results.get("description")
-            }
-            print(product_info)
-            return product_info
-        else:
-            raise Exception(f"API call failed: {response.status_code}")
+        return ADAPTERS["Walmart"].fetch(product_url)
 
     def get_product_details(self, url: str, marketplace: str) -> dict:
-        if marketplace == "Flipkart":
-            pattern = r'/p/(\w+).*?pid=([A-Za-z0-9]+)'
-            match = re.search(pattern, url)
-            if match:
-                product_id = match.group(1)  # Product ID after '/p/'
-                pid = match.group(2)         # pid parameter from the query string
-            else:
-                raise ValueError("Invalid Flipkart URL")        
-            return self.get_flipkart_product_details(pid)
-        if marketplace == "Walmart":
-            return self.get_walmart_product_details(url)
-        if marketplace == "Shopify":
-            return self.get_shopify_product_details(url)
-        if marketplace == "WooCommerce":
-            return self.get_woocommerce_product_details(url)
-        if marketplace == "Etsy":
-            pattern = r'/listing/(\d+)'
-            match = re.search(pattern, url)
-            if match:
-                listing_id = match.group(1)
-            else:
-                raise ValueError("Invalid Etsy URL") 
-            return self.get_etsy_product_details(listing_id)    
-
-
-        querystring = {"asin":OxylabsClient._extract_product_id("self", url), "country":"US"}
-        response = requests.get(
-                self.api_url,
-                headers=self.headers,
-                params=querystring
-            )
-        if response.status_code != 200:
-            raise Exception(f"API call failed: {response.status_code}")
-        data = response.json()
-        results = data.get("data", None)
-        if not results:
-            raise Exception(f"API call failed, No result: {data}")
-        product_description = ""
-        if results.get('product_description'):
-            product_description += f"{results.get('product_description')} "
-        if results.get("about_product"):
-            product_description += f"{' '.join(results.get('about_product'))} "
-        if results.get("product_details"):
-            product_description += " ".join([f"{k} - {results.get('product_details')[k]} **" for k in results.get('product_details')])
+        """
+        Fetch product details through the marketplace's adapter (banner_utils.marketplaces).
+        Unknown marketplaces are detected from the URL's host and default to Amazon.
+        """
+        return fetch_product(url, marketplace)
 
+    def get_many_product_details(self, urls: list, marketplaces: list = None,
+                                 concurrency: int = 16, per_host_limit: int = 4) -> list:
+        """
+        Fetch product details for many URLs concurrently
 
-        product_info = {
-            'product_id': results.get("asin"),
-            'url': results.get("product_url"),
-            'product_name': results.get("product_title"),
-            'main_image': results.get("product_photo"),
-            'price': str(results.get("product_price", "N/A")),
-            'about_item': [product_description],
-            'rating': str(results.get('product_star_rating', 'N/A')),
-            'description': product_description
-        }
-        return product_info
+        Returns:
+            List in the order of urls holding product_info dicts, or the exception for failed URLs
+        """
+        return ScrapeEngine(concurrency, per_host_limit).scrape_sync(urls, marketplaces)
 
 class OxylabsClient:
     def __init__(self):
@@ -229,14 +59,7 @@ class OxylabsClient:
             
     def _extract_product_id(self, url: str) -> str:
         """Extract Amazon product ID from URL"""
-        try:
-            parsed_url = urllib.parse.urlparse(url)
-            for param in parsed_url.path.split('/'):
-                if param.startswith('B0') and len(param) == 10:
-                    return param
-            raise ValueError("Could not extract product ID from URL")
-        except Exception as e:
-            raise ValueError(f"Error extracting product ID: {str(e)}") 
+        return extract_asin(url)
 
     def get_product_details(self, url: str, marketplace: str) -> dict:
         """Fetch product details from Oxylabs API"""
@@ -261,10 +84,12 @@ class OxylabsClient:
                 payload["geo_location"] = "United States"
                 # payload.pop("parse")
 
-            response = requests.post(
+            response = http_request(
+                "POST",
                 self.api_url,
                 auth=(self.username, self.password),
-                json=payload
+                json=payload,
+                timeout=180  # realtime scraping jobs can take minutes
             )
             
             if response.status_code != 200:
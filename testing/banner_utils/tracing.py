@@ -0,0 +1,333 @@
+"""
+Span-based latency tracing for banner generation.
+
+    with span("post_process", layers=12):
+        with span("fix_font_size"):
+            ...
+
+Spans nest through a context variable, so threads and asyncio tasks keep their own
+parent. When a root span ends, the whole trace is appended to a JSONL file (one span
+per line) and kept in memory for print_summary(). Configurable through the
+environment:
+
+    BANNER_TRACE        set to "1" to record spans; when unset span() returns a shared
+                        no-op object and costs one global lookup
+    BANNER_TRACE_FILE   JSONL output (default output/traces.jsonl, "" to skip)
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Optional
+
+BANNER_TRACE = os.getenv("BANNER_TRACE", "0").lower() in ("1", "true", "on")
+BANNER_TRACE_FILE = os.getenv("BANNER_TRACE_FILE", "output/traces.jsonl")
+
+_current_span = contextvars.ContextVar("banner_span", default=None)
+_ids = itertools.count(1)
+
+
+class _NoopSpan:
+    """Returned by span() when tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed operation; use through span()"""
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_ids)
+        self.parent: Optional[Span] = None
+        self.trace_id = None
+        self.start = None
+        self.duration = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attrs):
+        """Attach attributes (token counts, sizes, ...) to the span"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent else self.span_id
+        self._token = _current_span.set(self)
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._perf_start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer.finish(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': 1000 * self.duration,
+            'attrs': self.attrs,
+            'error': self.error,
+        }
+
+
+class Tracer:
+    """Collects finished spans and exports them per trace"""
+
+    def __init__(self, export_path: str = BANNER_TRACE_FILE, max_spans: int = 100000):
+        """
+        Args:
+            export_path (str): JSONL file each finished trace is appended to ("" to skip)
+            max_spans (int): Spans kept in memory for the summary
+        """
+        self.export_path = export_path
+        self.max_spans = max_spans
+        self.spans: List[dict] = []
+        self._open_traces: Dict[int, List[dict]] = {}
+        self._lock = threading.Lock()
+
+    def finish(self, span: Span):
+        record = span.to_dict()
+        with self._lock:
+            self._open_traces.setdefault(span.trace_id, []).append(record)
+            if len(self.spans) < self.max_spans:
+                self.spans.append(record)
+            trace = self._open_traces.pop(span.trace_id) if span.parent is None else None
+        if trace is not None:
+            self.export(trace)
+
+    def record(self, name: str, start: float, duration: float, **attrs):
+        """
+        Add a span measured elsewhere (e.g. prefill and decode, timed by the streamer) as
+        a child of the current span
+
+        Args:
+            name (str): Span name
+            start (float): time.time() at the start
+            duration (float): Seconds
+        """
+        recorded = Span(self, name, attrs)
+        recorded.parent = _current_span.get()
+        recorded.trace_id = recorded.parent.trace_id if recorded.parent else recorded.span_id
+        recorded.start = start
+        recorded.duration = duration
+        self.finish(recorded)
+
+    def export(self, trace: List[dict]):
+        if not self.export_path:
+            return
+        if os.path.dirname(self.export_path):
+            os.makedirs(os.path.dirname(self.export_path), exist_ok=True)
+        with self._lock, open(self.export_path, "a") as f:
+            for record in sorted(trace, key=lambda record: record['start']):
+                f.write(json.dumps(record) + "\n")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize the finished spans by name
+
+        Returns:
+            Dictionary mapping span names to count, errors, total, mean, p50, p95 and max ms
+        """
+        durations: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            durations.setdefault(record['name'], []).append(record['duration_ms'])
+            if record['error']:
+                errors[record['name']] = errors.get(record['name'], 0) + 1
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                'count': len(values),
+                'errors': errors.get(name, 0),
+                'total': sum(values),
+                'mean': sum(values) / len(values),
+                'p50': values[len(values) // 2],
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                'max': values[-1],
+            }
+        return summary
+
+    def print_summary(self):
+        print(f"\n{'span':<22}{'count':>7}{'errors':>8}{'total ms':>11}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, stats in self.summary().items():
+            print(f"{name:<22}{stats['count']:>7}{stats['errors']:>8}{stats['total']:>11.1f}{stats['mean']:>10.1f}"
+                  f"{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['max']:>10.1f}")
+
+
+class TokenTimer:
+    """
+    Times generation from streamer callbacks: time to first token, decode time and
+    tokens per second
+
+    Call start() right before generate() and put(token_ids) from the streamer; the
+    first put() is the prompt, every later one is a generation step.
+    """
+
+    def __init__(self):
+        self.start_time = None
+        self.first_token_time = None
+        self.last_token_time = None
+        self.tokens = 0
+        self._seen_prompt = False
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._start_wall = time.time()
+
+    def put(self, token_ids):
+        if not self._seen_prompt:
+            self._seen_prompt = True
+            return
+        now = time.perf_counter()
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self.last_token_time = now
+        # One token per step for plain decoding; assisted decoding streams every
+        # accepted token of a verification step at once
+        self.tokens += token_ids.numel() if hasattr(token_ids, "numel") else len(token_ids)
+
+    def stats(self) -> dict:
+        """ttft_ms, decode_ms, tokens and tokens_per_s (empty before the first token)"""
+        if self.first_token_time is None:
+            return {}
+        decode_time = self.last_token_time - self.first_token_time
+        return {
+            'ttft_ms': 1000 * (self.first_token_time - self.start_time),
+            'decode_ms': 1000 * decode_time,
+            'tokens': self.tokens,
+            'tokens_per_s': (self.tokens - 1) / decode_time if decode_time > 0 else 0.0,
+        }
+
+    def record_spans(self, tracer: "Tracer" = None):
+        """Add prefill and decode spans under the current span"""
+        tracer = tracer or get_tracer()
+        if tracer is None or self.first_token_time is None:
+            return
+        ttft = self.first_token_time - self.start_time
+        tracer.record("prefill", self._start_wall, ttft)
+        stats = self.stats()
+        tracer.record("decode", self._start_wall + ttft, stats['decode_ms'] / 1000,
+                      tokens=stats['tokens'], tokens_per_s=stats['tokens_per_s'])
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Process-wide tracer, None when BANNER_TRACE is off"""
+    global _tracer
+    if not BANNER_TRACE:
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def span(name: str, **attrs):
+    """Context manager timing a block as a span (a no-op when tracing is off)"""
+    if not BANNER_TRACE:
+        return _NOOP_SPAN
+    return Span(get_tracer(), name, attrs)
+
+
+def traced(name: str = None):
+    """Decorator running the function inside a span named after it"""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not BANNER_TRACE:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def print_summary():
+    """Print the span table, if tracing is on"""
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.print_summary()
+
+
+def main():
+    """Trace a simulated banner run and measure the cost of span() when tracing is off"""
+    import tempfile
+    import timeit
+    global BANNER_TRACE, _tracer
+
+    def simulated_banner():
+        with span("test_model", layout="z_pattern"):
+            with span("enrich"):
+                time.sleep(0.02)
+            with span("prompt_build"):
+                time.sleep(0.001)
+            with span("generate") as generate_span:
+                token_timer = TokenTimer()
+                token_timer.start()
+                token_timer.put([0] * 100)  # prompt
+                time.sleep(0.01)
+                for _ in range(50):
+                    token_timer.put([0])
+                    time.sleep(0.0005)
+                token_timer.record_spans()
+                generate_span.set(**token_timer.stats())
+            with span("extract_json"):
+                pass
+            with span("post_process"):
+                for name in ("get_original_data", "fix_font_size", "normalize_layout"):
+                    with span(name):
+                        time.sleep(0.002)
+
+    BANNER_TRACE = False
+    off_us = 1e6 * timeit.timeit(lambda: span("noop").__enter__(), number=100000) / 100000
+
+    BANNER_TRACE = True
+    with tempfile.TemporaryDirectory() as workdir:
+        _tracer = Tracer(os.path.join(workdir, "traces.jsonl"))
+        for _ in range(5):
+            simulated_banner()
+        with open(_tracer.export_path) as f:
+            lines = f.readlines()
+        print(f"Exported {len(lines)} spans, first: {lines[0].strip()}")
+        _tracer.print_summary()
+        with span("parent"):
+            # Nested, so the timing leaves out the per-trace JSONL append
+            on_us = 1e6 * timeit.timeit(lambda: span("timed").__enter__().__exit__(None, None, None), number=10000) / 10000
+    print(f"\nspan() overhead: {off_us:.2f} us off, {on_us:.2f} us on")
+
+
+if __name__ == "__main__":
+    main()
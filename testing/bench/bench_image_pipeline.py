@@ -0,0 +1,169 @@
+"""
+Benchmark ImageProcessor.process_image_url: in-memory pipeline vs the tmp/ file pipeline.
+
+Each mode runs in its own subprocess so peak RSS (ru_maxrss) is measured per mode.
+The product image is served by the local stand-in HTTP server, the background remover
+returns a precomputed mask and Wasabi uploads only read the payload, so the numbers
+cover download, decode, compositing, cropping and encoding.
+
+Run from the testing/ directory:
+    python bench/bench_image_pipeline.py --images 20
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+TESTING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(TESTING_DIR)
+
+
+def make_product_image(width: int, height: int, seed: int = 0) -> Image.Image:
+    """Noisy gradient with an elliptical 'product' in the middle, compresses like a photo"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    noise = rng.integers(-6, 6, size=(height, width, 3))
+    image = np.clip(base + noise, 0, 255).astype(np.uint8)
+    inside = ((x - width / 2) / (width * 0.35)) ** 2 + ((y - height / 2) / (height * 0.4)) ** 2 <= 1
+    image[inside] = (image[inside] // 2 + 100).astype(np.uint8)
+    return Image.fromarray(image)
+
+
+def make_mask(width: int, height: int) -> str:
+    """Base64 PNG mask matching the product ellipse, as returned by the background remover"""
+    y, x = np.mgrid[0:height, 0:width]
+    inside = ((x - width / 2) / (width * 0.35)) ** 2 + ((y - height / 2) / (height * 0.4)) ** 2 <= 1
+    buffer = BytesIO()
+    Image.fromarray((inside * 255).astype(np.uint8)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class _ReadOnlyS3Client:
+    """Stands in for the boto3 client: consumes the payload without sending it"""
+
+    def __init__(self):
+        self.bytes_uploaded = 0
+
+    def upload_file(self, path, bucket, key, **kwargs):
+        with open(path, 'rb') as f:
+            self.bytes_uploaded += len(f.read())
+
+    def upload_fileobj(self, fileobj, bucket, key, **kwargs):
+        self.bytes_uploaded += len(fileobj.read())
+
+
+def prepare_inputs(workdir: str, width: int, height: int):
+    """Write the product JPEG and its mask to workdir, outside the measured processes"""
+    image = make_product_image(width, height)
+    image.save(os.path.join(workdir, 'product.jpg'), format="JPEG", quality=90)
+    image.thumbnail([1440, 1440])
+    with open(os.path.join(workdir, 'mask.b64'), 'w') as f:
+        f.write(make_mask(*image.size))
+
+
+def run_mode(mode: str, images: int, workdir: str) -> dict:
+    """Process `images` images in this process and return latency and RSS figures"""
+    for name in ('WASABI_ACCESS_KEY_ID', 'WASABI_SECRET_ACCESS_KEY', 'WASABI_ENDPOINT_URL', 'WASABI_BUCKET_NAME'):
+        os.environ.setdefault(name, 'bench')
+    os.environ.setdefault('RATE_LIMIT_WASABI', '100000')
+    os.environ.setdefault('RATE_LIMIT_BG_REMOVER', '100000')
+
+    import banner_utils.image_processor as image_processor
+    from test_scripts.stand_ins import StandInHTTPServer
+    import_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with open(os.path.join(workdir, 'product.jpg'), 'rb') as f:
+        image_bytes = f.read()
+    with open(os.path.join(workdir, 'mask.b64')) as f:
+        mask_b64 = f.read()
+
+    s3_client = _ReadOnlyS3Client()
+    image_processor.get_s3_client = lambda *args: s3_client
+    processor = image_processor.ImageProcessor()
+    mask = Image.open(BytesIO(base64.b64decode(mask_b64)))
+    processor._request_mask = lambda img: mask
+
+    server = StandInHTTPServer(latency=0.0).start()
+    server.server.image_bytes = image_bytes
+
+    # The file pipeline writes to tmp/ under the working directory
+    os.makedirs(os.path.join(workdir, 'tmp'), exist_ok=True)
+    os.chdir(workdir)
+
+    use_temp_files = mode == 'disk'
+    try:
+        processor.process_image_url(server.image_url('warmup'), 1080, 1080, use_temp_files=use_temp_files)
+        latencies = []
+        for i in range(images):
+            start_time = time.perf_counter()
+            processor.process_image_url(server.image_url(f"product_{i}"), 1080, 1080, use_temp_files=use_temp_files)
+            latencies.append(time.perf_counter() - start_time)
+    finally:
+        server.stop()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'images': images,
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+        'p50_ms': 1000 * latencies[len(latencies) // 2],
+        'max_ms': 1000 * latencies[-1],
+        'import_rss_mb': import_rss / 1024,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'bytes_uploaded': s3_client.bytes_uploaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the in-memory and tmp/ file image pipelines')
+    parser.add_argument('--images', type=int, default=20, help='Images per mode')
+    parser.add_argument('--width', type=int, default=2000, help='Source image width')
+    parser.add_argument('--height', type=int, default=2000, help='Source image height')
+    parser.add_argument('--mode', choices=['prepare', 'memory', 'disk'], help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode == 'prepare':
+        prepare_inputs(args.workdir, args.width, args.height)
+        return
+    if args.mode:
+        # Child process: run one mode and report as JSON on the last line
+        result = run_mode(args.mode, args.images, args.workdir)
+        sys.stdout.flush()
+        print(json.dumps(result))
+        return
+
+    # Linux keeps ru_maxrss across exec, so this process must stay small: the inputs are
+    # generated in a child process as well
+    command = [sys.executable, os.path.abspath(__file__), '--images', str(args.images),
+               '--width', str(args.width), '--height', str(args.height)]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        subprocess.run(command + ['--mode', 'prepare', '--workdir', workdir], check=True)
+        for mode in ('disk', 'memory'):
+            output = subprocess.run(
+                command + ['--mode', mode, '--workdir', workdir],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<8}{'images':>8}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}"
+          f"{'import RSS MB':>15}{'peak RSS MB':>13}{'upload KB':>11}")
+    for result in results:
+        print(f"{result['mode']:<8}{result['images']:>8}{result['mean_ms']:>10.1f}{result['p50_ms']:>10.1f}"
+              f"{result['max_ms']:>10.1f}{result['import_rss_mb']:>15.1f}{result['peak_rss_mb']:>13.1f}"
+              f"{result['bytes_uploaded'] / 1024 / (result['images'] + 1):>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark the compiled layer schema against the per-field loops it replaced.
+
+Runs condense and expand over every banner in final_data, checks that both versions
+produce the same layers (apart from the image size fix in condense) and reports
+the time per banner.
+
+Run from the testing/ directory:
+    python bench/bench_layer_schema.py --data ../final_data --repeat 5
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banner_utils.layer_schema import GENERAL_LAYERS, important_fields, condense, expand
+from banner_utils.assets import get_fonts
+
+IMAGE_URL = "https://example.com/product.png"
+IMAGE_SIZE = (1214, 1439)
+
+
+def legacy_condense(banner):
+    """The per-field loop of the old create_condensed_data, without the dead width*scaleX branch"""
+    condensed = banner.copy()
+    condensed["objects"] = []
+    for layer in banner["objects"]:
+        if layer["type"] in important_fields:
+            new_layer = {}
+            for field in important_fields[layer["type"]]:
+                new_layer[field] = layer.get(field, 0)
+            condensed["objects"].append(new_layer)
+        else:
+            condensed["objects"].append(layer)
+    return condensed
+
+
+def legacy_expand(condensed_json, image_url, product_image_shape, fonts):
+    """The old get_original_data after the image download"""
+    original_data = condensed_json.copy()
+    for idx, layer in enumerate(condensed_json['objects']):
+        if layer["type"] in GENERAL_LAYERS:
+            for field in GENERAL_LAYERS[layer["type"]]:
+                if field not in layer:
+                    layer[field] = GENERAL_LAYERS[layer["type"]][field]
+            if layer["type"] == "image":
+                scale = min(layer["width"] / product_image_shape[0], layer["height"] / product_image_shape[1])
+                new_width = product_image_shape[0] * scale
+                new_height = product_image_shape[1] * scale
+                layer["scaleX"] = scale
+                layer["scaleY"] = scale
+                original_center_x = layer["left"] + layer["width"] / 2
+                original_center_y = layer["top"] + layer["height"] / 2
+                layer["left"] = original_center_x - new_width / 2
+                layer["top"] = original_center_y - new_height / 2
+                layer["width"] = product_image_shape[0]
+                layer["height"] = product_image_shape[1]
+                layer["src"] = image_url
+            if layer["type"] == "text":
+                if layer["fontFamily"] in fonts:
+                    layer["fontURL"] = fonts[layer["fontFamily"]]
+            original_data['objects'][idx] = layer
+    return original_data
+
+
+def image_scale(banner, key):
+    return next(layer[key] for layer in banner["objects"] if layer["type"] == "image")
+
+
+def time_per_banner(fn, banners, repeat):
+    """Best-of-repeat microseconds per banner; fn gets a fresh deep copy each round"""
+    best = float("inf")
+    for _ in range(repeat):
+        inputs = copy.deepcopy(banners)
+        start_time = time.perf_counter()
+        for banner in inputs:
+            fn(banner)
+        best = min(best, time.perf_counter() - start_time)
+    return 1e6 * best / len(banners)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the compiled layer schema')
+    parser.add_argument('--data', default='../final_data', help='Folder with condensed training records')
+    parser.add_argument('--repeat', type=int, default=5, help='Rounds per function (best is reported)')
+    args = parser.parse_args()
+
+    condensed = []
+    for file in sorted(os.listdir(args.data)):
+        if file.endswith(".json"):
+            with open(os.path.join(args.data, file), "r") as f:
+                condensed.append(json.load(f)["output"])
+    fonts = get_fonts("english")
+
+    expanded = [legacy_expand(copy.deepcopy(banner), IMAGE_URL, IMAGE_SIZE, fonts) for banner in condensed]
+    for banner, reference in zip(condensed, expanded):
+        assert expand(banner, IMAGE_URL, IMAGE_SIZE, fonts) == reference
+    for banner in expanded:
+        new, _ = condense(banner)
+        old = legacy_condense(banner)
+        for new_layer, old_layer in zip(new["objects"], old["objects"]):
+            if new_layer["type"] == "image":
+                # condense now stores the displayed size, the old loop stored the source pixels
+                assert new_layer["width"] == old_layer["width"] * image_scale(banner, "scaleX")
+                continue
+            assert new_layer == old_layer
+
+    layers = sum(len(banner["objects"]) for banner in condensed)
+    print(f"{len(condensed)} banners, {layers} layers")
+    print(f"\n{'function':<10}{'legacy us':>11}{'compiled us':>13}{'speedup':>9}")
+    for name, legacy, compiled, banners in (
+        ('condense', legacy_condense, lambda banner: condense(banner), expanded),
+        ('expand', lambda banner: legacy_expand(banner, IMAGE_URL, IMAGE_SIZE, fonts),
+         lambda banner: expand(banner, IMAGE_URL, IMAGE_SIZE, fonts), condensed),
+    ):
+        legacy_us = time_per_banner(legacy, banners, args.repeat)
+        compiled_us = time_per_banner(compiled, banners, args.repeat)
+        print(f"{name:<10}{legacy_us:>11.1f}{compiled_us:>13.1f}{legacy_us / compiled_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
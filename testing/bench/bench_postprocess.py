@@ -0,0 +1,207 @@
+"""
+Benchmark the post-processing path on realistic data.
+
+Replays every final_data/*.json output through each stage:
+
+    extract_json        extract_json_from_response on clean model responses
+    get_best_result     recovery from noisy responses (repeated objects, missing </json>,
+                        truncated tails); the GPT fallback is replaced by the local
+                        extract_first_valid_json so nothing leaves the machine
+    first_valid_json    extract_first_valid_json on the same noisy responses
+    get_original_data   expansion, with the product image served by the local stand-in
+    fix_cta             CTA centering on the expanded banners
+    normalize_layout    full layout normalization (snap, push-down, clamp, CTAs)
+    fix_font_size       Node.js font fitting, fonts served by the local stand-in
+    render_banner       Node.js render of the expanded banner
+
+The two Node.js stages run only when node and the fabric/canvas packages are
+installed; otherwise they are reported as skipped. Prints p50/p95/p99 latency and
+throughput per stage and can write or compare a JSON baseline.
+
+Run from the testing/ directory:
+    python bench/bench_postprocess.py --limit 200 --baseline-out bench/baseline_postprocess.json
+    python bench/bench_postprocess.py --limit 200 --compare bench/baseline_postprocess.json
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+TESTING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(TESTING_DIR)
+from test_scripts.stand_ins import FINAL_DATA_DIR, StandInHTTPServer
+
+# Stages slower than the baseline p50 by more than this fraction are flagged
+REGRESSION_THRESHOLD = 0.2
+
+
+def load_outputs(data_dir: str, limit: int = None) -> List[dict]:
+    """Condensed banners from final_data, in file order"""
+    files = sorted((f for f in os.listdir(data_dir) if f.endswith(".json")), key=lambda f: int(f.split(".")[0]))
+    outputs = []
+    for file in files[:limit]:
+        with open(os.path.join(data_dir, file), "r") as f:
+            outputs.append(json.load(f)["output"])
+    return outputs
+
+
+def make_clean_response(banner: dict) -> str:
+    return (
+        "Let me think step-by-step for creating a 1080*1080 banner. Now I will create the banner.\n</think>\n\n"
+        f" Here is your banner: \n\n<json>{json.dumps(banner)}</json>"
+    )
+
+
+def make_noisy_response(banner: dict, rng: random.Random) -> str:
+    """
+    Response with the failure modes seen from the model: the objects list repeated
+    without closing the JSON, a missing </json>, or a truncated tail
+    """
+    body = json.dumps(banner)
+    prefix = "Let me think step-by-step for creating a 1080*1080 banner.\n</think>\n\n Here is your banner: \n\n<json>"
+    kind = rng.choice(("repeated", "unclosed", "truncated"))
+    if kind == "repeated":
+        objects = json.dumps(banner["objects"])
+        repeats = "".join(f', "objects": {objects}' for _ in range(rng.randint(2, 5)))
+        return prefix + body[:-1] + repeats + body[-1:] + "</json>" + body[:rng.randint(100, 2000)]
+    if kind == "unclosed":
+        return prefix + body + "\nThe banner above follows the layout."
+    return prefix + body + "</json>" + "<json>" + body[:len(body) // 2]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_stage(name: str, fn: Callable, inputs: List, repeat: int = 1) -> Dict[str, float]:
+    """Time fn on every input, repeat times; fn gets a deep copy so stages cannot mutate the inputs"""
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            item = copy.deepcopy(item)
+            start_time = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - start_time)
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p95_ms': 1000 * percentile(latencies, 0.95),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'mean_ms': 1000 * total / len(latencies),
+        'per_s': len(latencies) / total if total > 0 else 0.0,
+    }
+
+
+def node_available() -> bool:
+    """node on PATH with the fabric and canvas packages the node_scripts need"""
+    node = shutil.which("node")
+    if node is None:
+        return False
+    check = subprocess.run([node, "-e", "require('fabric'); require('canvas')"], cwd=os.path.join(TESTING_DIR, "node_scripts"),
+                           capture_output=True)
+    return check.returncode == 0
+
+
+def print_results(results: Dict[str, dict], baseline: Dict[str, dict] = None):
+    print(f"\n{'stage':<19}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'per s':>10}{'vs base':>10}")
+    for stage, stats in results.items():
+        if stats.get('skipped'):
+            print(f"{stage:<19}   ❌ skipped: {stats['skipped']}")
+            continue
+        delta = ""
+        base = (baseline or {}).get(stage)
+        if base and not base.get('skipped') and base['p50_ms'] > 0:
+            change = stats['p50_ms'] / base['p50_ms'] - 1
+            delta = f"{change:+.0%}" + (" ❌" if change > REGRESSION_THRESHOLD else "")
+        print(f"{stage:<19}{stats['count']:>7}{stats['p50_ms']:>9.3f}{stats['p95_ms']:>9.3f}{stats['p99_ms']:>9.3f}"
+              f"{stats['per_s']:>10.0f}{delta:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the post-processing stages')
+    parser.add_argument('--data', default=FINAL_DATA_DIR, help='Folder with condensed training records')
+    parser.add_argument('--limit', type=int, default=None, help='Records to replay (default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='Passes over the records for the pure-Python stages')
+    parser.add_argument('--node-limit', type=int, default=20, help='Records for the Node.js stages')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the noisy responses')
+    parser.add_argument('--baseline-out', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    args = parser.parse_args()
+
+    import banner_utils.get_best_result as get_best_result_module
+    from banner_utils.get_best_result import get_best_result, extract_json_from_response, extract_first_valid_json
+    from banner_utils.create_condensed_data import get_original_data
+    from banner_utils.fix_cta import fix_cta
+    from banner_utils.layout_normalizer import normalize_layout
+    from banner_utils.font_index import get_font_index
+
+    # Recovery must not call OpenAI from a benchmark
+    get_best_result_module.get_clean_json_with_gpt = extract_first_valid_json
+
+    outputs = load_outputs(args.data, args.limit)
+    rng = random.Random(args.seed)
+    clean_responses = [make_clean_response(banner) for banner in outputs]
+    noisy_responses = [make_noisy_response(banner, rng) for banner in outputs]
+    print(f"Replaying {len(outputs)} banners from {args.data}")
+
+    server = StandInHTTPServer(latency=0.0).start()
+    image_url = server.image_url()
+    get_font_index("english")  # build outside the timed region
+    results = {}
+    try:
+        results['extract_json'] = run_stage('extract_json', extract_json_from_response, clean_responses, args.repeat)
+        results['get_best_result'] = run_stage('get_best_result', get_best_result, noisy_responses, args.repeat)
+        results['first_valid_json'] = run_stage('first_valid_json', extract_first_valid_json, noisy_responses, args.repeat)
+        results['get_original_data'] = run_stage(
+            'get_original_data', lambda banner: get_original_data(banner, image_url), outputs, args.repeat
+        )
+        expanded = [get_original_data(copy.deepcopy(banner), image_url) for banner in outputs]
+        for banner in expanded:
+            for layer in banner["objects"]:
+                if layer["type"] == "text":
+                    layer["fontURL"] = server.font_url(layer["fontURL"].split("/")[-1].split(".")[0])
+        results['fix_cta'] = run_stage('fix_cta', fix_cta, expanded, args.repeat)
+        results['normalize_layout'] = run_stage('normalize_layout', normalize_layout, expanded, args.repeat)
+
+        if node_available():
+            from banner_utils.render_banner import fix_font_size, render_banner
+            node_inputs = expanded[:args.node_limit]
+            cwd = os.getcwd()
+            os.chdir(TESTING_DIR)
+            try:
+                results['fix_font_size'] = run_stage('fix_font_size', fix_font_size, node_inputs)
+                results['render_banner'] = run_stage(
+                    'render_banner', lambda banner: render_banner(banner, input_file=f"/tmp/bench_render_{os.getpid()}.json"),
+                    node_inputs
+                )
+            finally:
+                os.chdir(cwd)
+        else:
+            for stage in ('fix_font_size', 'render_banner'):
+                results[stage] = {'skipped': "node with fabric and canvas is not installed"}
+    finally:
+        server.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)['stages']
+    print_results(results, baseline)
+
+    if args.baseline_out:
+        with open(args.baseline_out, "w") as f:
+            json.dump({'records': len(outputs), 'repeat': args.repeat, 'seed': args.seed,
+                       'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"), 'stages': results}, f, indent=2)
+        print(f"\nBaseline written to {args.baseline_out}")
+
+
+if __name__ == "__main__":
+    main()
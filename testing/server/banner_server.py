@@ -0,0 +1,454 @@
+"""
+Long-running banner generation service.
+
+One process loads the model once and serves every caller over HTTP (TCP or a Unix
+socket):
+
+    POST /generate   {"product_name", "product_description", "product_price", "layout",
+                      "image_url", optional "product_color" and "font_list" (skip the
+                      OpenAI enrichment), "post_process" (default true), "stream"}
+    GET  /metrics    queue depth, batch sizes, counters and latency percentiles
+    GET  /health
+
+Enrichment, prompt building and post-processing run in the request's own thread;
+only generation goes through the scheduler. The scheduler thread takes the waiting
+prompts (up to max_batch_size, waiting at most max_wait_ms for more to arrive) and
+runs them as one left-padded generate() call, so concurrent requests share the GPU
+instead of queuing behind each other. With "stream": true the response is NDJSON:
+a "queued" event, "token" events with the text as it is decoded, and a final
+"done" event with the banner.
+
+Run from the testing/ directory:
+    python server/banner_server.py --checkpoint ../model/checkpoint-1400 --port 8000
+    python server/banner_server.py --cpu-model Qwen/Qwen3-0.6B --unix-socket /tmp/banner.sock
+
+    curl -N localhost:8000/generate -d '{"product_name": "Aldo Bag", "layout": "z_pattern", "image_url": "...", "stream": true}'
+"""
+import argparse
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import torch
+from transformers.generation.streamers import BaseStreamer
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from test_scripts.test_qwen import (load_model, load_layout_template, prepare_input, enrich_product, parse_candidate,
+                                    post_process)
+from banner_utils.tracing import span
+
+
+class ServerMetrics:
+    """Thread-safe counters and a sliding window of observations per name"""
+
+    def __init__(self, window: int = 1000):
+        self.counters: Dict[str, int] = {}
+        self.observations: Dict[str, deque] = {}
+        self.window = window
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.observations.setdefault(name, deque(maxlen=self.window)).append(value)
+
+    def snapshot(self, **gauges) -> dict:
+        """Gauges, counters, and count/mean/p50/p95/max of every observed series"""
+        with self._lock:
+            counters = dict(self.counters)
+            observations = {name: sorted(values) for name, values in self.observations.items()}
+        series = {}
+        for name, values in observations.items():
+            if values:
+                series[name] = {
+                    'count': len(values),
+                    'mean': sum(values) / len(values),
+                    'p50': values[len(values) // 2],
+                    'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                    'max': values[-1],
+                }
+        return {**gauges, 'counters': counters, 'series': series}
+
+
+class GenerationRequest:
+    """One prompt waiting for (or going through) batched generation"""
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.chunks = queue.Queue()  # decoded text pieces, then None
+        self.text = None
+        self.error = None
+        self.tokens = 0
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def finish(self, text: str = None, error: str = None):
+        self.text, self.error = text, error
+        self.finished_at = time.perf_counter()
+        self.chunks.put(None)
+        self.done.set()
+
+
+class BatchStreamer(BaseStreamer):
+    """
+    Streamer for a batch: routes every generated token to its request's chunk queue
+
+    generate() calls put() once with the prompt ids and then once per step with one
+    token per row; rows that hit an end token stop streaming (the rest is padding).
+    """
+
+    def __init__(self, tokenizer, requests: List[GenerationRequest], eos_token_ids: set):
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.eos_token_ids = eos_token_ids
+        self.token_ids = [[] for _ in requests]
+        self.flushed = [0] * len(requests)
+        self.finished = [False] * len(requests)
+        self._seen_prompt = False
+
+    def put(self, value):
+        if not self._seen_prompt:
+            self._seen_prompt = True
+            return
+        now = time.perf_counter()
+        for row, token in enumerate(value.reshape(len(self.requests), -1).tolist()):
+            if self.finished[row]:
+                continue
+            request = self.requests[row]
+            for token_id in token:
+                if token_id in self.eos_token_ids:
+                    self.finished[row] = True
+                    break
+                self.token_ids[row].append(token_id)
+                request.tokens += 1
+            if request.first_token_at is None and request.tokens:
+                request.first_token_at = now
+            self._flush(row)
+
+    def _flush(self, row: int, final: bool = False):
+        # Decode only the tokens since the last flush; wait while they end mid-character
+        text = self.tokenizer.decode(self.token_ids[row][self.flushed[row]:], skip_special_tokens=True)
+        if text and (final or not text.endswith("�")):
+            self.requests[row].chunks.put(text)
+            self.flushed[row] = len(self.token_ids[row])
+
+    def end(self):
+        # A row cut off by max_new_tokens can end mid-character; send what is left as the final text has it
+        for row in range(len(self.requests)):
+            self._flush(row, final=True)
+
+
+class BannerServer:
+    """Request queue and batching scheduler around one loaded model"""
+
+    def __init__(self, model, tokenizer, max_batch_size: int = 4, max_wait_ms: float = 50, max_new_tokens: int = 8192,
+                 temperature: float = 0.7, top_p: float = 0.9, top_k: int = 20):
+        """
+        Args:
+            model: Loaded causal LM (unsloth or plain transformers)
+            tokenizer: Its tokenizer; switched to left padding
+            max_batch_size (int): Most prompts in one generate() call
+            max_wait_ms (float): How long the first waiting prompt waits for company
+            max_new_tokens (int): Generation limit per request
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.generate_kwargs = {'max_new_tokens': max_new_tokens, 'temperature': temperature, 'top_p': top_p,
+                                'top_k': top_k, 'do_sample': True}
+        eos = model.generation_config.eos_token_id
+        self.eos_token_ids = set(eos if isinstance(eos, list) else [eos]) | {tokenizer.eos_token_id}
+        self.layout_template = load_layout_template()
+        self.metrics = ServerMetrics()
+        self.queue = queue.Queue()
+        self.in_flight = 0
+        self._stopped = threading.Event()
+        self._submit_lock = threading.Lock()  # no submit() slips in after stop() drained the queue
+        self._thread = threading.Thread(target=self._run, name="banner-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the scheduler after the batch in progress; prompts still queued finish with an error"""
+        with self._submit_lock:
+            self._stopped.set()
+        self.queue.put(None)
+        if self._thread.is_alive():
+            self._thread.join()
+        while True:
+            try:
+                request = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.finish(error="server stopping")
+
+    def submit(self, prompt: str) -> GenerationRequest:
+        """Queue a chat-formatted prompt for generation (finished with an error once the server is stopping)"""
+        request = GenerationRequest(prompt)
+        with self._submit_lock:
+            if self._stopped.is_set():
+                request.finish(error="server stopping")
+                return request
+            self.queue.put(request)
+        self.metrics.count('prompts_queued')
+        return request
+
+    def chat_prompt(self, input_text: str) -> str:
+        return self.tokenizer.apply_chat_template([{"role": "user", "content": input_text}], enable_thinking=False,
+                                                  add_generation_prompt=True, tokenize=False)
+
+    def _next_batch(self) -> List[GenerationRequest]:
+        first = self.queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._stopped.set()
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._generate(batch)
+
+    def _generate(self, batch: List[GenerationRequest]):
+        started_at = time.perf_counter()
+        self.in_flight = len(batch)
+        self.metrics.observe('batch_size', len(batch))
+        for request in batch:
+            request.started_at = started_at
+            self.metrics.observe('queue_wait_ms', 1000 * (started_at - request.enqueued_at))
+        try:
+            with torch.no_grad(), span("generate", batch_size=len(batch)):
+                inputs = self.tokenizer([request.prompt for request in batch], return_tensors="pt",
+                                        padding=True).to(self.model.device)
+                outputs = self.model.generate(
+                    **inputs,
+                    streamer=BatchStreamer(self.tokenizer, batch, self.eos_token_ids),
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    **self.generate_kwargs,
+                )
+            texts = self.tokenizer.batch_decode(outputs[:, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+        except Exception as e:
+            print(f"❌ Batch of {len(batch)} failed: {e}")
+            self.metrics.count('batches_failed')
+            for request in batch:
+                request.finish(error=f"generation failed: {e}")
+            return
+        finally:
+            self.in_flight = 0
+
+        seconds = time.perf_counter() - started_at
+        self.metrics.count('batches')
+        self.metrics.observe('generate_ms', 1000 * seconds)
+        self.metrics.observe('batch_tokens_per_s', sum(request.tokens for request in batch) / seconds if seconds > 0 else 0.0)
+        for request, text in zip(batch, texts):
+            if request.first_token_at is not None:
+                self.metrics.observe('ttft_ms', 1000 * (request.first_token_at - request.enqueued_at))
+            request.finish(text=text.strip())
+
+    def status(self) -> dict:
+        return self.metrics.snapshot(queue_depth=self.queue.qsize(), in_flight=self.in_flight,
+                                     max_batch_size=self.max_batch_size)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "BannerServer/1.0"
+
+    def address_string(self):
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, event: dict):
+        self.wfile.write((json.dumps(event) + "\n").encode())
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == "/metrics":
+            self._send_json(200, self.server.banner_server.status())
+        else:
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except json.JSONDecodeError as e:
+            self._send_json(400, {'error': f"invalid json: {e}"})
+            return
+        banner_server = self.server.banner_server
+        if body.get("layout") not in banner_server.layout_template:
+            self._send_json(400, {'error': f"unknown layout {body.get('layout')!r}"})
+            return
+        banner_server.metrics.count('requests')
+        self.stream_started = False
+        try:
+            self._generate(banner_server, body)
+        except Exception as e:
+            banner_server.metrics.count('requests_failed')
+            print(f"❌ Request failed: {e}")
+            error = f"{type(e).__name__}: {e}"
+            try:
+                if self.stream_started:
+                    # The 200 is already out: end the stream with the error instead
+                    self._send_event({'event': 'done', 'banner': None, 'error': error, 'text': None})
+                else:
+                    self._send_json(500, {'error': error})
+            except OSError:
+                pass  # The client went away
+
+    def _generate(self, banner_server: BannerServer, body: dict):
+        start_time = time.perf_counter()
+        stream = bool(body.get("stream"))
+        with span("server_request", layout=body["layout"], stream=stream):
+            product_color, font_list = body.get("product_color"), body.get("font_list")
+            if product_color is None or font_list is None:
+                product_color, font_list = enrich_product(body.get("image_url", ""), body.get("product_name", ""),
+                                                          body.get("product_description", ""))
+            input_text = prepare_input(body.get("product_name", ""), body.get("product_description", ""),
+                                       body.get("product_price", ""), body["layout"], banner_server.layout_template,
+                                       product_color, font_list)
+            request = banner_server.submit(banner_server.chat_prompt(input_text))
+
+            if stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                self.stream_started = True
+                self._send_event({'event': 'queued', 'queue_depth': banner_server.queue.qsize()})
+                while (chunk := request.chunks.get()) is not None:
+                    self._send_event({'event': 'token', 'text': chunk})
+            request.done.wait()
+
+            result = {'banner': None, 'error': request.error, 'text': request.text}
+            if request.error is None:
+                banner = parse_candidate(request.text)
+                if banner is None:
+                    result['error'] = "no banner json in the response"
+                elif body.get("post_process", True):
+                    with span("post_process"):
+                        banner = post_process(banner, body.get("image_url", ""))
+                result['banner'] = banner
+            total = time.perf_counter() - start_time
+            result['timings'] = {
+                'queue_wait_ms': 1000 * (request.started_at - request.enqueued_at) if request.started_at else None,
+                'generate_ms': 1000 * (request.finished_at - request.started_at) if request.started_at else None,
+                'tokens': request.tokens,
+                'total_ms': 1000 * total,
+            }
+        banner_server.metrics.observe('request_ms', 1000 * total)
+        if result['error']:
+            banner_server.metrics.count('requests_failed')
+
+        if stream:
+            self._send_event({'event': 'done', **result})
+        else:
+            self._send_json(200 if result['error'] is None else 422, result)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_http_server(banner_server: BannerServer, host: str = "127.0.0.1", port: int = 8000,
+                     unix_socket: str = None, verbose: bool = False):
+    """HTTP server (TCP, or a Unix socket when unix_socket is given) in front of a BannerServer"""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        http_server = ThreadingUnixHTTPServer(unix_socket, _Handler)
+    else:
+        http_server = ThreadingHTTPServer((host, port), _Handler)
+        http_server.daemon_threads = True
+    http_server.banner_server = banner_server
+    http_server.verbose = verbose
+    return http_server
+
+
+def load_cpu_model(model_name: str):
+    """Plain transformers model and tokenizer on the CPU (unsloth needs a GPU)"""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32).eval()
+    return model, tokenizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve banner generation over HTTP')
+    parser.add_argument('--checkpoint', default='../model/checkpoint-1400', help='Fine-tuned checkpoint (GPU, unsloth)')
+    parser.add_argument('--cpu-model', help='Serve this transformers model on the CPU instead of --checkpoint')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix-socket', help='Listen on this Unix socket instead of host:port')
+    parser.add_argument('--max-batch-size', type=int, default=4, help='Most prompts per generate() call')
+    parser.add_argument('--max-wait-ms', type=float, default=50, help='How long a prompt waits for others to batch with')
+    parser.add_argument('--max-new-tokens', type=int, default=8192)
+    parser.add_argument('--verbose', action='store_true', help='Log every HTTP request')
+    args = parser.parse_args()
+
+    if args.cpu_model:
+        model, tokenizer = load_cpu_model(args.cpu_model)
+    else:
+        model, tokenizer = load_model(args.checkpoint)
+    banner_server = BannerServer(model, tokenizer, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                                 max_new_tokens=args.max_new_tokens).start()
+    http_server = make_http_server(banner_server, args.host, args.port, args.unix_socket, args.verbose)
+    print(f"Serving on {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        banner_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,50 @@ import time
 import json
 from typing import List, Dict, Optional
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 dotenv.load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from banner_utils.render_banner import render_banner
 from banner_utils.image_processor import ImageProcessor
+from spreadsheet.sheet_buffer import SheetSnapshot, SheetWriteBuffer
+
+
+def render_to_png(json_data: dict, layout: str, row_num: int) -> str:
+    """
+    Render FabricJS JSON to a PNG file under tmp/
+    
+    Module-level so it can run in a process pool. Temp paths include the process id and
+    a full uuid, so concurrent workers never share files.
+    
+    Returns:
+        str: Path of the rendered PNG (the caller removes it)
+    """
+    unique_id = f"{os.getpid()}_{uuid.uuid4().hex}"
+    input_file = f'tmp/input_{layout}_{row_num}_{unique_id}.json'
+    output_file = f'tmp/output_{layout}_{row_num}_{unique_id}.json'
+    # The PNG file will be created with the same name as output_file but with .png extension
+    png_file = output_file.replace('.json', '.png')
+    
+    try:
+        render_banner(json_data, input_file, output_file, create_png=True)
+        if not os.path.exists(png_file):
+            raise Exception(f"PNG file not created: {png_file}")
+        return png_file
+    except Exception:
+        _remove_files([png_file])
+        raise
+    finally:
+        _remove_files([input_file, output_file])
+
+
+def _remove_files(file_paths: list):
+    for path in file_paths:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"Error cleaning up {path}: {str(e)}")
 
 
 class AddRenderedImage:
@@ -35,6 +74,8 @@ class AddRenderedImage:
         self.gc = None
         self.spreadsheet = None
         self.worksheet = None
+        self.snapshot = None
+        self.write_buffer = None
         
         # Initialize image processor for Wasabi uploads
         self.image_processor = ImageProcessor()
@@ -83,12 +124,20 @@ class AddRenderedImage:
         try:
             self.spreadsheet = self.gc.open(self.spreadsheet_name)
             self.worksheet = self.spreadsheet.get_worksheet(2)  # Use first sheet
+            self.snapshot = None
+            self.write_buffer = SheetWriteBuffer(self.worksheet)
             print(f"Successfully opened spreadsheet: {self.spreadsheet_name}")
             return True
         except Exception as e:
             print(f"Failed to open spreadsheet '{self.spreadsheet_name}': {e}")
             return False
     
+    def get_snapshot(self) -> SheetSnapshot:
+        """Read the worksheet once and share it between column lookup and data extraction"""
+        if self.snapshot is None:
+            self.snapshot = SheetSnapshot(self.worksheet)
+        return self.snapshot
+    
     def find_layout_columns(self) -> Dict[str, Dict[str, int]]:
         """
         Find the column indices for each layout's Fabric Json and Image columns
@@ -97,7 +146,7 @@ class AddRenderedImage:
             Dictionary mapping layout names to their JSON and Image column indices
         """
         try:
-            headers = self.worksheet.row_values(1)
+            headers = self.get_snapshot().headers
             layout_columns = {}
             
             for layout in self.layouts:
@@ -132,8 +181,8 @@ class AddRenderedImage:
             List of dictionaries with row number, layout, and JSON data
         """
         try:
-            # Get all values from the spreadsheet
-            all_values = self.worksheet.get_all_values()
+            # Get all values from the shared snapshot
+            all_values = self.get_snapshot().values
             
             if not all_values:
                 print("Spreadsheet is empty")
@@ -181,48 +230,51 @@ class AddRenderedImage:
         Returns:
             str: Wasabi URL of the uploaded image
         """
+        print(f"    Rendering {layout} for row {row_num}...")
+        
+        # Render the banner with PNG output
+        start_time = time.time()
         try:
-            # Generate unique filenames
-            unique_id = str(uuid.uuid4())[:8]
-            input_file = f'tmp/input_{layout}_{row_num}_{unique_id}.json'
-            output_file = f'tmp/output_{layout}_{row_num}_{unique_id}.json'
-            
-            print(f"    Rendering {layout} for row {row_num}...")
-            
-            # Render the banner with PNG output
-            start_time = time.time()
-            render_banner(json_data, input_file, output_file, create_png=True)
-            render_time = time.time() - start_time
-            
-            # The PNG file will be created with the same name as output_file but with .png extension
-            png_file = output_file.replace('.json', '.png')
-            
-            if not os.path.exists(png_file):
-                raise Exception(f"PNG file not created: {png_file}")
-            
-            print(f"    Rendered successfully (took {render_time:.1f}s)")
+            png_file = render_to_png(json_data, layout, row_num)
+        except Exception as e:
+            print(f"    ❌ Error rendering {layout}: {e}")
+            raise
+        render_time = time.time() - start_time
+        
+        print(f"    Rendered successfully (took {render_time:.1f}s)")
+        
+        return self.upload_rendered_image(png_file, layout)
+    
+    def upload_rendered_image(self, png_file: str, layout: str) -> str:
+        """
+        Upload a rendered PNG to Wasabi and remove the local file
+        
+        Args:
+            png_file (str): Path of the rendered PNG
+            layout (str): Layout name
             
-            # Upload to Wasabi
+        Returns:
+            str: Wasabi URL of the uploaded image
+        """
+        try:
             upload_start = time.time()
             wasabi_url = self.image_processor._upload_to_wasabi(png_file)
             upload_time = time.time() - upload_start
             
-            print(f"    Uploaded to Wasabi (took {upload_time:.1f}s)")
-            
-            # Cleanup temporary files
-            self._cleanup_files([input_file, output_file, png_file])
-            
+            print(f"    Uploaded {layout} to Wasabi (took {upload_time:.1f}s)")
             return wasabi_url
             
         except Exception as e:
-            print(f"    ❌ Error rendering/uploading {layout}: {e}")
-            # Cleanup on error
-            self._cleanup_files([input_file, output_file, png_file])
+            print(f"    ❌ Error uploading {layout}: {e}")
             raise
+        finally:
+            self._cleanup_files([png_file])
     
     def update_image_column(self, row_num: int, layout: str, wasabi_url: str, image_col: int):
         """
-        Update the image column with IMAGE formula
+        Queue an update of the image column with IMAGE formula
+        
+        The write is buffered and sent with other cells in one batch_update call.
         
         Args:
             row_num (int): Row number to update
@@ -238,23 +290,26 @@ class AddRenderedImage:
             # Create IMAGE formula for Google Sheets
             image_formula = "=IMAGE(\"" + wasabi_url + "\")"
             
-            # Update the cell with raw=False to allow formula interpretation
-            cell_range = gspread.utils.rowcol_to_a1(row_num, image_col)
-            self.worksheet.update(cell_range, [[image_formula]], raw=False)
+            # Queue the cell with raw=False to allow formula interpretation
+            self.write_buffer.add(row_num, image_col, image_formula, raw=False)
             
-            print(f"    Updated {layout} image column with rendered banner")
+            print(f"    Queued {layout} image column with rendered banner")
             
         except Exception as e:
             print(f"    Error updating image column for {layout}: {e}")
     
-    def process_all_layouts(self, delay_seconds: float = 2.0, specific_layout: str = None, specific_row: int = None):
+    def process_all_layouts(self, delay_seconds: float = 0.0, specific_layout: str = None, specific_row: int = None,
+                            workers: int = 1, upload_workers: int = None):
         """
         Process all FabricJS JSON entries and generate rendered images
         
         Args:
-            delay_seconds (float): Delay between rendering operations
+            delay_seconds (float): Extra pause between rendering operations. Wasabi and
+                Sheets calls are throttled by the shared rate limiter, so this is normally 0
             specific_layout (str): If specified, only process this layout
             specific_row (int): If specified, only process this row
+            workers (int): Rendering processes; above 1 switches to the parallel mode
+            upload_workers (int): Upload threads in parallel mode (default 2 * workers)
         """
         if not self.authenticate():
             return False
@@ -287,6 +342,16 @@ class AddRenderedImage:
         
         print(f"Processing {len(fabricjs_data)} FabricJS entries...")
         
+        if workers > 1:
+            self.process_parallel(fabricjs_data, workers, upload_workers or 2 * workers)
+            try:
+                self.write_buffer.flush()
+            except Exception as e:
+                print(f"❌ {len(self.write_buffer)} sheet cells could not be written: {e}")
+                return False
+            print(f"\n🎉 Completed processing all FabricJS entries!")
+            return True
+        
         for i, item in enumerate(fabricjs_data, 1):
             row_num = item['row']
             layout = item['layout']
@@ -312,17 +377,75 @@ class AddRenderedImage:
                 print(f"  ❌ Error processing {layout} for row {row_num}: {e}")
                 continue
         
+        try:
+            self.write_buffer.flush()
+        except Exception as e:
+            print(f"❌ {len(self.write_buffer)} sheet cells could not be written: {e}")
+            return False
         print(f"\n🎉 Completed processing all FabricJS entries!")
         return True
     
+    def process_parallel(self, fabricjs_data: List[Dict], workers: int, upload_workers: int) -> Dict[str, int]:
+        """
+        Render in a process pool and upload from a thread pool
+        
+        Rendering (Node + canvas) is CPU-bound and runs in separate processes; uploads
+        and sheet writes are I/O-bound and run in threads as soon as each render
+        finishes. A failing entry is counted and skipped without affecting the others.
+        
+        Args:
+            fabricjs_data (List[Dict]): Entries from get_fabricjs_data
+            workers (int): Rendering processes
+            upload_workers (int): Upload threads
+            
+        Returns:
+            Dictionary with completed and failed counts
+        """
+        total = len(fabricjs_data)
+        progress = {'completed': 0, 'failed': 0}
+        
+        def report(item, error=None):
+            if error is None:
+                progress['completed'] += 1
+                status = f"✅ Row {item['row']}, {item['layout']}"
+            else:
+                progress['failed'] += 1
+                status = f"❌ Row {item['row']}, {item['layout']}: {error}"
+            print(f"  [{progress['completed']} completed, {progress['failed']} failed / {total}] {status}")
+        
+        def upload(png_file, item):
+            wasabi_url = self.upload_rendered_image(png_file, item['layout'])
+            self.update_image_column(item['row'], item['layout'], wasabi_url, item['image_col'])
+        
+        with ProcessPoolExecutor(max_workers=workers) as render_pool, \
+                ThreadPoolExecutor(max_workers=upload_workers) as upload_pool:
+            render_futures = {
+                render_pool.submit(render_to_png, item['json_data'], item['layout'], item['row']): item
+                for item in fabricjs_data
+            }
+            upload_futures = {}
+            for future in as_completed(render_futures):
+                item = render_futures[future]
+                try:
+                    png_file = future.result()
+                except Exception as e:
+                    report(item, f"render failed: {e}")
+                    continue
+                upload_futures[upload_pool.submit(upload, png_file, item)] = item
+            
+            for future in as_completed(upload_futures):
+                item = upload_futures[future]
+                try:
+                    future.result()
+                    report(item)
+                except Exception as e:
+                    report(item, f"upload failed: {e}")
+        
+        return progress
+    
     def _cleanup_files(self, file_paths: list):
         """Clean up temporary files"""
-        for path in file_paths:
-            try:
-                if path and os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                print(f"Error cleaning up {path}: {str(e)}")
+        _remove_files(file_paths)
 
 
 def main():
@@ -333,7 +456,9 @@ def main():
     parser.add_argument('--spreadsheet', default='TestData', help='Name of the Google Spreadsheet')
     parser.add_argument('--layout', help='Specific layout to process (default: all layouts)')
     parser.add_argument('--row', type=int, help='Specific row to process (default: all rows)')
-    parser.add_argument('--delay', type=float, default=2.0, help='Delay between operations in seconds')
+    parser.add_argument('--delay', type=float, default=0.0, help='Extra pause between operations in seconds')
+    parser.add_argument('--workers', type=int, default=1, help='Rendering processes (above 1 renders and uploads in parallel)')
+    parser.add_argument('--upload-workers', type=int, help='Upload threads in parallel mode (default: 2 * workers)')
     
     args = parser.parse_args()
     
@@ -342,7 +467,9 @@ def main():
     success = updater.process_all_layouts(
         delay_seconds=args.delay,
         specific_layout=args.layout,
-        specific_row=args.row
+        specific_row=args.row,
+        workers=args.workers,
+        upload_workers=args.upload_workers
     )
     
     if success:
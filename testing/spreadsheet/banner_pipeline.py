@@ -0,0 +1,271 @@
+import asyncio
+import time
+from typing import Callable, Dict, List
+
+
+# Marks the end of a stage's input queue
+_DONE = object()
+
+
+class StageTimer:
+    """Collects per-stage durations so the slowest stage of the pipeline is visible"""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {}
+        self.failures: Dict[str, int] = {}
+        self.started_at = time.perf_counter()
+
+    def record(self, stage: str, duration: float):
+        self.durations.setdefault(stage, []).append(duration)
+
+    def record_failure(self, stage: str):
+        self.failures[stage] = self.failures.get(stage, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize the recorded timings
+
+        Returns:
+            Dictionary mapping stage names to count, failures, total, mean and max seconds
+        """
+        summary = {}
+        stages = list(self.durations) + [s for s in self.failures if s not in self.durations]
+        for stage in stages:
+            values = self.durations.get(stage, [])
+            summary[stage] = {
+                'count': len(values),
+                'failures': self.failures.get(stage, 0),
+                'total': sum(values),
+                'mean': sum(values) / len(values) if values else 0.0,
+                'max': max(values) if values else 0.0,
+            }
+        return summary
+
+    def print_summary(self):
+        wall_time = time.perf_counter() - self.started_at
+        print(f"\n{'stage':<14}{'count':>7}{'failed':>8}{'total s':>10}{'mean s':>9}{'max s':>9}")
+        for stage, stats in self.summary().items():
+            print(f"{stage:<14}{stats['count']:>7}{stats['failures']:>8}{stats['total']:>10.1f}"
+                  f"{stats['mean']:>9.2f}{stats['max']:>9.2f}")
+        print(f"Wall time: {wall_time:.1f}s")
+
+
+class BannerPipeline:
+    """
+    Staged asyncio pipeline for banner generation.
+
+    Every (product, layout) job flows through four stages connected by bounded queues:
+
+        enrich (I/O, N workers) -> generate (GPU, 1 worker) -> post-process (I/O, N workers) -> write (batched)
+
+    Blocking stage functions run in worker threads, so enrichment and post-processing of
+    other jobs overlap with the single GPU generation worker. The bounded queues apply
+    backpressure: when the GPU falls behind, enrichment stops pulling new jobs.
+    Enrichment runs once per product and is shared by all of its layouts.
+    """
+
+    def __init__(self,
+                 enrich_fn: Callable,
+                 generate_fn: Callable,
+                 post_process_fn: Callable,
+                 write_fn: Callable,
+                 enrich_workers: int = 4,
+                 post_process_workers: int = 4,
+                 queue_size: int = 8,
+                 write_batch_size: int = 20,
+                 write_interval: float = 10.0):
+        """
+        Args:
+            enrich_fn (Callable): enrich_fn(product) -> enrichment, called once per product
+            generate_fn (Callable): generate_fn(job, enrichment) -> condensed json or None
+            post_process_fn (Callable): post_process_fn(job, condensed_json) -> fabric json
+            write_fn (Callable): write_fn(results) writes a list of (job, fabric_json) pairs and
+                may return how many of them it could not write (None means all were written)
+            enrich_workers (int): Concurrent enrichment workers
+            post_process_workers (int): Concurrent post-processing workers
+            queue_size (int): Capacity of each inter-stage queue
+            write_batch_size (int): Flush the write buffer after this many results
+            write_interval (float): Flush the write buffer after this many seconds
+        """
+        self.enrich_fn = enrich_fn
+        self.generate_fn = generate_fn
+        self.post_process_fn = post_process_fn
+        self.write_fn = write_fn
+        self.enrich_workers = max(1, enrich_workers)
+        self.post_process_workers = max(1, post_process_workers)
+        self.queue_size = max(1, queue_size)
+        self.write_batch_size = max(1, write_batch_size)
+        self.write_interval = write_interval
+        self.timer = StageTimer()
+        self.completed = 0
+        self.failed = 0
+
+    async def _timed(self, stage: str, fn: Callable, *args):
+        start_time = time.perf_counter()
+        try:
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            self.timer.record(stage, time.perf_counter() - start_time)
+
+    async def _enrich_worker(self, jobs: asyncio.Queue, out: asyncio.Queue, enrichments: Dict):
+        while True:
+            job = await jobs.get()
+            if job is _DONE:
+                return
+            row = job['row']
+            if row not in enrichments:
+                enrichments[row] = asyncio.ensure_future(self._timed('enrich', self.enrich_fn, job))
+            try:
+                enrichment = await enrichments[row]
+            except Exception as e:
+                print(f"    ❌ Enrichment failed for row {row}: {e}")
+                self.timer.record_failure('enrich')
+                self.failed += 1
+                continue
+            await out.put((job, enrichment))
+
+    async def _generate_worker(self, queue: asyncio.Queue, out: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            job, enrichment = item
+            try:
+                condensed_json = await self._timed('generate', self.generate_fn, job, enrichment)
+            except Exception as e:
+                print(f"    ❌ Error generating {job['layout']} for row {job['row']}: {e}")
+                self.timer.record_failure('generate')
+                self.failed += 1
+                continue
+            if not condensed_json:
+                print(f"    ❌ Failed to generate valid JSON for {job['layout']} (row {job['row']})")
+                self.timer.record_failure('generate')
+                self.failed += 1
+                continue
+            await out.put((job, condensed_json))
+
+    async def _post_process_worker(self, queue: asyncio.Queue, out: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            job, condensed_json = item
+            try:
+                fabric_json = await self._timed('post_process', self.post_process_fn, job, condensed_json)
+            except Exception as e:
+                print(f"    ❌ Error post processing {job['layout']} for row {job['row']}: {e}")
+                self.timer.record_failure('post_process')
+                self.failed += 1
+                continue
+            await out.put((job, fabric_json))
+
+    async def _flush(self, pending: List):
+        if not pending:
+            return
+        batch = list(pending)
+        pending.clear()
+        try:
+            not_written = await self._timed('write', self.write_fn, batch) or 0
+            self.completed += len(batch) - not_written
+            self.failed += not_written
+        except Exception as e:
+            print(f"    ❌ Error writing {len(batch)} results: {e}")
+            self.timer.record_failure('write')
+            self.failed += len(batch)
+
+    async def _writer(self, queue: asyncio.Queue):
+        pending = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.write_interval - (time.monotonic() - last_flush))
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                item = None
+            if item is _DONE:
+                await self._flush(pending)
+                return
+            if item is not None:
+                pending.append(item)
+            if len(pending) >= self.write_batch_size or time.monotonic() - last_flush >= self.write_interval:
+                await self._flush(pending)
+                last_flush = time.monotonic()
+
+    @staticmethod
+    async def _close(workers: List[asyncio.Task], next_queue: asyncio.Queue, next_consumers: int):
+        """Wait for a stage's workers to drain, then signal every consumer of the next stage"""
+        await asyncio.gather(*workers)
+        for _ in range(next_consumers):
+            await next_queue.put(_DONE)
+
+    async def run(self, jobs: List[Dict]) -> Dict[str, int]:
+        """
+        Run every job through the pipeline
+
+        Args:
+            jobs (List[Dict]): Jobs with at least 'row' and 'layout' keys plus the product fields
+
+        Returns:
+            Dictionary with completed and failed job counts
+        """
+        job_queue = asyncio.Queue(self.queue_size)
+        generate_queue = asyncio.Queue(self.queue_size)
+        post_queue = asyncio.Queue(self.queue_size)
+        write_queue = asyncio.Queue(self.queue_size)
+        enrichments = {}
+
+        enrich_tasks = [asyncio.create_task(self._enrich_worker(job_queue, generate_queue, enrichments))
+                        for _ in range(self.enrich_workers)]
+        generate_tasks = [asyncio.create_task(self._generate_worker(generate_queue, post_queue))]
+        post_tasks = [asyncio.create_task(self._post_process_worker(post_queue, write_queue))
+                      for _ in range(self.post_process_workers)]
+        writer_task = asyncio.create_task(self._writer(write_queue))
+
+        for job in jobs:
+            await job_queue.put(job)
+        for _ in enrich_tasks:
+            await job_queue.put(_DONE)
+
+        await self._close(enrich_tasks, generate_queue, len(generate_tasks))
+        await self._close(generate_tasks, post_queue, len(post_tasks))
+        await self._close(post_tasks, write_queue, 1)
+        await writer_task
+
+        self.timer.print_summary()
+        return {'completed': self.completed, 'failed': self.failed}
+
+    def run_sync(self, jobs: List[Dict]) -> Dict[str, int]:
+        return asyncio.run(self.run(jobs))
+
+
+def main():
+    """Run the pipeline end to end against the local stand-ins"""
+    import argparse
+    import os
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from test_scripts.stand_ins import StandInServices
+
+    parser = argparse.ArgumentParser(description='Run the banner pipeline against local stand-ins')
+    parser.add_argument('--products', type=int, default=10, help='Number of fake products')
+    parser.add_argument('--layouts', type=int, default=4, help='Layouts per product')
+    parser.add_argument('--workers', type=int, default=4, help='Enrichment and post-processing workers')
+    parser.add_argument('--queue-size', type=int, default=8, help='Capacity of each inter-stage queue')
+    args = parser.parse_args()
+
+    with StandInServices() as services:
+        pipeline = BannerPipeline(
+            services.enrich,
+            services.generate,
+            services.post_process,
+            services.write,
+            enrich_workers=args.workers,
+            post_process_workers=args.workers,
+            queue_size=args.queue_size,
+        )
+        result = pipeline.run_sync(services.make_jobs(args.products, args.layouts))
+        print(f"Completed: {result['completed']}, failed: {result['failed']}, rows written: {len(services.written)}")
+
+
+if __name__ == "__main__":
+    main()
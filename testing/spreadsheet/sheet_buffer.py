@@ -0,0 +1,183 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import gspread
+
+from banner_utils.rate_limiter import call_with_backoff
+
+
+class SheetSnapshot:
+    """
+    One get_all_values read of a worksheet, shared by every stage that needs the sheet.
+
+    Replaces the per-row row_values calls (each one an API request) with lookups into
+    a snapshot taken once.
+    """
+
+    def __init__(self, worksheet, with_formulas: bool = False):
+        """
+        Args:
+            worksheet: gspread worksheet (or any object with get_all_values)
+            with_formulas (bool): Also read the FORMULA rendering, needed for =IMAGE() urls
+        """
+        self.worksheet = worksheet
+        self.with_formulas = with_formulas
+        self.values: List[List[str]] = []
+        self.formulas: List[List[str]] = []
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the worksheet"""
+        self.values = call_with_backoff('sheets', self.worksheet.get_all_values)
+        if self.with_formulas:
+            self.formulas = call_with_backoff('sheets', self.worksheet.get_all_values, value_render_option='FORMULA')
+
+    @property
+    def headers(self) -> List[str]:
+        return self.values[0] if self.values else []
+
+    def row(self, row_num: int) -> List[str]:
+        """Rendered values of a 1-indexed row, [] when the row is past the end of the sheet"""
+        return self.values[row_num - 1] if 0 < row_num <= len(self.values) else []
+
+    def formula_row(self, row_num: int) -> List[str]:
+        """Formulas of a 1-indexed row, [] when formulas were not read"""
+        return self.formulas[row_num - 1] if 0 < row_num <= len(self.formulas) else []
+
+    def find_column(self, name: str) -> Optional[int]:
+        """1-indexed column of the first header containing name (case-insensitive)"""
+        for i, header in enumerate(self.headers, 1):
+            if name in header.lower():
+                return i
+        return None
+
+
+class SheetWriteBuffer:
+    """
+    Collects cell updates and writes them with batch_update.
+
+    Updates are flushed when max_batch_size cells are pending or flush_interval seconds
+    have passed since the first pending update (a timer thread flushes an idle buffer),
+    and always on flush(), close() or when leaving a with block. Raw values and formulas
+    (=IMAGE(...)) need different value input options, so they are sent as separate
+    batches. Writing the same cell twice before a flush keeps only the last value. Safe
+    to use from several threads.
+
+    A failed write is never dropped: the cells that were not sent go back into the
+    buffer. flush() and close() then raise; a flush the buffer started itself (timer or
+    size) records the error in last_error and retries on the next flush.
+    """
+
+    def __init__(self, worksheet, max_batch_size: int = 100, flush_interval: float = 10.0):
+        """
+        Args:
+            worksheet: gspread worksheet (or any object with batch_update)
+            max_batch_size (int): Flush once this many cells are pending
+            flush_interval (float): Flush once the oldest pending update is this old
+        """
+        self.worksheet = worksheet
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[str, List]] = {'RAW': {}, 'USER_ENTERED': {}}
+        self._first_pending_at = None
+        self._timer = None
+        self._lock = threading.Lock()
+        # Serializes writes, so an older batch never lands after a newer one
+        self._write_lock = threading.Lock()
+        self.cells_written = 0
+        self.requests_sent = 0
+        self.failed_flushes = 0
+        self.last_error = None
+
+    def __len__(self):
+        return sum(len(cells) for cells in self._pending.values())
+
+    def add(self, row: int, col: int, value, raw: bool = True):
+        """
+        Queue a single cell update
+
+        Args:
+            row (int): 1-indexed row
+            col (int): 1-indexed column
+            value: Cell value
+            raw (bool): False to let Sheets interpret the value (formulas)
+        """
+        option = 'RAW' if raw else 'USER_ENTERED'
+        with self._lock:
+            self._pending[option][gspread.utils.rowcol_to_a1(row, col)] = [[value]]
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+                self._start_timer()
+            due = (len(self) >= self.max_batch_size or
+                   time.monotonic() - self._first_pending_at >= self.flush_interval)
+        if due:
+            self._flush_queued()
+
+    def _start_timer(self):
+        # Called with self._lock held, when the first update of a batch is queued
+        if self.flush_interval > 0 and self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_queued)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_queued(self):
+        """Flush started by the buffer itself; on failure the cells stay queued and the timer retries"""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"❌ Sheet write failed, {len(self)} cells kept for the next flush: {e}")
+            with self._lock:
+                if len(self):
+                    self._start_timer()
+
+    def _requeue(self, batches: List):
+        """Put unsent (option, updates) back, unless a newer value for the cell was queued meanwhile"""
+        with self._lock:
+            for option, data in batches:
+                for update in data:
+                    if not any(update['range'] in cells for cells in self._pending.values()):
+                        self._pending[option][update['range']] = update['values']
+            if len(self) and self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+
+    def flush(self):
+        """
+        Write every pending update, max_batch_size cells per request
+
+        If a request fails, every cell not written yet goes back into the buffer and the
+        error is raised; the next flush sends them again.
+        """
+        with self._write_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {'RAW': {}, 'USER_ENTERED': {}}
+                self._first_pending_at = None
+                timer, self._timer = self._timer, None
+            if timer is not None:
+                timer.cancel()
+
+            batches = [(option, [{'range': cell, 'values': values} for cell, values in cells.items()])
+                       for option, cells in pending.items()]
+            for i, (option, data) in enumerate(batches):
+                for start in range(0, len(data), self.max_batch_size):
+                    chunk = data[start:start + self.max_batch_size]
+                    try:
+                        call_with_backoff('sheets', self.worksheet.batch_update, chunk, value_input_option=option)
+                    except Exception as e:
+                        self._requeue([(option, data[start:])] + batches[i + 1:])
+                        self.failed_flushes += 1
+                        self.last_error = e
+                        raise
+                    self.requests_sent += 1
+                    self.cells_written += len(chunk)
+
+    def close(self):
+        """Flush what is pending and stop the timer"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
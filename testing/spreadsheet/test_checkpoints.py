@@ -2,9 +2,9 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from spreadsheet.update_fabric_json import UpdateFabricJson
+from test_scripts.test_qwen import clear_model_cache
 
 from tqdm import tqdm
-import torch
 
 
 
@@ -16,16 +16,20 @@ checkpoints_to_test = {
     "6": "/root/llm_training/model/checkpoint-1600",
 }
 
+# Merged 4-bit snapshots: the first run builds one per checkpoint, later runs load them in seconds
+snapshot_dir = os.getenv("MODEL_SNAPSHOT_DIR", "/root/llm_training/model_snapshots")
+
 
 for sheet_number, checkpoint_path in tqdm(checkpoints_to_test.items()):
-    u = UpdateFabricJson(sheet_number=int(sheet_number), checkpoint_path=checkpoint_path)
-    success = u.process_all_products(3.0)
+    u = UpdateFabricJson(sheet_number=int(sheet_number), checkpoint_path=checkpoint_path, snapshot_dir=snapshot_dir)
+    success = u.process_all_products()
     
     if success:
         print("Successfully updated Google Sheets with FabricJS JSON!")
     else:
         print("Failed to update Google Sheets. Please check the error messages above.")
 
+    # load_model caches every checkpoint; drop this one before loading the next
     del u
-    torch.cuda.empty_cache()
+    clear_model_cache()
 
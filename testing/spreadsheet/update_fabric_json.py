@@ -9,17 +9,22 @@ from typing import List, Dict, Optional
 
 dotenv.load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from test_scripts.test_qwen import test_model, load_model
+from test_scripts.test_qwen import test_model, load_model, load_layout_template, enrich_product, generate_condensed_json, post_process
+from spreadsheet.banner_pipeline import BannerPipeline
+from spreadsheet.sheet_buffer import SheetSnapshot, SheetWriteBuffer
+from banner_utils.tracing import print_summary as print_trace_summary
 
 
 class UpdateFabricJson:
-    def __init__(self, credentials_file: str = None, spreadsheet_name: str = "TestData", sheet_number: int = 1, checkpoint_path: str = "/root/llm_training/model/checkpoint-850"):
+    def __init__(self, credentials_file: str = None, spreadsheet_name: str = "TestData", sheet_number: int = 1, checkpoint_path: str = "/root/llm_training/model/checkpoint-850", num_candidates: int = 1, snapshot_dir: str = None):
         """
         Initialize the Google Sheets FabricJS JSON updater
         
         Args:
             credentials_file (str): Path to Google Service Account credentials JSON file
             spreadsheet_name (str): Name of the Google Spreadsheet
+            num_candidates (int): Banners sampled per generation; the best-scoring one is kept
+            snapshot_dir (str): Folder for merged 4-bit model snapshots (default: MODEL_SNAPSHOT_DIR, unset loads the checkpoint)
         """
         self.spreadsheet_name = spreadsheet_name
         self.credentials_file = os.getenv('GOOGLE_CREDENTIALS_FILE')
@@ -33,6 +38,8 @@ class UpdateFabricJson:
         self.gc = None
         self.spreadsheet = None
         self.worksheet = None
+        self.snapshot = None
+        self.write_buffer = None
         
         # Layout types to process
         self.layouts = [
@@ -50,7 +57,8 @@ class UpdateFabricJson:
         self.tokenizer = None
         self.checkpoint_path = checkpoint_path
         self.sheet_number = sheet_number
-        self.model, self.tokenizer = load_model(self.checkpoint_path)
+        self.num_candidates = num_candidates
+        self.model, self.tokenizer = load_model(self.checkpoint_path, snapshot_dir)
         
     def authenticate(self):
         """Authenticate with Google Sheets API"""
@@ -81,12 +89,20 @@ class UpdateFabricJson:
         try:
             self.spreadsheet = self.gc.open(self.spreadsheet_name)
             self.worksheet = self.spreadsheet.get_worksheet(self.sheet_number)  # Use second sheet (0-indexed)
+            self.snapshot = None
+            self.write_buffer = SheetWriteBuffer(self.worksheet)
             print(f"Successfully opened spreadsheet: {self.spreadsheet_name}")
             return True
         except Exception as e:
             print(f"Failed to open spreadsheet '{self.spreadsheet_name}': {e}")
             return False
     
+    def get_snapshot(self) -> SheetSnapshot:
+        """Read the worksheet once (values and formulas) and share it between all stages"""
+        if self.snapshot is None:
+            self.snapshot = SheetSnapshot(self.worksheet, with_formulas=True)
+        return self.snapshot
+    
     def extract_url_from_image_formula(self, formula: str) -> str:
         """
         Extract URL from IMAGE formula like =IMAGE("https://example.com/image.jpg")
@@ -122,10 +138,10 @@ class UpdateFabricJson:
             List of dictionaries with row number and product details
         """
         try:
-            # Get all values from the spreadsheet (rendered values)
-            all_values = self.worksheet.get_all_values()
-            # Get formulas to extract IMAGE() URLs
-            all_formulas = self.worksheet.get_all_values(value_render_option='FORMULA')
+            # Rendered values and formulas (to extract IMAGE() URLs) from one shared snapshot
+            snapshot = self.get_snapshot()
+            all_values = snapshot.values
+            all_formulas = snapshot.formulas
             
             if not all_values:
                 print("Spreadsheet is empty")
@@ -189,7 +205,7 @@ class UpdateFabricJson:
             Dictionary mapping layout names to column indices
         """
         try:
-            headers = self.worksheet.row_values(1)
+            headers = self.get_snapshot().headers
             layout_columns = {}
             
             for i, header in enumerate(headers, 1):
@@ -227,39 +243,151 @@ class UpdateFabricJson:
     
     def update_fabric_json(self, row_num: int, layout: str, fabric_json: dict, layout_columns: Dict[str, int]):
         """
-        Update a specific cell with FabricJS JSON
+        Queue an update of a specific cell with FabricJS JSON
+        
+        The write is buffered and sent with other cells in one batch_update call.
         
         Args:
             row_num (int): Row number to update
             layout (str): Layout type
             fabric_json (dict): FabricJS JSON object
             layout_columns (Dict[str, int]): Mapping of layout names to column indices
+            
+        Returns:
+            bool: True if the update was queued
         """
         try:
             if layout not in layout_columns:
                 print(f"No column found for layout: {layout}")
-                return
+                return False
                 
             col_num = layout_columns[layout]
             
             # Convert JSON to string
             json_str = json.dumps(fabric_json, separators=(',', ':'))  # Compact JSON
             
-            # Update the cell
-            cell_range = gspread.utils.rowcol_to_a1(row_num, col_num)
-            self.worksheet.update(cell_range, [[json_str]])
+            # Queue the cell update
+            self.write_buffer.add(row_num, col_num, json_str)
             
-            print(f"Updated row {row_num}, {layout} with FabricJS JSON")
+            print(f"Queued row {row_num}, {layout} with FabricJS JSON")
+            return True
             
         except Exception as e:
             print(f"Error updating fabric JSON for row {row_num}, layout {layout}: {e}")
+            return False
+    
+    def update_fabric_json_batch(self, results: List, layout_columns: Dict[str, int]):
+        """
+        Write several FabricJS JSON results with a single batch_update call
+        
+        Args:
+            results (List): (job, fabric_json) pairs where job has 'row' and 'layout' keys
+            layout_columns (Dict[str, int]): Mapping of layout names to column indices
+            
+        Returns:
+            int: Number of results that could not be queued (the pipeline counts them as failed)
+
+        Raises:
+            Exception: The batch_update failed; the pipeline counts the whole batch as
+                failed, and its cells stay queued for the next flush
+        """
+        not_written = 0
+        for job, fabric_json in results:
+            if not self.update_fabric_json(job['row'], job['layout'], fabric_json, layout_columns):
+                not_written += 1
+        self.write_buffer.flush()
+        return not_written
     
-    def process_all_products(self, delay_seconds: float = 3.0, specific_layout: str = None):
+    def process_all_products_pipelined(self, specific_layout: str = None, enrich_workers: int = 4,
+                                       post_process_workers: int = 4, queue_size: int = 8,
+                                       write_batch_size: int = 20):
+        """
+        Process all products through the staged BannerPipeline
+        
+        Enrichment and post-processing of other products overlap with GPU generation,
+        and results are written to the sheet in batches instead of one call per cell.
+        
+        Args:
+            specific_layout (str): If specified, only process this layout
+            enrich_workers (int): Concurrent enrichment (OpenAI) workers
+            post_process_workers (int): Concurrent post-processing workers
+            queue_size (int): Capacity of each inter-stage queue
+            write_batch_size (int): Number of results per sheet write
+        """
+        if not self.authenticate():
+            return False
+            
+        if not self.open_spreadsheet():
+            return False
+        
+        product_data = self.get_product_data()
+        
+        if not product_data:
+            print("No product data found to process")
+            return False
+        
+        layout_columns = self.find_layout_columns()
+        
+        if not layout_columns:
+            print("No layout columns found in spreadsheet")
+            return False
+        
+        layouts_to_process = [specific_layout] if specific_layout else self.layouts
+        layouts_to_process = [l for l in layouts_to_process if l in layout_columns]
+        
+        if not layouts_to_process:
+            print("No valid layouts to process")
+            return False
+        
+        layout_template = load_layout_template()
+        jobs = [dict(product, layout=layout) for product in product_data for layout in layouts_to_process]
+        print(f"Processing {len(jobs)} jobs through the pipeline...")
+        
+        def enrich(job):
+            return enrich_product(job['product_image'], job['product_name'], job['product_description'])
+        
+        def generate(job, enrichment):
+            product_color, fontFamilyList = enrichment
+            generated_json, recovered = generate_condensed_json(
+                self.model, self.tokenizer, job['product_name'], job['product_description'],
+                job['product_price'], job['layout'], layout_template, product_color, fontFamilyList,
+                self.num_candidates
+            )
+            job['recovered'] = recovered
+            return generated_json
+        
+        def post(job, generated_json):
+            if job['recovered']:
+                return generated_json
+            return post_process(generated_json, job['product_image'])
+        
+        pipeline = BannerPipeline(
+            enrich, generate, post,
+            lambda results: self.update_fabric_json_batch(results, layout_columns),
+            enrich_workers=enrich_workers,
+            post_process_workers=post_process_workers,
+            queue_size=queue_size,
+            write_batch_size=write_batch_size,
+        )
+        result = pipeline.run_sync(jobs)
+        
+        # Cells of a batch whose write failed are still queued; this is their last try
+        try:
+            self.write_buffer.flush()
+        except Exception as e:
+            print(f"❌ {len(self.write_buffer)} sheet cells could not be written: {e}")
+            return False
+        print(f"\n🎉 Completed {result['completed']} jobs, {result['failed']} failed")
+        print_trace_summary()
+        return True
+    
+    def process_all_products(self, delay_seconds: float = 0.0, specific_layout: str = None):
         """
         Process all products and generate FabricJS JSON for each layout
         
         Args:
-            delay_seconds (float): Delay between model calls to avoid overwhelming the GPU
+            delay_seconds (float): Extra pause between model calls. OpenAI and Sheets calls
+                are throttled by the shared rate limiter, so this is normally 0
             specific_layout (str): If specified, only process this layout
         """
         if not self.authenticate():
@@ -309,13 +437,16 @@ class UpdateFabricJson:
                 try:
                     # Generate FabricJS JSON using the test_model function
                     start_time = time.time()
-                    fabric_json = test_model(product_name, product_description, product_price, layout, image_url, self.model, self.tokenizer)
+                    fabric_json = test_model(product_name, product_description, product_price, layout, image_url, self.model, self.tokenizer,
+                                             self.num_candidates)
                     generation_time = time.time() - start_time
                     
                     if fabric_json and fabric_json != "failed to extract json":
                         # Update the spreadsheet
-                        self.update_fabric_json(row_num, layout, fabric_json, layout_columns)
-                        print(f"    ✅ Generated and saved {layout} (took {generation_time:.1f}s)")
+                        if self.update_fabric_json(row_num, layout, fabric_json, layout_columns):
+                            print(f"    ✅ Generated and saved {layout} (took {generation_time:.1f}s)")
+                        else:
+                            print(f"    ❌ Generated {layout} but could not save it")
                     else:
                         print(f"    ❌ Failed to generate valid JSON for {layout}")
                         
@@ -327,17 +458,23 @@ class UpdateFabricJson:
                     print(f"    ❌ Error generating {layout}: {e}")
                     continue
         
+        try:
+            self.write_buffer.flush()
+        except Exception as e:
+            print(f"❌ {len(self.write_buffer)} sheet cells could not be written: {e}")
+            return False
         print(f"\n🎉 Completed processing all products and layouts!")
+        print_trace_summary()
         return True
     
-    def process_single_product(self, row_num: int, layout: str = None, delay_seconds: float = 3.0):
+    def process_single_product(self, row_num: int, layout: str = None, delay_seconds: float = 0.0):
         """
         Process a single product row
         
         Args:
             row_num (int): Row number to process
             layout (str): Specific layout to generate (if None, generates all layouts)
-            delay_seconds (float): Delay between model calls
+            delay_seconds (float): Extra pause between model calls
         """
         if not self.authenticate():
             return False
@@ -347,9 +484,10 @@ class UpdateFabricJson:
         
         # Get the specific row data
         try:
-            row_values = self.worksheet.row_values(row_num)
-            row_formulas = self.worksheet.row_values(row_num, value_render_option='FORMULA')
-            headers = self.worksheet.row_values(1)
+            snapshot = self.get_snapshot()
+            row_values = snapshot.row(row_num)
+            row_formulas = snapshot.formula_row(row_num)
+            headers = snapshot.headers
             
             # Find product data columns
             product_data = {}
@@ -394,18 +532,22 @@ class UpdateFabricJson:
                     layout_type, 
                     product_data['product_image'],
                     self.model,
-                    self.tokenizer
+                    self.tokenizer,
+                    self.num_candidates
                 )
                 
                 if fabric_json and fabric_json != "failed to extract json":
-                    self.update_fabric_json(row_num, layout_type, fabric_json, layout_columns)
-                    print(f"    ✅ Generated and saved {layout_type}")
+                    if self.update_fabric_json(row_num, layout_type, fabric_json, layout_columns):
+                        print(f"    ✅ Generated and saved {layout_type}")
+                    else:
+                        print(f"    ❌ Generated {layout_type} but could not save it")
                 else:
                     print(f"    ❌ Failed to generate {layout_type}")
                 
                 if delay_seconds > 0:
                     time.sleep(delay_seconds)
             
+            self.write_buffer.flush()
             return True
             
         except Exception as e:
@@ -421,15 +563,25 @@ def main():
     parser.add_argument('--spreadsheet', default='TestData', help='Name of the Google Spreadsheet')
     parser.add_argument('--layout', help='Specific layout to process (default: all layouts)')
     parser.add_argument('--row', type=int, help='Specific row to process (default: all rows)')
-    parser.add_argument('--delay', type=float, default=3.0, help='Delay between model calls in seconds')
+    parser.add_argument('--delay', type=float, default=0.0, help='Extra pause between model calls in seconds')
+    parser.add_argument('--pipeline', action='store_true', help='Overlap enrichment, generation and post-processing')
+    parser.add_argument('--workers', type=int, default=4, help='Enrichment and post-processing workers for --pipeline')
+    parser.add_argument('--candidates', type=int, default=1, help='Banners sampled per generation, the best-scoring one is kept')
+    parser.add_argument('--snapshot-dir', help='Load the model from a merged 4-bit snapshot in this folder (built on first use)')
     
     args = parser.parse_args()
     
-    updater = UpdateFabricJson(spreadsheet_name=args.spreadsheet)
+    updater = UpdateFabricJson(spreadsheet_name=args.spreadsheet, num_candidates=args.candidates,
+                               snapshot_dir=args.snapshot_dir)
     
     if args.row:
         # Process single row
         success = updater.process_single_product(args.row, args.layout, args.delay)
+    elif args.pipeline:
+        # Process all rows through the staged pipeline
+        success = updater.process_all_products_pipelined(
+            args.layout, enrich_workers=args.workers, post_process_workers=args.workers
+        )
     else:
         # Process all rows
         success = updater.process_all_products(args.delay, args.layout)
@@ -8,7 +8,8 @@ from typing import List, Dict, Optional
 
 dotenv.load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from banner_utils.amazon_scrapper import extract_amazon_product_details
+from banner_utils.amazon_scrapper import extract_amazon_product_details, extract_many_amazon_product_details
+from spreadsheet.sheet_buffer import SheetSnapshot, SheetWriteBuffer
 
 
 class UpdateInput:
@@ -31,6 +32,8 @@ class UpdateInput:
         self.gc = None
         self.spreadsheet = None
         self.worksheet = None
+        self.snapshot = None
+        self.write_buffer = None
         
     def authenticate(self):
         """Authenticate with Google Sheets API"""
@@ -61,12 +64,20 @@ class UpdateInput:
         try:
             self.spreadsheet = self.gc.open(self.spreadsheet_name)
             self.worksheet = self.spreadsheet.sheet1  # Use first sheet
+            self.snapshot = None
+            self.write_buffer = SheetWriteBuffer(self.worksheet)
             print(f"Successfully opened spreadsheet: {self.spreadsheet_name}")
             return True
         except Exception as e:
             print(f"Failed to open spreadsheet '{self.spreadsheet_name}': {e}")
             return False
     
+    def get_snapshot(self) -> SheetSnapshot:
+        """Read the worksheet once and share it between URL extraction and row updates"""
+        if self.snapshot is None:
+            self.snapshot = SheetSnapshot(self.worksheet)
+        return self.snapshot
+    
     def get_amazon_urls(self) -> List[Dict]:
         """
         Get Amazon URLs from the spreadsheet
@@ -75,8 +86,8 @@ class UpdateInput:
             List of dictionaries with row number and amazon_url
         """
         try:
-            # Get all values from the spreadsheet
-            all_values = self.worksheet.get_all_values()
+            # Get all values from the shared snapshot
+            all_values = self.get_snapshot().values
             
             if not all_values:
                 print("Spreadsheet is empty")
@@ -114,7 +125,9 @@ class UpdateInput:
                                       product_description: str, product_price: str, 
                                       image_url: str):
         """
-        Update a specific row with product details
+        Queue an update of a specific row with product details
+        
+        The writes are buffered and sent with other rows in one batch_update call.
         
         Args:
             row_num (int): Row number to update
@@ -125,7 +138,7 @@ class UpdateInput:
         """
         try:
             # Get header row to find column positions
-            headers = self.worksheet.row_values(1)
+            headers = self.get_snapshot().headers
             
             # Find column indices
             name_col = None
@@ -144,49 +157,35 @@ class UpdateInput:
                 elif 'product_image' in header_lower:
                     image_col = i
             
-            # Update cells if columns were found
-            updates = []
-            
+            # Queue cells if columns were found
             if name_col:
-                updates.append({
-                    'range': f'{gspread.utils.rowcol_to_a1(row_num, name_col)}',
-                    'values': [[product_name]]
-                })
+                self.write_buffer.add(row_num, name_col, product_name)
             
             if desc_col:
-                updates.append({
-                    'range': f'{gspread.utils.rowcol_to_a1(row_num, desc_col)}',
-                    'values': [[product_description]]
-                })
+                self.write_buffer.add(row_num, desc_col, product_description)
             
             if price_col:
-                updates.append({
-                    'range': f'{gspread.utils.rowcol_to_a1(row_num, price_col)}',
-                    'values': [[product_price]]
-                })
+                self.write_buffer.add(row_num, price_col, product_price)
             
             if image_col and image_url:
                 # For Google Sheets, we can use IMAGE formula to display the image
                 image_formula = f'=IMAGE("{image_url}")'
-                updates.append({
-                    'range': f'{gspread.utils.rowcol_to_a1(row_num, image_col)}',
-                    'values': [[image_formula]]
-                })
+                self.write_buffer.add(row_num, image_col, image_formula, raw=False)
             
-            # Batch update all cells
-            if updates:
-                self.worksheet.batch_update(updates)
-                print(f"Updated row {row_num} with product details")
+            print(f"Queued row {row_num} with product details")
             
         except Exception as e:
             print(f"Error updating row {row_num}: {e}")
     
-    def process_all_urls(self, delay_seconds: float = 2.0):
+    def process_all_urls(self, delay_seconds: float = 0.0, concurrency: int = 16, per_host_limit: int = 4):
         """
         Process all Amazon URLs in the spreadsheet
         
         Args:
-            delay_seconds (float): Delay between requests to avoid rate limiting
+            delay_seconds (float): Extra pause between rows. Not needed for rate limiting:
+                RapidAPI and Sheets calls go through the shared rate limiter
+            concurrency (int): URLs scraped and processed at once; 1 processes them one by one
+            per_host_limit (int): Scraper calls in flight per RapidAPI host
         """
         if not self.authenticate():
             return False
@@ -202,6 +201,9 @@ class UpdateInput:
         
         print(f"Processing {len(amazon_urls)} Amazon URLs...")
         
+        if concurrency > 1:
+            return self._process_urls_concurrently(amazon_urls, concurrency, per_host_limit)
+        
         for i, url_data in enumerate(amazon_urls, 1):
             row_num = url_data['row']
             amazon_url = url_data['amazon_url']
@@ -223,7 +225,7 @@ class UpdateInput:
                     product_price, image_url
                 )
                 
-                # Add delay to avoid rate limiting
+                # Optional extra pause; rate limiting is handled by banner_utils.rate_limiter
                 if delay_seconds > 0:
                     time.sleep(delay_seconds)
                     
@@ -231,8 +233,40 @@ class UpdateInput:
                 print(f"Error processing URL in row {row_num}: {e}")
                 continue
         
+        try:
+            self.write_buffer.flush()
+        except Exception as e:
+            print(f"❌ {len(self.write_buffer)} sheet cells could not be written: {e}")
+            return False
         print(f"\nCompleted processing all URLs!")
         return True
+    
+    def _process_urls_concurrently(self, amazon_urls: List[Dict], concurrency: int, per_host_limit: int):
+        """Scrape and process every URL concurrently, then queue the rows in sheet order"""
+        results = extract_many_amazon_product_details(
+            [url_data['amazon_url'] for url_data in amazon_urls], concurrency, per_host_limit
+        )
+        
+        failed = 0
+        for url_data, result in zip(amazon_urls, results):
+            row_num = url_data['row']
+            if isinstance(result, Exception):
+                print(f"Error processing URL in row {row_num}: {result}")
+                failed += 1
+                continue
+            product_name, product_description, product_price, image_url = result
+            self.update_row_with_product_details(
+                row_num, product_name, product_description, 
+                product_price, image_url
+            )
+        
+        try:
+            self.write_buffer.flush()
+        except Exception as e:
+            print(f"❌ {len(self.write_buffer)} sheet cells could not be written: {e}")
+            return False
+        print(f"\nCompleted processing all URLs! ({len(amazon_urls) - failed} succeeded, {failed} failed)")
+        return True
 
 
 def main():
@@ -240,8 +274,8 @@ def main():
     # You can specify a custom spreadsheet name here
     populator = UpdateInput(spreadsheet_name="TestData")
     
-    # Process all URLs with a 2-second delay between requests
-    success = populator.process_all_urls(delay_seconds=2.0)
+    # Process all URLs; throughput is governed by the per-service rate limiters
+    success = populator.process_all_urls()
     
     if success:
         print("Successfully populated Google Sheets with product details!")
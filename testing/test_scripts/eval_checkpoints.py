@@ -0,0 +1,210 @@
+"""
+Local checkpoint evaluation: one base model, LoRA adapters swapped in place.
+
+The base model is loaded once (from the first checkpoint's adapter_config.json), and
+every checkpoint-* directory is attached as a named LoRA adapter, evaluated and
+removed again, so a checkpoint costs an adapter load (a few hundred MB) instead of a
+14B model load. Each checkpoint runs the fixed eval split of train.py in left-padded
+batches with a fixed seed and is scored automatically:
+
+    json_valid        the response contains a parsable banner with an objects list
+    text_overlaps     pairs of text layers whose boxes intersect
+    out_of_canvas     layers that extend past the 1080x1080 canvas
+    layout_score      layout_checker score (overlaps, canvas, CTA containment, spacing)
+    font_compliance   share of text layers using a font from the prompt's font list
+
+Per-sample rows and the per-checkpoint summary are written as CSV under --output.
+
+Run from the testing/ directory:
+    python test_scripts/eval_checkpoints.py --checkpoints "../model/checkpoint-*" --batch-size 4
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+
+from unsloth import FastLanguageModel
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../src"))
+from banner_utils.get_best_result import extract_json_from_response
+from banner_utils.layout_checker import check_layout
+from train import split_data, build_input_text
+
+def font_compliance(banner: dict, font_list: list) -> float:
+    """Share of text layers whose fontFamily is in the prompt's list (1.0 without text layers)"""
+    families = [layer.get("fontFamily") for layer in banner["objects"] if layer.get("type") in ("text", "textbox")]
+    if not families:
+        return 1.0
+    allowed = set(font_list)
+    return sum(family in allowed for family in families) / len(families)
+
+
+def score_response(response: str, record: dict) -> dict:
+    """Automatic metrics for one generated response against its eval record"""
+    try:
+        banner = extract_json_from_response(response)
+    except Exception:
+        banner = None
+    if not isinstance(banner, dict) or not isinstance(banner.get("objects"), list):
+        return {'json_valid': 0, 'layers': 0, 'text_overlaps': None, 'out_of_canvas': None,
+                'cta_contained': None, 'spacing': None, 'layout_score': None, 'font_compliance': None}
+    font_list = [layer.get("fontFamily", "") for layer in record["output"]["objects"]]
+    report = check_layout(banner)
+    return {
+        'json_valid': 1,
+        'layers': report['layers'],
+        'text_overlaps': report['text_overlaps'],
+        'out_of_canvas': report['out_of_canvas'],
+        'cta_contained': report['cta_contained'],
+        'spacing': report['spacing'],
+        'layout_score': report['score'],
+        'font_compliance': font_compliance(banner, font_list),
+    }
+
+
+def summarize(rows: list) -> dict:
+    """Per-checkpoint averages; the layout metrics are over the valid responses only"""
+    valid = [row for row in rows if row['json_valid']]
+
+    def mean(key):
+        return sum(row[key] for row in valid) / len(valid) if valid else None
+
+    return {
+        'samples': len(rows),
+        'json_valid_rate': len(valid) / len(rows) if rows else 0.0,
+        'text_overlaps': mean('text_overlaps'),
+        'out_of_canvas': mean('out_of_canvas'),
+        'layout_score': mean('layout_score'),
+        'font_compliance': mean('font_compliance'),
+        'seconds': sum(row['seconds'] for row in rows),
+    }
+
+
+def load_base_model(checkpoint_path: str, max_seq_length: int = 8192):
+    """Load the base model named in the checkpoint's adapter config, with that checkpoint attached"""
+    model, tokenizer = FastLanguageModel.from_pretrained(
+        model_name=checkpoint_path,
+        max_seq_length=max_seq_length,
+        load_in_4bit=True,
+        load_in_8bit=False,
+        full_finetuning=False,
+    )
+    FastLanguageModel.for_inference(model)
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    return model, tokenizer
+
+
+def generate_batch(model, tokenizer, prompts: list, max_new_tokens: int, temperature: float, top_p: float, top_k: int):
+    """Left-padded batched generation; returns the decoded completions"""
+    texts = [
+        tokenizer.apply_chat_template([{"role": "user", "content": prompt}], enable_thinking=False,
+                                      add_generation_prompt=True, tokenize=False)
+        for prompt in prompts
+    ]
+    with torch.no_grad():
+        inputs = tokenizer(texts, return_tensors="pt", padding=True).to("cuda")
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            do_sample=True,
+            pad_token_id=tokenizer.pad_token_id,
+        )
+    completions = outputs[:, inputs["input_ids"].shape[1]:]
+    return tokenizer.batch_decode(completions, skip_special_tokens=True)
+
+
+def evaluate_checkpoint(model, tokenizer, eval_data: list, batch_size: int, seed: int, **generate_kwargs) -> list:
+    torch.manual_seed(seed)
+    rows = []
+    for start in range(0, len(eval_data), batch_size):
+        batch = eval_data[start:start + batch_size]
+        start_time = time.perf_counter()
+        responses = generate_batch(model, tokenizer, [build_input_text(record) for record in batch], **generate_kwargs)
+        seconds = (time.perf_counter() - start_time) / len(batch)
+        for index, (record, response) in enumerate(zip(batch, responses)):
+            rows.append({'sample': start + index, 'layout': record["input"]["layout"], 'seconds': seconds,
+                         **score_response(response, record)})
+        print(f"  {min(start + batch_size, len(eval_data))}/{len(eval_data)} samples")
+    return rows
+
+
+def write_csv(path: str, rows: list):
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate LoRA checkpoints on the train.py eval split')
+    parser.add_argument('--checkpoints', default='../model/checkpoint-*', help='Glob of checkpoint directories')
+    parser.add_argument('--data', default='../final_data', help='Folder with the training records')
+    parser.add_argument('--eval-per-layout', type=int, default=4, help='Eval records per layout, as in train.py')
+    parser.add_argument('--limit', type=int, default=None, help='Evaluate only the first N eval records')
+    parser.add_argument('--batch-size', type=int, default=4, help='Prompts per generate() call')
+    parser.add_argument('--max-new-tokens', type=int, default=8192)
+    parser.add_argument('--temperature', type=float, default=0.7)
+    parser.add_argument('--top-p', type=float, default=0.9)
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=3407)
+    parser.add_argument('--output', default='output/eval', help='Folder for the CSV tables')
+    args = parser.parse_args()
+
+    checkpoints = sorted(glob.glob(args.checkpoints), key=lambda path: int(path.rsplit("-", 1)[-1]))
+    if not checkpoints:
+        print(f"❌ No checkpoints match {args.checkpoints}")
+        return
+    _, eval_data = split_data(args.data, args.eval_per_layout)
+    eval_data = eval_data[:args.limit]
+    run_dir = os.path.join(args.output, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    print(f"Evaluating {len(checkpoints)} checkpoints on {len(eval_data)} samples, results in {run_dir}")
+
+    start_time = time.perf_counter()
+    model, tokenizer = load_base_model(checkpoints[0])
+    print(f"Base model loaded in {time.perf_counter() - start_time:.1f}s")
+
+    generate_kwargs = {'max_new_tokens': args.max_new_tokens, 'temperature': args.temperature,
+                       'top_p': args.top_p, 'top_k': args.top_k}
+    summaries = []
+    active_adapter = model.active_adapter
+    for checkpoint in checkpoints:
+        name = os.path.basename(checkpoint.rstrip("/")).replace("-", "_")
+        if checkpoint != checkpoints[0]:
+            # Swap adapters in place: load the next one, then drop the previous one
+            start_time = time.perf_counter()
+            model.load_adapter(checkpoint, adapter_name=name)
+            model.set_adapter(name)
+            model.delete_adapter(active_adapter)
+            active_adapter = name
+            print(f"Swapped in {name} in {time.perf_counter() - start_time:.1f}s")
+
+        print(f"Evaluating {checkpoint}...")
+        rows = evaluate_checkpoint(model, tokenizer, eval_data, args.batch_size, args.seed, **generate_kwargs)
+        write_csv(os.path.join(run_dir, f"{name}.csv"), rows)
+        summaries.append({'checkpoint': os.path.basename(checkpoint.rstrip("/")), **summarize(rows)})
+        write_csv(os.path.join(run_dir, "summary.csv"), summaries)
+
+    print(f"\n{'checkpoint':<18}{'samples':>8}{'valid':>8}{'overlaps':>10}{'off canvas':>12}{'layout':>8}{'fonts ok':>10}{'s/sample':>10}")
+    for summary in summaries:
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else "-"
+        print(f"{summary['checkpoint']:<18}{summary['samples']:>8}{summary['json_valid_rate']:>8.0%}"
+              f"{fmt(summary['text_overlaps'], '.2f'):>10}{fmt(summary['out_of_canvas'], '.2f'):>12}"
+              f"{fmt(summary['layout_score'], '.2f'):>8}"
+              f"{fmt(summary['font_compliance'], '.0%'):>10}{summary['seconds'] / max(1, summary['samples']):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
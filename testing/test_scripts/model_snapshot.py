@@ -0,0 +1,224 @@
+"""
+Pre-quantized, LoRA-merged snapshots of a fine-tuned checkpoint for fast model loads.
+
+A checkpoint-* directory only holds the LoRA adapter, so every load_model() call
+downloads or reads the 16-bit base model, quantizes it to 4-bit on the GPU and
+attaches the adapter, which takes minutes for the 14B model. A snapshot is the same
+model after that work: the adapter merged into the base weights, saved already
+quantized as safetensors. Loading it skips the quantization and the adapter, and the
+safetensors files are memory-mapped, so only the pages the GPU copy needs are read.
+
+With MODEL_SNAPSHOT_DIR set (or load_model(checkpoint, snapshot_dir=...), which
+UpdateFabricJson and spreadsheet/test_checkpoints.py pass through), load_model() in
+test_qwen.py loads each checkpoint from its snapshot under that folder, building it
+on first use and rebuilding it whenever the checkpoint's weights or configs change:
+
+    MODEL_SNAPSHOT_DIR   folder for the snapshots (default: unset, load the checkpoint)
+
+Merging into 4-bit weights rounds the adapter delta to the quantization grid, so
+outputs can differ slightly from the unmerged checkpoint; main() reports how often.
+
+Run from the testing/ directory to build a snapshot and compare load times:
+    MODEL_SNAPSHOT_DIR=../model_snapshots python test_scripts/model_snapshot.py --checkpoint ../model/checkpoint-1400
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+MODEL_SNAPSHOT_DIR = os.getenv("MODEL_SNAPSHOT_DIR", "")
+MANIFEST_FILE = "snapshot.json"
+SAVE_METHOD = "merged_4bit_forced"
+
+# Bump when the snapshot layout changes
+_SNAPSHOT_FORMAT = 1
+# Files in a checkpoint that change the model; optimizer and trainer state do not
+_MODEL_FILE_SUFFIXES = (".safetensors", ".bin", ".json", ".model", ".txt")
+_TRAINER_FILES = {"optimizer.pt", "scheduler.pt", "rng_state.pth", "trainer_state.json", "training_args.bin"}
+
+_build_lock = threading.Lock()
+
+
+def snapshot_path(checkpoint_path: str, snapshot_root: str = None):
+    """Snapshot folder for a checkpoint, e.g. <root>/model_checkpoint-1400; None when snapshots are off"""
+    snapshot_root = snapshot_root or MODEL_SNAPSHOT_DIR
+    if not snapshot_root:
+        return None
+    checkpoint_path = os.path.realpath(checkpoint_path)
+    name = f"{os.path.basename(os.path.dirname(checkpoint_path))}_{os.path.basename(checkpoint_path)}"
+    return os.path.join(snapshot_root, name)
+
+
+def source_stamp(checkpoint_path: str) -> list:
+    """(name, mtime, size) of every model file in the checkpoint, to detect a changed checkpoint"""
+    stamp = []
+    for name in sorted(os.listdir(checkpoint_path)):
+        path = os.path.join(checkpoint_path, name)
+        if name in _TRAINER_FILES or not name.endswith(_MODEL_FILE_SUFFIXES) or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        stamp.append([name, stat.st_mtime_ns, stat.st_size])
+    return stamp
+
+
+def read_manifest(snapshot_dir: str):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(snapshot_dir: str, checkpoint_path: str) -> bool:
+    """True when snapshot_dir was built from the checkpoint as it is now"""
+    manifest = read_manifest(snapshot_dir)
+    return (
+        manifest is not None
+        and manifest.get("format") == _SNAPSHOT_FORMAT
+        and manifest.get("checkpoint") == os.path.realpath(checkpoint_path)
+        and manifest.get("stamp") == source_stamp(checkpoint_path)
+    )
+
+
+def build_snapshot(checkpoint_path: str, snapshot_dir: str, max_seq_length: int = 8192) -> str:
+    """
+    Load the checkpoint the slow way, merge its adapter into the 4-bit weights and save the result
+
+    The snapshot is written to a temporary folder next to snapshot_dir and moved into
+    place when complete, so an interrupted build never leaves a half-written snapshot.
+    The model is freed afterwards: merging modifies it, so it is not returned.
+
+    Returns:
+        snapshot_dir
+    """
+    import torch
+    from unsloth import FastLanguageModel
+
+    stamp = source_stamp(checkpoint_path)
+    start_time = time.perf_counter()
+    model, tokenizer = FastLanguageModel.from_pretrained(
+        model_name=checkpoint_path,
+        max_seq_length=max_seq_length,
+        load_in_4bit=True,
+        load_in_8bit=False,
+        full_finetuning=False,
+    )
+    temp_dir = f"{snapshot_dir.rstrip(os.sep)}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    try:
+        model.save_pretrained_merged(temp_dir, tokenizer, save_method=SAVE_METHOD, safe_serialization=True)
+        base_model = getattr(getattr(model, "peft_config", {}).get("default"), "base_model_name_or_path", None)
+        manifest = {
+            "format": _SNAPSHOT_FORMAT,
+            "checkpoint": os.path.realpath(checkpoint_path),
+            "stamp": stamp,
+            "base_model": base_model,
+            "save_method": SAVE_METHOD,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with open(os.path.join(temp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.replace(temp_dir, snapshot_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        del model
+        torch.cuda.empty_cache()
+    print(f"✅ Snapshot of {checkpoint_path} saved to {snapshot_dir} in {time.perf_counter() - start_time:.1f}s")
+    return snapshot_dir
+
+
+def resolve_model_path(checkpoint_path: str, snapshot_root: str = None) -> str:
+    """
+    Path load_model() should load for a checkpoint
+
+    With snapshots off this is the checkpoint itself. Otherwise it is the checkpoint's
+    snapshot, built first when missing or stale; if building fails (no space, read-only
+    folder) the checkpoint is loaded as before.
+    """
+    snapshot_dir = snapshot_path(checkpoint_path, snapshot_root)
+    if snapshot_dir is None or not os.path.isdir(checkpoint_path):
+        return checkpoint_path
+    if is_current(snapshot_dir, checkpoint_path):
+        return snapshot_dir
+    with _build_lock:
+        if not is_current(snapshot_dir, checkpoint_path):
+            try:
+                os.makedirs(os.path.dirname(snapshot_dir) or ".", exist_ok=True)
+                build_snapshot(checkpoint_path, snapshot_dir)
+            except Exception as e:
+                print(f"❌ Could not build snapshot of {checkpoint_path}: {e}")
+                return checkpoint_path
+    return snapshot_dir
+
+
+def main():
+    """Build (or refresh) a snapshot, then time loading the checkpoint and the snapshot and compare greedy outputs"""
+    import argparse
+    import gc
+    import sys
+
+    import torch
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../src"))
+    from unsloth import FastLanguageModel
+    from train import split_data, build_input_text
+
+    parser = argparse.ArgumentParser(description='Build a merged 4-bit snapshot of a checkpoint and compare load times')
+    parser.add_argument('--checkpoint', default='../model/checkpoint-1400', help='Fine-tuned checkpoint')
+    parser.add_argument('--snapshot-dir', default=MODEL_SNAPSHOT_DIR or '../model_snapshots', help='Folder for the snapshots')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the snapshot even when it is current')
+    parser.add_argument('--data', default='../final_data', help='Folder with the training records')
+    parser.add_argument('--limit', type=int, default=4, help='Eval prompts to compare outputs on (0 to skip)')
+    parser.add_argument('--max-new-tokens', type=int, default=1024)
+    args = parser.parse_args()
+
+    snapshot_dir = snapshot_path(args.checkpoint, args.snapshot_dir)
+    os.makedirs(args.snapshot_dir, exist_ok=True)
+    if args.rebuild or not is_current(snapshot_dir, args.checkpoint):
+        build_snapshot(args.checkpoint, snapshot_dir)
+    else:
+        print(f"Snapshot {snapshot_dir} is current")
+
+    prompts = []
+    if args.limit > 0:
+        _, eval_data = split_data(args.data)
+        prompts = [build_input_text(record) for record in eval_data[:args.limit]]
+
+    timings = {}
+    completions = {}
+    for name, path in (('checkpoint', args.checkpoint), ('snapshot', snapshot_dir)):
+        torch.cuda.synchronize()
+        start_time = time.perf_counter()
+        model, tokenizer = FastLanguageModel.from_pretrained(model_name=path, max_seq_length=8192, load_in_4bit=True,
+                                                             load_in_8bit=False, full_finetuning=False)
+        FastLanguageModel.for_inference(model)
+        torch.cuda.synchronize()
+        timings[name] = time.perf_counter() - start_time
+        print(f"{name}: loaded in {timings[name]:.1f}s")
+
+        completions[name] = []
+        for prompt in prompts:
+            text = tokenizer.apply_chat_template([{"role": "user", "content": prompt}], enable_thinking=False,
+                                                 add_generation_prompt=True, tokenize=False)
+            inputs = tokenizer(text, return_tensors="pt").to("cuda")
+            with torch.no_grad():
+                outputs = model.generate(**inputs, max_new_tokens=args.max_new_tokens, do_sample=False,
+                                         pad_token_id=tokenizer.eos_token_id)
+            completions[name].append(outputs[0, inputs["input_ids"].shape[1]:].tolist())
+        del model, tokenizer
+        gc.collect()
+        torch.cuda.empty_cache()
+
+    print(f"\nLoad time: checkpoint {timings['checkpoint']:.1f}s, snapshot {timings['snapshot']:.1f}s "
+          f"({timings['checkpoint'] / timings['snapshot']:.1f}x faster)")
+    if prompts:
+        same = sum(a == b for a, b in zip(completions['checkpoint'], completions['snapshot']))
+        print(f"Greedy outputs identical for {same}/{len(prompts)} eval prompts "
+              f"(4-bit merging rounds the adapter, small differences are expected)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Assisted (speculative) generation for banner JSON.
+
+Most of a banner is predictable boilerplate ("top":, "left":, "type": "text"), so a
+cheap drafter proposes several tokens and the 14B model verifies them in one
+forward pass. Two drafters are supported through transformers' generate():
+
+    draft model     a small model with the same tokenizer, e.g. Qwen3-0.6B trained on
+                    final_data with  BASE_MODEL=unsloth/Qwen3-0.6B OUTPUT_DIR=model_draft python ../src/train.py
+    prompt lookup   n-gram drafting from the prompt and the text generated so far
+                    (no extra model)
+
+generate_banner() in test_qwen.py picks them up from the environment:
+
+    DRAFT_MODEL            checkpoint of the draft model (loaded once)
+    PROMPT_LOOKUP_TOKENS   tokens drafted per prompt-lookup step, used when no
+                           DRAFT_MODEL is set
+
+Both only apply to single-sample generation; best-of-N sampling is unchanged.
+
+Run from the testing/ directory to compare plain and assisted greedy decoding on the
+train.py eval split (speedup, acceptance rate, and whether the outputs match):
+    python test_scripts/speculative.py --checkpoint ../model/checkpoint-1400 --draft ../model_draft/checkpoint-1400 --limit 8
+"""
+import os
+import threading
+
+DRAFT_MODEL = os.getenv("DRAFT_MODEL", "")
+PROMPT_LOOKUP_TOKENS = int(os.getenv("PROMPT_LOOKUP_TOKENS", "0") or 0)
+
+
+class ForwardCounter:
+    """
+    Counts forward calls of one or more models while active
+
+        with ForwardCounter(model, assistant) as counter:
+            model.generate(...)
+        counter.calls  # [target forwards, assistant forwards]
+    """
+
+    def __init__(self, *models):
+        self.models = [model for model in models if model is not None]
+        self.calls = [0] * len(models)
+        self._positions = [index for index, model in enumerate(models) if model is not None]
+        self._handles = []
+
+    def __enter__(self):
+        for position, model in zip(self._positions, self.models):
+            self._handles.append(model.register_forward_hook(self._hook(position)))
+        return self
+
+    def _hook(self, position):
+        def hook(module, inputs, output):
+            self.calls[position] += 1
+        return hook
+
+    def __exit__(self, *exc):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        return False
+
+
+def acceptance_stats(new_tokens: int, target_forwards: int, draft_forwards: int = None) -> dict:
+    """
+    Acceptance figures from token and forward counts
+
+    Every target forward emits one token of its own (the prefill's first token, or the
+    correction/bonus token after a verification), so the rest were accepted drafts.
+    A draft model spends one forward per drafted token, which gives the acceptance
+    rate; prompt lookup drafts without forwards, so only tokens per forward is known.
+
+    Returns:
+        Dictionary with tokens_per_forward, accepted and (with draft_forwards) acceptance
+    """
+    accepted = max(0, new_tokens - target_forwards)
+    stats = {
+        'tokens_per_forward': new_tokens / target_forwards if target_forwards else 0.0,
+        'accepted': accepted,
+    }
+    if draft_forwards:
+        stats['acceptance'] = min(1.0, accepted / draft_forwards)
+    return stats
+
+
+# Checkpoint path -> loaded draft model
+_draft_models = {}
+_draft_lock = threading.Lock()
+
+
+def get_draft_model(checkpoint_path: str = None):
+    """Draft model from DRAFT_MODEL (or checkpoint_path), loaded once per checkpoint; None when not configured"""
+    checkpoint_path = checkpoint_path or DRAFT_MODEL
+    if not checkpoint_path:
+        return None
+    checkpoint_path = os.path.abspath(checkpoint_path) if os.path.exists(checkpoint_path) else checkpoint_path
+    if checkpoint_path not in _draft_models:
+        with _draft_lock:
+            if checkpoint_path not in _draft_models:
+                from unsloth import FastLanguageModel
+                # 0.6B fits comfortably unquantized, and full precision drafts agree with the target more often
+                model, _ = FastLanguageModel.from_pretrained(
+                    model_name=checkpoint_path,
+                    max_seq_length=8192,
+                    load_in_4bit=False,
+                    load_in_8bit=False,
+                    full_finetuning=False,
+                )
+                FastLanguageModel.for_inference(model)
+                _draft_models[checkpoint_path] = model
+    return _draft_models[checkpoint_path]
+
+
+def speculative_kwargs() -> dict:
+    """Extra generate() arguments for the configured drafter ({} when none is configured)"""
+    draft_model = get_draft_model()
+    if draft_model is not None:
+        return {'assistant_model': draft_model}
+    if PROMPT_LOOKUP_TOKENS > 0:
+        return {'prompt_lookup_num_tokens': PROMPT_LOOKUP_TOKENS}
+    return {}
+
+
+def main():
+    """Greedy plain vs assisted decoding on the eval split: speedup, acceptance and output equality"""
+    import argparse
+    import sys
+    import time
+
+    import torch
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../src"))
+    from test_scripts.test_qwen import load_model
+    from train import split_data, build_input_text
+
+    parser = argparse.ArgumentParser(description='Measure speculative decoding on the eval split')
+    parser.add_argument('--checkpoint', default='../model/checkpoint-1400', help='Target model checkpoint')
+    parser.add_argument('--draft', default=DRAFT_MODEL, help='Draft model checkpoint (optional)')
+    parser.add_argument('--lookup-tokens', type=int, default=10, help='Prompt-lookup tokens per step (0 to skip)')
+    parser.add_argument('--data', default='../final_data', help='Folder with the training records')
+    parser.add_argument('--limit', type=int, default=8, help='Eval prompts to run')
+    parser.add_argument('--max-new-tokens', type=int, default=4096)
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.checkpoint)
+    modes = {'plain': {}}
+    if args.draft:
+        modes['draft_model'] = {'assistant_model': get_draft_model(args.draft)}
+    if args.lookup_tokens > 0:
+        modes['prompt_lookup'] = {'prompt_lookup_num_tokens': args.lookup_tokens}
+
+    _, eval_data = split_data(args.data)
+    totals = {mode: {'seconds': 0.0, 'tokens': 0, 'target': 0, 'draft': 0, 'matches': 0} for mode in modes}
+    for record in eval_data[:args.limit]:
+        prompt = tokenizer.apply_chat_template([{"role": "user", "content": build_input_text(record)}],
+                                               enable_thinking=False, add_generation_prompt=True, tokenize=False)
+        inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
+        reference = None
+        for mode, kwargs in modes.items():
+            with torch.no_grad(), ForwardCounter(model, kwargs.get('assistant_model')) as counter:
+                torch.cuda.synchronize()
+                start_time = time.perf_counter()
+                outputs = model.generate(**inputs, max_new_tokens=args.max_new_tokens, do_sample=False,
+                                         pad_token_id=tokenizer.eos_token_id, **kwargs)
+                torch.cuda.synchronize()
+                seconds = time.perf_counter() - start_time
+            completion = outputs[0, inputs["input_ids"].shape[1]:].tolist()
+            reference = completion if reference is None else reference
+            totals[mode]['seconds'] += seconds
+            totals[mode]['tokens'] += len(completion)
+            totals[mode]['target'] += counter.calls[0]
+            totals[mode]['draft'] += counter.calls[1]
+            totals[mode]['matches'] += completion == reference
+        print(f"  {record['input']['layout']}: " + ", ".join(
+            f"{mode} {totals[mode]['tokens']} tok" for mode in modes))
+
+    samples = min(args.limit, len(eval_data))
+    plain_speed = totals['plain']['tokens'] / totals['plain']['seconds']
+    print(f"\n{'mode':<15}{'tok/s':>9}{'speedup':>9}{'tok/fwd':>9}{'accept':>9}{'same as plain':>15}")
+    for mode, total in totals.items():
+        stats = acceptance_stats(total['tokens'], total['target'], total['draft'])
+        speed = total['tokens'] / total['seconds']
+        acceptance = f"{stats['acceptance']:.0%}" if 'acceptance' in stats else "-"
+        print(f"{mode:<15}{speed:>9.1f}{speed / plain_speed:>8.2f}x{stats['tokens_per_forward']:>9.2f}"
+              f"{acceptance:>9}{total['matches']:>10}/{samples}")
+
+
+if __name__ == "__main__":
+    main()
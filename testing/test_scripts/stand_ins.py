@@ -0,0 +1,348 @@
+"""
+Local stand-ins for the model and the external HTTP services.
+
+They let the spreadsheet drivers and the banner pipeline run end to end on a laptop:
+a threaded HTTP server serves the product image and font files, and the model and
+OpenAI enrichment calls are replaced by functions with configurable latency that
+replay real outputs from final_data. FakeWorksheet is an in-memory replacement for a
+gspread worksheet that counts API calls, and StandInBgRemoverServer mimics the
+background removal model endpoint.
+"""
+import base64
+import json
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import requests
+
+FINAL_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../final_data")
+
+
+def make_png(width: int, height: int, rgba=(200, 120, 80, 255)) -> bytes:
+    """Build a solid-color RGBA PNG without any imaging dependency"""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    row = b"\x00" + bytes(rgba) * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(row * height)) + chunk(b"IEND", b""))
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        if self.path.startswith("/images/"):
+            body, content_type = server.image_bytes, "image/png"
+        elif self.path.startswith("/fonts/"):
+            body, content_type = b"\x00\x01\x00\x00stand-in-font", "font/ttf"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInHTTPServer:
+    """Threaded local HTTP server serving product images and fonts"""
+
+    def __init__(self, latency: float = 0.05, image_size=(1214, 1439)):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        self.server.latency = latency
+        self.server.image_bytes = make_png(*image_size)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def image_url(self, name: str = "product") -> str:
+        return f"{self.base_url}/images/{name}.png"
+
+    def font_url(self, name: str = "font") -> str:
+        return f"{self.base_url}/fonts/{name}.ttf"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeWorksheet:
+    """
+    In-memory gspread worksheet.
+
+    Supports the calls used by the spreadsheet drivers and counts them in api_calls,
+    so batching can be checked without touching the Sheets API. Values written with
+    USER_ENTERED that start with '=' are stored as formulas and render as ''. The
+    batch_update calls numbered in failing_batch_updates (1-indexed) raise without
+    writing anything.
+    """
+
+    def __init__(self, rows=None):
+        self.cells = {}
+        self.formulas = {}
+        self.api_calls = {}
+        self.failing_batch_updates = set()
+        for r, row in enumerate(rows or [], 1):
+            for c, value in enumerate(row, 1):
+                self._set(r, c, value, raw=False)
+
+    def _count(self, name):
+        self.api_calls[name] = self.api_calls.get(name, 0) + 1
+
+    def _set(self, row, col, value, raw):
+        if not raw and isinstance(value, str) and value.startswith('='):
+            self.formulas[(row, col)] = value
+            self.cells[(row, col)] = ''
+        else:
+            self.formulas.pop((row, col), None)
+            self.cells[(row, col)] = '' if value is None else str(value)
+
+    def _grid(self, formulas=False):
+        if not self.cells:
+            return []
+        rows = max(r for r, _ in self.cells)
+        cols = max(c for _, c in self.cells)
+        source = {**self.cells, **self.formulas} if formulas else self.cells
+        return [[source.get((r, c), '') for c in range(1, cols + 1)] for r in range(1, rows + 1)]
+
+    def _write_range(self, range_name, values, raw):
+        import gspread
+        row, col = gspread.utils.a1_to_rowcol(range_name.split(':')[0])
+        for i, value_row in enumerate(values):
+            for j, value in enumerate(value_row):
+                self._set(row + i, col + j, value, raw)
+
+    def get_all_values(self, value_render_option=None, **kwargs):
+        self._count('get_all_values')
+        return self._grid(formulas=value_render_option == 'FORMULA')
+
+    def row_values(self, row, value_render_option=None, **kwargs):
+        self._count('row_values')
+        grid = self._grid(formulas=value_render_option == 'FORMULA')
+        values = grid[row - 1] if row <= len(grid) else []
+        while values and values[-1] == '':
+            values = values[:-1]
+        return values
+
+    def update(self, range_name, values, raw=True, **kwargs):
+        self._count('update')
+        if not isinstance(range_name, str):
+            range_name, values = values, range_name
+        self._write_range(range_name, values, raw)
+
+    def batch_update(self, data, raw=True, value_input_option=None, **kwargs):
+        self._count('batch_update')
+        if self.api_calls['batch_update'] in self.failing_batch_updates:
+            raise RuntimeError(f"batch_update {self.api_calls['batch_update']} failed")
+        if value_input_option is not None:
+            raw = value_input_option == 'RAW'
+        for update in data:
+            self._write_range(update['range'], update['values'], raw)
+
+
+def make_test_photo(width: int, height: int, seed: int = 0):
+    """Product photo for the background remover: a colored ellipse on a white backdrop"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    y, x = np.mgrid[0:height, 0:width]
+    inside = ((x - width / 2) / (width * 0.35)) ** 2 + ((y - height / 2) / (height * 0.4)) ** 2 <= 1
+    shade = rng.integers(0, 30, size=(height, width, 1))
+    image[inside] = (rng.integers(40, 200, size=3) + shade[inside]).clip(0, 255)
+    return Image.fromarray(image)
+
+
+class _BgRemoverHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        import numpy as np
+        from PIL import Image
+
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        instances = json.loads(body)['instances']
+        with server.lock:
+            server.requests += 1
+            server.instances += len(instances)
+            server.bytes_received += len(body)
+            server.batch_sizes.append(len(instances))
+        # Model time grows slowly with the batch: most of it is per call
+        time.sleep(server.latency + server.per_image_latency * len(instances))
+
+        # Like the real endpoint, one bad or oversized image fails the whole request
+        images = []
+        for instance in instances:
+            data = base64.b64decode(instance['image']['b64'])
+            if server.max_image_bytes and len(data) > server.max_image_bytes:
+                self.send_error(413, "Image too large")
+                return
+            try:
+                images.append(np.asarray(Image.open(BytesIO(data)).convert('RGB')))
+            except Exception:
+                self.send_error(400, "Cannot decode image")
+                return
+
+        predictions = []
+        for image in images:
+            mask = Image.fromarray(((image.min(axis=2) < 235) * 255).astype(np.uint8))
+            buffer = BytesIO()
+            mask.save(buffer, format='PNG')
+            predictions.append({'output_image': base64.b64encode(buffer.getvalue()).decode()})
+        response = predictions[0] if len(predictions) == 1 or not server.batching else {'predictions': predictions}
+
+        payload = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInBgRemoverServer:
+    """
+    Local background removal endpoint.
+
+    Accepts the model's {"instances": [...]} payload in any image format and answers
+    with a mask per instance ({"predictions": [...]}, or the bare single-instance
+    response when batching=False, like an endpoint that ignores extra instances).
+    A request with an undecodable image gets a 400, one with an image larger than
+    max_image_bytes a 413.
+    """
+
+    def __init__(self, latency: float = 0.2, per_image_latency: float = 0.01, batching: bool = True,
+                 max_image_bytes: int = None):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _BgRemoverHandler)
+        self.server.latency = latency
+        self.server.per_image_latency = per_image_latency
+        self.server.batching = batching
+        self.server.max_image_bytes = max_image_bytes
+        self.server.lock = threading.Lock()
+        self.reset()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1/models/bgremover:predict"
+
+    @property
+    def bytes_received(self) -> int:
+        return self.server.bytes_received
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    @property
+    def batch_sizes(self) -> list:
+        return self.server.batch_sizes
+
+    def reset(self):
+        self.server.requests = 0
+        self.server.instances = 0
+        self.server.bytes_received = 0
+        self.server.batch_sizes = []
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def load_sample_outputs(data_dir: str = FINAL_DATA_DIR, limit: int = 50) -> dict:
+    """Load real condensed outputs from final_data, grouped by layout"""
+    outputs = {}
+    files = sorted(f for f in os.listdir(data_dir) if f.endswith(".json"))[:limit]
+    for file in files:
+        with open(os.path.join(data_dir, file), "r") as f:
+            data = json.load(f)
+        outputs.setdefault(data["input"]["layout"], []).append(data["output"])
+    return outputs
+
+
+class StandInServices:
+    """
+    Stage functions for BannerPipeline backed by the local stand-ins.
+
+    enrich sleeps like the two OpenAI calls, generate holds a lock like a single GPU
+    and replays a final_data output, post_process fetches the product image over HTTP
+    and expands the condensed JSON, and write records the results in memory.
+    """
+
+    def __init__(self, enrich_latency: float = 0.5, generate_latency: float = 0.3,
+                 http_latency: float = 0.05, seed: int = 0):
+        self.enrich_latency = enrich_latency
+        self.generate_latency = generate_latency
+        self.http = StandInHTTPServer(latency=http_latency)
+        self.samples = load_sample_outputs()
+        self.random = random.Random(seed)
+        self.gpu_lock = threading.Lock()
+        self.written = []
+
+    def __enter__(self):
+        self.http.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.http.stop()
+
+    def make_jobs(self, products: int, layouts: int) -> list:
+        layout_names = sorted(self.samples)[:layouts]
+        return [{
+            'row': row,
+            'layout': layout,
+            'product_name': f"Stand-in product {row}",
+            'product_description': "Durable, stylish and made to last",
+            'product_price': "$19.99",
+            'product_image': self.http.image_url(f"product_{row}"),
+        } for row in range(2, products + 2) for layout in layout_names]
+
+    def enrich(self, job: dict):
+        time.sleep(self.enrich_latency)
+        return "Warm camel brown (#A36E51) with gold accents (#D4AF37).", ["Ultra-Regular", "League Spartan-Bold"]
+
+    def generate(self, job: dict, enrichment):
+        with self.gpu_lock:
+            time.sleep(self.generate_latency)
+            samples = self.samples.get(job['layout']) or next(iter(self.samples.values()))
+            return json.loads(json.dumps(self.random.choice(samples)))
+
+    def post_process(self, job: dict, condensed_json: dict):
+        response = requests.get(job['product_image'], timeout=10)
+        response.raise_for_status()
+        for layer in condensed_json['objects']:
+            if layer['type'] == 'image':
+                layer['src'] = job['product_image']
+            if layer['type'] == 'text':
+                layer['fontURL'] = self.http.font_url(layer['fontFamily'].replace(' ', '_'))
+        return condensed_json
+
+    def write(self, results: list):
+        for job, fabric_json in results:
+            self.written.append((job['row'], job['layout'], fabric_json))
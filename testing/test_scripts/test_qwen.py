@@ -1,8 +1,14 @@
 import json
-from unsloth import FastLanguageModel
+try:
+    from unsloth import FastLanguageModel
+except (ImportError, NotImplementedError):
+    # No GPU: the prompt, parsing and post-processing helpers still work (the server's CPU mode), load_model does not
+    FastLanguageModel = None
 from transformers import TextStreamer
 import torch
 import time
+import gc
+import threading
 from PIL import Image
 import os
 import requests
@@ -12,21 +18,78 @@ from banner_utils.add_color_pallete import get_color_pallete
 from banner_utils.give_font_family import get_font_families
 from banner_utils.create_condensed_data import get_original_data
 from banner_utils.render_banner import fix_font_size
-from banner_utils.fix_cta import fix_cta
-from banner_utils.get_best_result import get_best_result
-
-def load_model(checkpoint_path):
-    """Load the fine-tuned model from checkpoint"""
-    model, tokenizer = FastLanguageModel.from_pretrained(
-        model_name=checkpoint_path,
-        max_seq_length=8192,
-        load_in_4bit=True,
-        load_in_8bit=False,
-        full_finetuning=False,
-    )
-    FastLanguageModel.for_inference(model)
+from banner_utils.layout_normalizer import normalize_layout
+from banner_utils.get_best_result import get_best_result, extract_json_from_response, extract_first_valid_json
+from banner_utils.layout_checker import rank_layouts
+from banner_utils.output_codec import OUTPUT_CODEC, format_instructions
+from banner_utils.assets import get_layouts
+from banner_utils.tracing import span, TokenTimer
+from test_scripts.speculative import ForwardCounter, acceptance_stats, speculative_kwargs
+from test_scripts.model_snapshot import MODEL_SNAPSHOT_DIR, resolve_model_path
+
+class TimedTextStreamer(TextStreamer):
+    """TextStreamer that also feeds a TokenTimer, for time to first token and tokens/sec"""
+
+    def __init__(self, tokenizer, token_timer, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self.token_timer = token_timer
+
+    def put(self, value):
+        self.token_timer.put(value)
+        super().put(value)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_model(checkpoint_path, snapshot_dir=None):
+    """
+    Load the fine-tuned model from checkpoint, once per process
+
+    Repeated calls with the same checkpoint and snapshot folder (by real path) return
+    the same model and tokenizer until clear_model_cache() is called. With snapshot_dir
+    (or MODEL_SNAPSHOT_DIR) set, the checkpoint is loaded from its merged 4-bit snapshot
+    under that folder (see model_snapshot.py), which is built on first use.
+    """
+    snapshot_root = snapshot_dir or MODEL_SNAPSHOT_DIR
+    key = (os.path.realpath(checkpoint_path), os.path.realpath(snapshot_root) if snapshot_root else None)
+    if key not in _models:
+        with _models_lock:
+            if key not in _models:
+                _models[key] = _load_model(checkpoint_path, snapshot_dir)
+    return _models[key]
+
+
+def _load_model(checkpoint_path, snapshot_dir=None):
+    if FastLanguageModel is None:
+        raise RuntimeError("unsloth is not available (it needs an NVIDIA GPU)")
+    with span("load_model", checkpoint=checkpoint_path):
+        model_path = resolve_model_path(checkpoint_path, snapshot_dir)
+        model, tokenizer = FastLanguageModel.from_pretrained(
+            model_name=model_path,
+            max_seq_length=8192,
+            load_in_4bit=True,
+            load_in_8bit=False,
+            full_finetuning=False,
+        )
+        FastLanguageModel.for_inference(model)
     return model, tokenizer
 
+
+def clear_model_cache():
+    """
+    Drop the models load_model() has cached and free their GPU memory
+
+    Callers must also drop their own references (e.g. del the UpdateFabricJson that
+    holds the model) before the memory is actually released.
+    """
+    with _models_lock:
+        _models.clear()
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
 def prepare_input(product_name, product_description, product_price, layout, layout_template, product_color="", fontFamilyList=[]):
     """Prepare input text for the model based on training format"""
     
@@ -79,15 +142,21 @@ def prepare_input(product_name, product_description, product_price, layout, layo
         </json>
         """
     input_text = f"I want you to create a beautiful advertisement banner of dimension 1080*1080, following the best practices, in form of condensed FabricJs json(with less keys), for the given product with the following details:\n\n\n##Product Details:\n\n **Product Name:** {product_name}\n **Product Description:** {product_description}\n **Product Price:** {product_price}\n\n **Product Color:** {product_color}\n\n\n.The banner should follow the {layout} layout\n ###Layout Description:\n\n {layout_description}.\n\n\n##Instructions:\n\n 1. Create a banner in condensed fabric js format, which have following important keys for given layer type: \n{json.dumps(important_fields)}.\n2. Focus on placement of layers to give a beautiful banner in given layout, with proper spacing between each layer.  \n    2.1 Carefully use *top*(y coordinate of top-left of the layer), *left*(x coordinate of top-left of the layer), *width*(width of the layer), *height*(height of the layer) keys to adjust placement. \n    2.2 Make sure no two text layers overlap each other and entire banner is visible in 1080*1080 canvas.  \n 3.You must strictly choose fontFamily for the text layers from the following list: {json.dumps(fontFamilyList)}.\n\n\n Have following output format:\n{output_format}\n\n .Think step by step and then create the banner."
-    
+    if OUTPUT_CODEC == "compact":
+        input_text += "\n\n" + format_instructions()
 
-    with open("input_test_text.txt", "w") as f:
-        f.write(input_text)
-    
     return input_text
 
-def generate_banner(model, tokenizer, input_text, temperature=0.7, top_p=0.9, top_k=20):
-    """Generate FabricJS banner JSON from input text"""
+def generate_banner(model, tokenizer, input_text, temperature=0.7, top_p=0.9, top_k=20, assistant_kwargs=None):
+    """
+    Generate FabricJS banner JSON from input text
+
+    assistant_kwargs are extra generate() arguments for assisted decoding (an
+    assistant_model or prompt_lookup_num_tokens); by default they come from the
+    DRAFT_MODEL / PROMPT_LOOKUP_TOKENS environment, see speculative.py.
+    """
+    if assistant_kwargs is None:
+        assistant_kwargs = speculative_kwargs()
     # Create conversation format
     conversation = [{"role": "user", "content": input_text}]
     
@@ -98,124 +167,247 @@ def generate_banner(model, tokenizer, input_text, temperature=0.7, top_p=0.9, to
         add_generation_prompt=True,
         tokenize=False
     )
-    text_streamer = TextStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    token_timer = TokenTimer()
+    text_streamer = TimedTextStreamer(tokenizer, token_timer, skip_prompt=True, skip_special_tokens=True)
     time_start = time.time()
     # Generate response
-    with torch.no_grad():
+    with torch.no_grad(), span("generate") as generate_span:
+        inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
+        token_timer.start()
+        with ForwardCounter(model, assistant_kwargs.get('assistant_model')) as forward_counter:
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=8192,
+                streamer=text_streamer,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                do_sample=True,
+                pad_token_id=tokenizer.eos_token_id,
+                **assistant_kwargs,
+            )
+        token_timer.record_spans()
+        generate_span.set(prompt_tokens=inputs["input_ids"].shape[1], **token_timer.stats())
+        if assistant_kwargs:
+            new_tokens = outputs.shape[1] - inputs["input_ids"].shape[1]
+            stats = acceptance_stats(new_tokens, *forward_counter.calls)
+            generate_span.set(**stats)
+            print(f"Assisted decoding: {stats['tokens_per_forward']:.2f} tokens per forward"
+                  + (f", {stats['acceptance']:.0%} of drafted tokens accepted" if 'acceptance' in stats else ""))
+        print(f"Time taken to generate response: {time.time() - time_start} seconds")        
+        # Decode the response
+        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        
+        # Extract just the generated part (remove the input prompt)
+        generated_text = response[len(prompt):].strip()
+        
+    return generated_text
+
+def generate_candidates(model, tokenizer, input_text, num_return_sequences=4, temperature=0.7, top_p=0.9, top_k=20):
+    """
+    Sample several responses in one generate() call; the prompt is prefilled once and
+    its KV cache expanded to num_return_sequences rows
+
+    Returns:
+        list: The generated texts, one per candidate
+    """
+    conversation = [{"role": "user", "content": input_text}]
+    prompt = tokenizer.apply_chat_template(
+        conversation,
+        enable_thinking=False,
+        add_generation_prompt=True,
+        tokenize=False
+    )
+    time_start = time.time()
+    # TextStreamer only handles a batch of one, so candidates are not streamed
+    with torch.no_grad(), span("generate", candidates=num_return_sequences) as generate_span:
         inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
         outputs = model.generate(
             **inputs,
             max_new_tokens=8192,
-            streamer=text_streamer,
             temperature=temperature,
             top_p=top_p,
             top_k=top_k,
             do_sample=True,
+            num_return_sequences=num_return_sequences,
             pad_token_id=tokenizer.eos_token_id,
         )
-        print(f"Time taken to generate response: {time.time() - time_start} seconds")        
-        # Decode the response
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Extract just the generated part (remove the input prompt)
-        generated_text = response[len(prompt):].strip()
-        
-    return generated_text
+        completions = outputs[:, inputs["input_ids"].shape[1]:]
+        new_tokens = int((completions != tokenizer.eos_token_id).sum())
+        generate_span.set(prompt_tokens=inputs["input_ids"].shape[1], tokens=new_tokens)
+        print(f"Time taken to generate {num_return_sequences} candidates: {time.time() - time_start} seconds")
+        generated_texts = [text.strip() for text in tokenizer.batch_decode(completions, skip_special_tokens=True)]
+
+    return generated_texts
 
-def extract_json_from_response(response):
-    """Extract JSON from the model response"""
+
+def parse_candidate(response):
+    """Parse a candidate locally: tagged JSON first, then the first complete banner object (no GPT)"""
     try:
-        # Look for JSON within <json> tags
-        if "<json>" in response and "</json>" in response:
-            start = response.find("<json>") + 6
-            end = response.find("</json>")
-            json_str = response[start:end].strip()
-            return json.loads(json_str)
-        else:
-            # Try to find JSON in the response
-            start = response.find("{")
-            end = response.rfind("}") + 1
-            if start != -1 and end != 0:
-                json_str = response[start:end]
-                return json.loads(json_str)
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
-        return None
-    
-    return None
+        banner = extract_json_from_response(response)
+    except Exception:
+        banner = None
+    if not isinstance(banner, dict) or not isinstance(banner.get("objects"), list):
+        banner = extract_first_valid_json(response)
+    return banner
 
-def test_model(product_name, product_description, product_price, layout, image_url, model=None, tokenizer=None):
-    # Load layout template (from training script)
-    layout_file = "../assets/layout.json"
-    checkpoint_path = "../model/checkpoint-1400"
-    
+
+def pick_best_candidate(responses):
+    """
+    Parse every candidate and keep the one with the best layout_checker score
+
+    Returns:
+        tuple: (banner, index, score); banner is None when no candidate parses
+    """
+    with span("rank_candidates", candidates=len(responses)) as rank_span:
+        banners = [parse_candidate(response) for response in responses]
+        ranking = rank_layouts(banners)
+        best_score, best_index = ranking[0]
+        rank_span.set(best=best_index, score=best_score, valid=sum(score >= 0 for score, _ in ranking))
+    print(f"Candidate scores: {', '.join(f'#{index}={score:.2f}' for score, index in sorted(ranking, key=lambda item: item[1]))}")
+    if best_score < 0:
+        return None, best_index, best_score
+    return banners[best_index], best_index, best_score
+
+
+def load_layout_template(layout_file=None):
+    """Load the layout descriptions used in the prompt (memoized unless a file is given)"""
     try:
+        if layout_file is None:
+            return get_layouts()
         with open(layout_file, "r") as f:
-            layout_template = json.load(f)
+            return json.load(f)
     except FileNotFoundError:
         print("Layout template not found, using default")
-        layout_template = {"frame_layout": ["frame layout with decorative elements"]}
-    
-    
-    # Generate color palette description from image
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    
+        return {"frame_layout": ["frame layout with decorative elements"]}
+
+
+def enrich_product(image_url, product_name, product_description):
+    """
+    Run the two OpenAI enrichment calls (color palette and font families) concurrently.
+
+    Returns:
+        tuple: (product_color, fontFamilyList)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
     print("Generating color palette and font family list from image...")
-    
-    with ThreadPoolExecutor(max_workers=2) as executor:
+
+    with span("enrich"), ThreadPoolExecutor(max_workers=2) as executor:
         # Submit both tasks
         color_future = executor.submit(get_color_pallete, image_url)
         font_future = executor.submit(get_font_families, image_url, product_name, product_description)
-        
+
         # Wait for both to complete
         product_color = color_future.result()
         fontFamilyList = font_future.result()
-    
+
     print(f"Generated color palette: {product_color[:100] if product_color else 'None'}...")
     print(f"Generated font family list: {fontFamilyList}")
-    
-    # Load the model - using the latest checkpoint
-    print(f"Loading model from {checkpoint_path}...")
-    if model is None or tokenizer is None:
-        model, tokenizer = load_model(checkpoint_path)
-    
-    
+    return product_color, fontFamilyList
+
+
+def generate_condensed_json(model, tokenizer, product_name, product_description, product_price, layout, layout_template, product_color, fontFamilyList, num_candidates=1):
+    """
+    Build the prompt, run the model and extract the condensed FabricJS JSON.
+
+    With num_candidates > 1 the candidates are sampled in one batched call and the
+    best-scoring one (banner_utils.layout_checker) is kept; get_best_result is only
+    used when none of them parses.
+
+    Returns:
+        tuple: (condensed_json, recovered) where recovered is True when the JSON had to be
+        recovered with get_best_result and must not be post-processed.
+    """
     # Prepare input
-    input_text = prepare_input(product_name, product_description, product_price, layout, layout_template, product_color, fontFamilyList)
+    with span("prompt_build"):
+        input_text = prepare_input(product_name, product_description, product_price, layout, layout_template, product_color, fontFamilyList)
     print("Input prepared:")
     print("-" * 50)
     print(input_text[:500] + "..." if len(input_text) > 500 else input_text)
     print("-" * 50)
-    
+
+    if num_candidates > 1:
+        print(f"Generating {num_candidates} candidate banners...")
+        responses = generate_candidates(model, tokenizer, input_text, num_return_sequences=num_candidates)
+        banner, index, score = pick_best_candidate(responses)
+        if banner is not None:
+            print(f"Using candidate #{index} (score {score:.2f})")
+            return banner, False
+        print("No candidate could be parsed, recovering the first one")
+        with span("extract_json", recovered=True):
+            return get_best_result(responses[0]), True
+
     # Generate banner
     print("Generating banner...")
     generate_time = time.time()
     generated_response = generate_banner(model, tokenizer, input_text)
     print(f"Time taken to generate banner: {time.time() - generate_time} seconds")
-    
+
     print("\nGenerated Response:")
     print("=" * 50)
     print(generated_response)
     print("=" * 50)
-    
-    # Extract and save JSON
-    try:
-        generated_json = extract_json_from_response(generated_response)
-    except Exception as e:
-        print(f"Error extracting JSON: {e}")
-        generated_json = get_best_result(generated_response)
-        return generated_json
+
+    # Extract JSON
+    with span("extract_json") as extract_span:
+        try:
+            return extract_json_from_response(generated_response), False
+        except Exception as e:
+            print(f"Error extracting JSON: {e}")
+            extract_span.set(recovered=True)
+            return get_best_result(generated_response), True
+
+
+def post_process(generated_json, image_url):
+    """Expand the condensed JSON, fix font sizes, then normalize the layout (CTAs, alignment, overlaps)"""
     try:
-        generated_json = get_original_data(generated_json, image_url)
-        generated_json = fix_font_size(generated_json)
-        generated_json = fix_cta(generated_json)
+        with span("get_original_data"):
+            generated_json = get_original_data(generated_json, image_url)
+        with span("fix_font_size"):
+            generated_json = fix_font_size(generated_json)
+        with span("normalize_layout"):
+            generated_json = normalize_layout(generated_json)
     except Exception as e:
         print(f"Error post processing: {e}")
         return generated_json
-    
+
     return generated_json
 
 
+def test_model(product_name, product_description, product_price, layout, image_url, model=None, tokenizer=None, num_candidates=1):
+    """
+    Generate one banner end to end; with BANNER_TRACE=1 every stage is recorded as a span.
+    num_candidates > 1 samples that many banners in one batch and post-processes only the best.
+    """
+    with span("test_model", layout=layout):
+        return _test_model(product_name, product_description, product_price, layout, image_url, model, tokenizer, num_candidates)
+
+
+def _test_model(product_name, product_description, product_price, layout, image_url, model=None, tokenizer=None, num_candidates=1):
+    # Load layout template (from training script)
+    checkpoint_path = "../model/checkpoint-1400"
+    layout_template = load_layout_template()
+
+    # Generate color palette description from image
+    product_color, fontFamilyList = enrich_product(image_url, product_name, product_description)
+
+    # Load the model - using the latest checkpoint
+    print(f"Loading model from {checkpoint_path}...")
+    if model is None or tokenizer is None:
+        model, tokenizer = load_model(checkpoint_path)
+
+    generated_json, recovered = generate_condensed_json(
+        model, tokenizer, product_name, product_description, product_price,
+        layout, layout_template, product_color, fontFamilyList, num_candidates
+    )
+    if recovered:
+        return generated_json
+
+    with span("post_process"):
+        return post_process(generated_json, image_url)
+
+
 
 # if __name__ == "__main__":
 #     product_name = "Aldo Legoirii Bag"
@@ -0,0 +1,122 @@
+"""
+Check of banner_utils/bg_remover.py against the local mock endpoint.
+
+    batching     concurrent callers are coalesced into multi-instance requests and
+                 every caller gets a mask of its own image's size
+    sequential   a lone caller is sent at once, one image per request, without
+                 waiting for a batch to fill
+    isolation    an oversized image that makes its batch fail with a 413 only fails
+                 its own Future; the other images in that batch still get masks
+    fallback     an endpoint that answers a batch with a single result switches the
+                 client to one image per request, and no image is lost
+
+Exits with status 1 when any check fails.
+
+Run from the testing/ directory:
+    python test_scripts/verify_bg_remover.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+os.environ.setdefault('RATE_LIMIT_BG_REMOVER', '1000')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from banner_utils.bg_remover import BackgroundRemoverClient
+from test_scripts.stand_ins import StandInBgRemoverServer, make_test_photo
+
+
+def check_batching():
+    images = [make_test_photo(320 + i, 240, seed=i) for i in range(24)]
+    with StandInBgRemoverServer(latency=0.2) as server:
+        client = BackgroundRemoverClient(server.url, max_batch_size=8, max_in_flight=2)
+        with ThreadPoolExecutor(12) as callers:
+            masks = list(callers.map(client.get_mask, images))
+        client.close()
+    assert [mask.size for mask in masks] == [image.size for image in images]
+    assert all(np.asarray(mask).max() > 0 for mask in masks), "a mask came back empty"
+    assert client.instances_sent == len(images), client.instances_sent
+    assert client.requests_sent < len(images), f"{client.requests_sent} requests for {len(images)} images"
+    assert max(server.batch_sizes) > 1, server.batch_sizes
+
+
+def check_sequential():
+    latency = 0.1
+    images = [make_test_photo(200, 200, seed=i) for i in range(5)]
+    with StandInBgRemoverServer(latency=latency, per_image_latency=0) as server:
+        client = BackgroundRemoverClient(server.url)
+        client.get_mask(images[0])  # warm up the connection
+        start_time = time.perf_counter()
+        for image in images:
+            client.get_mask(image)
+        per_call = (time.perf_counter() - start_time) / len(images)
+        client.close()
+    assert server.batch_sizes == [1] * (len(images) + 1), server.batch_sizes
+    assert per_call < latency + 0.04, f"{per_call * 1000:.0f} ms per call for a {latency * 1000:.0f} ms endpoint"
+
+
+def check_isolation():
+    rng = np.random.default_rng(0)
+    oversized = Image.fromarray(rng.integers(0, 256, size=(1200, 1200, 3), dtype=np.uint8))
+    images = [make_test_photo(160, 160, seed=i) for i in range(7)]
+    images.insert(4, oversized)
+    with StandInBgRemoverServer(latency=0.2, max_image_bytes=200_000) as server:
+        # One slot: the first image goes alone and the rest queue up into one batch behind it
+        client = BackgroundRemoverClient(server.url, max_batch_size=8, max_in_flight=1)
+        futures = [client.submit(image) for image in images]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result(timeout=30))
+            except Exception as e:
+                outcomes.append(e)
+        client.close()
+    failed = [index for index, outcome in enumerate(outcomes) if isinstance(outcome, Exception)]
+    assert failed == [4], f"failed images {failed}: {[outcomes[i] for i in failed]}"
+    assert "413" in str(outcomes[4]), outcomes[4]
+    assert max(server.batch_sizes) > 1, f"the oversized image was never batched: {server.batch_sizes}"
+    assert client.max_batch_size == 8, "a failed batch must not disable batching"
+    for index, outcome in enumerate(outcomes):
+        if index != 4:
+            assert outcome.size == images[index].size
+
+
+def check_fallback():
+    images = [make_test_photo(240, 200, seed=i) for i in range(10)]
+    with StandInBgRemoverServer(latency=0.1, batching=False) as server:
+        client = BackgroundRemoverClient(server.url, max_batch_size=8, max_in_flight=1)
+        with ThreadPoolExecutor(10) as callers:
+            masks = list(callers.map(client.get_mask, images))
+        client.close()
+    assert [mask.size for mask in masks] == [image.size for image in images]
+    assert client.max_batch_size == 1
+
+
+CHECKS = {
+    'batching': check_batching,
+    'sequential': check_sequential,
+    'isolation': check_isolation,
+    'fallback': check_fallback,
+}
+
+
+def main():
+    failures = 0
+    for name, check in CHECKS.items():
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {name}: {e}")
+    if failures:
+        print(f"❌ {failures} of {len(CHECKS)} background remover checks failed")
+        sys.exit(1)
+    print(f"All {len(CHECKS)} background remover checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+CPU check of server/banner_server.py with a tiny model.
+
+Starts the server in-process on a randomly initialized two-layer Qwen3 (the
+tokenizer is the only download), sends concurrent streaming and non-streaming
+requests over TCP plus one over a Unix socket, and checks that:
+
+    - every request gets a response with the generated text and timings
+    - the streamed token events add up to the final text
+    - concurrent requests were batched (some generate() call had more than one prompt)
+    - /metrics counts every request
+    - stop() finishes prompts still queued (and any submitted later) with an error
+
+The random model does not write banners, so responses come back with
+"no banner json in the response"; the check is about the serving path.
+
+Run from the testing/ directory:
+    python test_scripts/verify_server.py
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+from typing import List
+
+import torch
+from transformers import AutoTokenizer, Qwen3Config, Qwen3ForCausalLM
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from server.banner_server import BannerServer, make_http_server
+
+REQUEST = {
+    "product_name": "Aldo Legoirii Bag",
+    "product_description": "Spacious Stylish Design\nPremium Faux Leather Material",
+    "product_price": "$65.00",
+    "layout": "split_vertical",
+    "image_url": "",
+    "product_color": "Deep Burgundy: #7D2233",
+    "font_list": ["Montserrat Regular", "Playfair Display Regular"],
+    "post_process": False,
+}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def tiny_model(tokenizer) -> Qwen3ForCausalLM:
+    torch.manual_seed(0)
+    end_token = tokenizer.convert_tokens_to_ids("<|im_end|>")
+    config = Qwen3Config(vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+                         num_attention_heads=4, num_key_value_heads=2, head_dim=16, max_position_embeddings=4096,
+                         eos_token_id=end_token, pad_token_id=tokenizer.pad_token_id or end_token)
+    return Qwen3ForCausalLM(config).eval()
+
+
+def post(connection: http.client.HTTPConnection, body: dict):
+    """POST /generate; returns (status, events) where a plain response is a single event"""
+    connection.request("POST", "/generate", body=json.dumps(body), headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    data = response.read().decode()
+    connection.close()
+    if body.get("stream"):
+        return response.status, [json.loads(line) for line in data.splitlines() if line]
+    return response.status, [json.loads(data)]
+
+
+def check_stop(tokenizer) -> List[str]:
+    """Prompts queued when the server stops, or submitted after, finish with "server stopping" instead of hanging"""
+    banner_server = BannerServer(tiny_model(tokenizer), tokenizer, max_new_tokens=24)
+    queued = [banner_server.submit(banner_server.chat_prompt("queued")) for _ in range(3)]
+    banner_server.stop()
+    late = banner_server.submit(banner_server.chat_prompt("late"))
+    failures = []
+    for index, request in enumerate(queued + [late]):
+        if not request.done.wait(timeout=5) or request.error != "server stopping" or request.chunks.get_nowait() is not None:
+            failures.append(f"stop: request {index} not finished with 'server stopping' (error {request.error!r})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the banner server on the CPU with a tiny model')
+    parser.add_argument('--tokenizer', default='Qwen/Qwen3-0.6B')
+    parser.add_argument('--requests', type=int, default=6)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    banner_server = BannerServer(tiny_model(tokenizer), tokenizer, max_batch_size=4, max_wait_ms=200,
+                                 max_new_tokens=24).start()
+    http_server = make_http_server(banner_server, port=0)
+    socket_path = os.path.join(tempfile.mkdtemp(), "banner.sock")
+    unix_server = make_http_server(banner_server, unix_socket=socket_path)
+    for server in (http_server, unix_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = http_server.server_address
+
+    results = [None] * args.requests
+
+    def send(index):
+        results[index] = post(http.client.HTTPConnection(host, port, timeout=300), dict(REQUEST, stream=index % 2 == 0))
+
+    threads = [threading.Thread(target=send, args=(index,)) for index in range(args.requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    unix_result = post(UnixHTTPConnection(socket_path), REQUEST)
+
+    failures = []
+    for index, (status, events) in enumerate(results + [unix_result]):
+        final = events[-1]
+        if status not in (200, 422) or 'text' not in final or final['text'] is None or 'timings' not in final:
+            failures.append(f"request {index}: status {status}, {final}")
+            continue
+        if len(events) > 1:
+            streamed = "".join(event['text'] for event in events if event['event'] == 'token')
+            if events[0]['event'] != 'queued' or final['event'] != 'done' or streamed.strip() != final['text']:
+                failures.append(f"request {index}: streamed text differs from the final text")
+
+    connection = http.client.HTTPConnection(host, port)
+    connection.request("GET", "/metrics")
+    metrics = json.loads(connection.getresponse().read())
+    print(json.dumps(metrics, indent=2))
+    if metrics['counters'].get('requests') != args.requests + 1:
+        failures.append(f"metrics counted {metrics['counters'].get('requests')} requests, sent {args.requests + 1}")
+    if metrics['series']['batch_size']['max'] < 2:
+        failures.append("no two concurrent requests were batched")
+
+    http_server.shutdown()
+    unix_server.shutdown()
+    banner_server.stop()
+    failures += check_stop(tokenizer)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"All {args.requests + 1} requests served, "
+          f"largest batch {metrics['series']['batch_size']['max']:.0f}, queue wait p50 "
+          f"{metrics['series']['queue_wait_ms']['p50']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Check of spreadsheet/sheet_buffer.py against the in-memory FakeWorksheet.
+
+    snapshot     SheetSnapshot lookups (rows, formulas, headers, past the end)
+    coalesce     one batch_update per value input option, last write to a cell wins,
+                 chunks of max_batch_size cells
+    size         the buffer flushes by itself once max_batch_size cells are pending
+    interval     the timer flushes an idle buffer after flush_interval seconds
+    close        close() and leaving a with block (also on an exception) flush
+    failure      cells of a failed batch_update go back into the buffer without
+                 overwriting newer values, flush() raises, timed flushes retry
+
+Exits with status 1 when any check fails.
+
+Run from the testing/ directory:
+    python test_scripts/verify_sheet_buffer.py
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from spreadsheet.sheet_buffer import SheetSnapshot, SheetWriteBuffer
+from test_scripts.stand_ins import FakeWorksheet
+
+ROWS = [
+    ["Product Name", "Product Image", "centered_hero"],
+    ["Aldo Bag", '=IMAGE("https://example.com/bag.png")', ""],
+    ["Lamp", "", "{}"],
+]
+
+
+def check_snapshot():
+    worksheet = FakeWorksheet(ROWS)
+    snapshot = SheetSnapshot(worksheet, with_formulas=True)
+    assert worksheet.api_calls == {'get_all_values': 2}, worksheet.api_calls
+    assert snapshot.headers == ROWS[0]
+    assert snapshot.row(2) == ["Aldo Bag", "", ""]
+    assert snapshot.formula_row(2)[1] == '=IMAGE("https://example.com/bag.png")'
+    assert snapshot.row(3)[2] == "{}"
+    assert snapshot.row(4) == [] and snapshot.row(0) == [] and snapshot.formula_row(9) == []
+    assert snapshot.find_column("image") == 2 and snapshot.find_column("centered") == 3
+    assert snapshot.find_column("missing") is None
+    assert SheetSnapshot(worksheet).formula_row(2) == []
+
+
+def check_coalesce():
+    worksheet = FakeWorksheet(ROWS)
+    buffer = SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=60)
+    buffer.add(2, 3, "first")
+    buffer.add(2, 3, "second")
+    buffer.add(3, 3, "lamp")
+    buffer.add(3, 2, '=IMAGE("https://example.com/lamp.png")', raw=False)
+    assert len(buffer) == 3
+    assert 'batch_update' not in worksheet.api_calls
+    buffer.flush()
+    assert worksheet.api_calls['batch_update'] == 2, worksheet.api_calls
+    assert buffer.requests_sent == 2 and buffer.cells_written == 3
+    assert worksheet.cells[(2, 3)] == "second"
+    assert worksheet.formulas[(3, 2)] == '=IMAGE("https://example.com/lamp.png")'
+    assert len(buffer) == 0
+
+    buffer.flush()
+    assert buffer.requests_sent == 2, "an empty flush must not send requests"
+
+    chunked = SheetWriteBuffer(FakeWorksheet(ROWS), max_batch_size=4, flush_interval=60)
+    with chunked._lock:
+        for row in range(10):
+            chunked._pending['RAW'][f"A{row + 10}"] = [[row]]
+    chunked.flush()
+    assert chunked.requests_sent == 3 and chunked.cells_written == 10
+
+
+def check_size():
+    worksheet = FakeWorksheet(ROWS)
+    buffer = SheetWriteBuffer(worksheet, max_batch_size=3, flush_interval=60)
+    buffer.add(5, 1, "a")
+    buffer.add(5, 2, "b")
+    assert 'batch_update' not in worksheet.api_calls
+    buffer.add(5, 3, "c")
+    assert worksheet.api_calls['batch_update'] == 1
+    assert [worksheet.cells[(5, col)] for col in (1, 2, 3)] == ["a", "b", "c"]
+    assert len(buffer) == 0
+
+
+def check_interval():
+    worksheet = FakeWorksheet(ROWS)
+    buffer = SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=0.2)
+    buffer.add(6, 1, "idle")
+    assert 'batch_update' not in worksheet.api_calls
+    deadline = time.monotonic() + 5
+    while 'batch_update' not in worksheet.api_calls and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert worksheet.cells.get((6, 1)) == "idle", "the timer did not flush the idle buffer"
+    assert len(buffer) == 0 and buffer._timer is None
+
+    # An explicit flush cancels the pending timer
+    buffer.add(6, 2, "explicit")
+    buffer.flush()
+    time.sleep(0.4)
+    assert buffer.requests_sent == 2, buffer.requests_sent
+
+
+def check_close():
+    worksheet = FakeWorksheet(ROWS)
+    buffer = SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=60)
+    buffer.add(7, 1, "closed")
+    buffer.close()
+    assert worksheet.cells.get((7, 1)) == "closed"
+    assert buffer._timer is None
+
+    with SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=60) as buffer:
+        buffer.add(7, 2, "exited")
+    assert worksheet.cells.get((7, 2)) == "exited"
+
+    try:
+        with SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=60) as buffer:
+            buffer.add(7, 3, "crashed")
+            raise RuntimeError("stage failed")
+    except RuntimeError:
+        pass
+    assert worksheet.cells.get((7, 3)) == "crashed", "updates queued before an exception were lost"
+
+
+class RacingWorksheet(FakeWorksheet):
+    """Worksheet whose failing batch_update lets a newer value for A2 be queued first"""
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.buffer = None
+
+    def batch_update(self, data, **kwargs):
+        if self.api_calls.get('batch_update', 0) + 1 in self.failing_batch_updates:
+            self.buffer.add(2, 1, "newer")
+        return super().batch_update(data, **kwargs)
+
+
+def check_failure():
+    worksheet = RacingWorksheet(ROWS)
+    buffer = SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=60)
+    worksheet.buffer = buffer
+    for row in (2, 4, 5, 6):
+        buffer.add(row, 1, f"row {row}")
+    buffer.add(3, 1, "=1+1", raw=False)
+    assert len(buffer) == 5
+    buffer.max_batch_size = 2
+    worksheet.failing_batch_updates = {2}
+    try:
+        buffer.flush()
+        assert False, "flush() did not raise"
+    except RuntimeError:
+        pass
+    # The first RAW chunk (A2, A4) was written; A5, A6 and the formula in A3 are back,
+    # and A2 keeps the value queued while the flush was running
+    assert worksheet.cells[(2, 1)] == "row 2" and worksheet.cells[(4, 1)] == "row 4"
+    assert len(buffer) == 4 and buffer.failed_flushes == 1, (len(buffer), buffer.failed_flushes)
+    assert buffer._pending['RAW']['A2'] == [["newer"]] and buffer._pending['USER_ENTERED'] == {'A3': [["=1+1"]]}
+    buffer.flush()
+    assert worksheet.cells[(2, 1)] == "newer"
+    assert [worksheet.cells[(row, 1)] for row in (5, 6)] == ["row 5", "row 6"]
+    assert worksheet.formulas[(3, 1)] == "=1+1" and len(buffer) == 0
+    assert buffer.cells_written == 6, buffer.cells_written
+
+    # A failed timed flush keeps the cells and the timer tries again
+    worksheet = FakeWorksheet(ROWS)
+    worksheet.failing_batch_updates = {1}
+    buffer = SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=0.2)
+    buffer.add(8, 1, "retried")
+    deadline = time.monotonic() + 5
+    while worksheet.cells.get((8, 1)) != "retried" and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert worksheet.cells.get((8, 1)) == "retried", "the timed flush did not retry"
+    assert worksheet.api_calls['batch_update'] == 2 and isinstance(buffer.last_error, RuntimeError)
+
+    # close() reports cells it could not write
+    worksheet = FakeWorksheet(ROWS)
+    worksheet.failing_batch_updates = {1}
+    buffer = SheetWriteBuffer(worksheet, max_batch_size=100, flush_interval=60)
+    buffer.add(9, 1, "kept")
+    try:
+        buffer.close()
+        assert False, "close() did not raise"
+    except RuntimeError:
+        pass
+    assert len(buffer) == 1 and buffer._timer is None
+
+
+CHECKS = {
+    'snapshot': check_snapshot,
+    'coalesce': check_coalesce,
+    'size': check_size,
+    'interval': check_interval,
+    'close': check_close,
+    'failure': check_failure,
+}
+
+
+def main():
+    failures = 0
+    for name, check in CHECKS.items():
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {name}: {e}")
+    if failures:
+        print(f"❌ {failures} of {len(CHECKS)} sheet buffer checks failed")
+        sys.exit(1)
+    print(f"All {len(CHECKS)} sheet buffer checks passed")
+
+
+if __name__ == "__main__":
+    main()
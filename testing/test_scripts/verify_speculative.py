@@ -0,0 +1,126 @@
+"""
+CPU check that assisted decoding does not change greedy output.
+
+Builds small randomly initialized Qwen3 models (no download, no GPU) and compares plain
+greedy generation with each drafter used by generate_banner():
+
+    draft_shallow   a one-layer draft sharing the target's first layer, embeddings and
+                    head; the target's other layers have zeroed output projections, so
+                    they cost time but leave the logits unchanged and every draft is
+                    accepted, which also checks acceptance_stats() (expects ~100%) and
+                    shows the wall-clock speedup of a cheap, agreeing draft
+    draft_small     an unrelated one-layer draft; most drafts are rejected
+    prompt_lookup   n-gram drafting from a prompt with repeated spans
+
+Random models are rarely confident, so the drafts' assistant_confidence_threshold is
+0 to let them draft more than one token per step.
+
+Exits with status 1 when any output differs from plain greedy decoding.
+
+Run from the testing/ directory:
+    python test_scripts/verify_speculative.py
+"""
+import os
+import sys
+import time
+
+import torch
+from transformers import Qwen3Config, Qwen3ForCausalLM
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from test_scripts.speculative import ForwardCounter, acceptance_stats
+
+VOCAB_SIZE = 512
+
+
+HIDDEN_SIZE = 256
+
+
+def tiny_model(num_layers: int, seed: int) -> Qwen3ForCausalLM:
+    torch.manual_seed(seed)
+    config = Qwen3Config(
+        vocab_size=VOCAB_SIZE,
+        hidden_size=HIDDEN_SIZE,
+        intermediate_size=3 * HIDDEN_SIZE,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        head_dim=HIDDEN_SIZE // 4,
+        max_position_embeddings=1024,
+    )
+    return Qwen3ForCausalLM(config).eval()
+
+
+def deep_target_and_shallow_draft(num_layers: int, seed: int):
+    """Target whose layers after the first add nothing to the residual stream, and a one-layer copy of it"""
+    target = tiny_model(num_layers, seed)
+    with torch.no_grad():
+        for layer in target.model.layers[1:]:
+            layer.self_attn.o_proj.weight.zero_()
+            layer.mlp.down_proj.weight.zero_()
+    draft = tiny_model(1, seed)
+    draft.load_state_dict({name: weight for name, weight in target.state_dict().items()
+                           if not name.startswith('model.layers.') or name.startswith('model.layers.0.')})
+    return target, draft
+
+
+def make_prompt(seed: int, length: int = 96) -> torch.Tensor:
+    """Random token ids with repeated spans, like the JSON keys prompt lookup feeds on"""
+    generator = torch.Generator().manual_seed(seed)
+    span = torch.randint(0, VOCAB_SIZE, (16,), generator=generator)
+    noise = torch.randint(0, VOCAB_SIZE, (length,), generator=generator)
+    return torch.cat([noise[:length // 2], span, noise[length // 2:], span]).unsqueeze(0)
+
+
+def greedy(model, input_ids: torch.Tensor, max_new_tokens: int, **kwargs):
+    """Greedy completion, [target forwards, draft forwards] and seconds"""
+    with torch.no_grad(), ForwardCounter(model, kwargs.get('assistant_model')) as counter:
+        start_time = time.perf_counter()
+        outputs = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=max_new_tokens,
+            min_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=0,
+            **kwargs,
+        )
+        seconds = time.perf_counter() - start_time
+    return outputs[0, input_ids.shape[1]:].tolist(), counter.calls, seconds
+
+
+def main():
+    torch.set_num_threads(1)
+    target, draft_shallow = deep_target_and_shallow_draft(num_layers=8, seed=0)
+    draft_small = tiny_model(num_layers=1, seed=1)
+    for draft in (draft_shallow, draft_small):
+        draft.generation_config.assistant_confidence_threshold = 0.0
+    modes = {
+        'draft_shallow': {'assistant_model': draft_shallow},
+        'draft_small': {'assistant_model': draft_small},
+        'prompt_lookup': {'prompt_lookup_num_tokens': 8},
+    }
+
+    failures = 0
+    greedy(target, make_prompt(0), max_new_tokens=8)  # warm-up
+    for seed in range(3):
+        input_ids = make_prompt(seed)
+        reference, _, plain_seconds = greedy(target, input_ids, max_new_tokens=64)
+        for mode, kwargs in modes.items():
+            completion, calls, seconds = greedy(target, input_ids, max_new_tokens=64, **kwargs)
+            stats = acceptance_stats(len(completion), *calls)
+            same = completion == reference
+            failures += not same
+            acceptance = f"{stats['acceptance']:.0%}" if 'acceptance' in stats else "-"
+            print(f"prompt {seed} {mode:<14} {'✅ same' if same else '❌ differs'}  "
+                  f"{stats['tokens_per_forward']:.2f} tokens/forward, acceptance {acceptance}, "
+                  f"{plain_seconds / seconds:.2f}x plain speed")
+
+    if failures:
+        print(f"❌ {failures} assisted outputs differ from greedy decoding")
+        sys.exit(1)
+    print("All assisted outputs match greedy decoding")
+
+
+if __name__ == "__main__":
+    main()